@@ -8,27 +8,46 @@ counselor agent.
 
 Key Features:
 - Chat endpoint for conversing with the loan counselor
+- Streaming chat endpoint that sends the response as server-sent events
+- Batch chat endpoint that precomputes the first turns of a cohort and streams
+  the results back as NDJSON as they complete
 - Request validation for required student information
 - Conversation memory management
 - Error handling and logging
 - CORS support for cross-origin requests
 - Asynchronous processing using thread pools
+- Admission control with request deadlines and 429/503 responses under overload
+- Prometheus-format metrics for every request stage
+- Lazy startup: the counselor, LangChain and the model client are loaded on
+  first use, and the immutable shared state can be built before forking
+
+Importing this module is cheap. The counselor is created by `get_counselor()`
+on the first request of each process; `warm_shared_state()` builds the
+lender catalog, prompt template and lender blocks up front (see
+`gunicorn.conf.py`, which does so in the master before forking workers).
 """
 import os
+import json
+import math
+import threading
 from http import HTTPStatus
-from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, Any, Tuple
+from typing import TYPE_CHECKING, Dict, Any, Iterator, Optional, Tuple
 try:
     from dotenv import load_dotenv
-    from flask import Flask, request, jsonify, Response
-    from langsmith import traceable
+    from flask import Flask, request, jsonify, Response, stream_with_context
     from flask_cors import CORS
 except ImportError as e:
     print(f"Error importing required packages: {e}")
     print("Please install required packages: pip install python-dotenv flask langsmith flask-cors")
     raise
 
-from loan_counselor_agent import LoanCounselorAgent
+from utils.admission import AdmissionRejected, OverloadError, request_deadline
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from utils.structured_response import RESPONSE_MODES
+from utils.tracing import traceable
+
+if TYPE_CHECKING:
+    from loan_counselor_agent import LoanCounselorAgent
 
 # Load environment variables and configure app
 def create_app() -> Flask:
@@ -54,9 +73,42 @@ def create_app() -> Flask:
 
     return flask_app
 
-# Initialize Flask app and counselor
+# Initialize Flask app; the counselor is created on first use
 app = create_app()
-counselor = LoanCounselorAgent()
+
+_counselor: Optional["LoanCounselorAgent"] = None
+_counselor_pid: Optional[int] = None
+_counselor_lock = threading.Lock()
+
+def get_counselor() -> "LoanCounselorAgent":
+    """
+    Return this process's counselor, creating it on first use.
+
+    A counselor owns threads and database connections, which do not survive
+    a fork, so a process forked after the counselor was created (a gunicorn
+    worker of a preloaded app) creates its own.
+
+    Returns:
+        LoanCounselorAgent: The process-wide counselor
+    """
+    global _counselor, _counselor_pid
+    if _counselor is None or _counselor_pid != os.getpid():
+        with _counselor_lock:
+            if _counselor is None or _counselor_pid != os.getpid():
+                from loan_counselor_agent import LoanCounselorAgent
+                _counselor = LoanCounselorAgent()
+                _counselor_pid = os.getpid()
+    return _counselor
+
+def warm_shared_state() -> None:
+    """
+    Import the counselor's dependencies and build its immutable shared state.
+
+    Meant to run before forking workers, so they share the result
+    copy-on-write instead of each paying for it on their first request.
+    """
+    from loan_counselor_agent import warm_shared_state as warm_agent_state
+    warm_agent_state()
 
 # Configure LangChain environment
 def configure_langchain() -> None:
@@ -104,6 +156,12 @@ def validate_request_data(data: Dict[str, Any]) -> Tuple[Dict[str, str], int]:
             'error': f'Missing required fields: {", ".join(missing_fields)}'
         }, HTTPStatus.BAD_REQUEST
 
+    if not isinstance(data['message'], str):
+        return {'error': 'message must be a string'}, HTTPStatus.BAD_REQUEST
+
+    if not isinstance(data['userId'], str) or not data['userId'].strip():
+        return {'error': 'userId must be a non-empty string'}, HTTPStatus.BAD_REQUEST
+
     # Validate student details
     student_details = data.get('student_details', {})
     if not isinstance(student_details, dict):
@@ -118,31 +176,38 @@ def validate_request_data(data: Dict[str, Any]) -> Tuple[Dict[str, str], int]:
             'error': f'Missing required student details: {", ".join(missing_student_fields)}'
         }, HTTPStatus.BAD_REQUEST
 
+    # Optional: lets clients choose between one structured model call and two calls per turn
+    if data.get('response_mode') not in (None, *RESPONSE_MODES):
+        return {
+            'error': f'response_mode must be one of: {", ".join(RESPONSE_MODES)}'
+        }, HTTPStatus.BAD_REQUEST
+
     return {}, HTTPStatus.OK
 
-# Initialize thread pool for handling concurrent requests
-executor = ThreadPoolExecutor(max_workers=3)
+# Time budget for a request, propagated into every model call it makes
+REQUEST_TIMEOUT_SECONDS = float(os.getenv('REQUEST_TIMEOUT_SECONDS', '30'))
 
-def get_cached_response(message: str, user_id: str, student_details: Dict[str, Any]) -> Dict[str, Any]:
+def overload_response(error: OverloadError) -> Tuple[Response, int, Dict[str, str]]:
     """
-    Retrieve cached response from the counselor if available.
-    
+    Build the response for a request turned away because the model is saturated.
+
     Args:
-        message (str): User's message
-        user_id (str): Unique identifier for the user
-        student_details (Dict): Student information
-        
+        error (OverloadError): The admission or deadline error
+
     Returns:
-        Dict[str, Any]: Cached response if available, None otherwise
+        Tuple[Response, int, Dict[str, str]]: JSON error, 429 if the request was
+                                              rejected on arrival or 503 if its
+                                              deadline passed, and a Retry-After header
     """
-    try:
-        return counselor.get_loan_recommendation(
-            student_message=message,
-            user_id=user_id,
-            student_details=student_details
-        )
-    except Exception:
-        return None
+    status_code = (
+        HTTPStatus.TOO_MANY_REQUESTS if isinstance(error, AdmissionRejected)
+        else HTTPStatus.SERVICE_UNAVAILABLE
+    )
+    return (
+        jsonify({'error': str(error)}),
+        status_code,
+        {'Retry-After': str(max(1, math.ceil(error.retry_after)))}
+    )
 
 def handle_chat_request(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
     """
@@ -153,8 +218,12 @@ def handle_chat_request(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
         
     Returns:
         Tuple[Dict[str, Any], int]: Response data and HTTP status code
+
+    Raises:
+        OverloadError: If the model is saturated or the request's deadline passes
     """
-    error_response, status_code = validate_request_data(data)
+    with get_counselor().metrics.timed("validation"):
+        error_response, status_code = validate_request_data(data)
     if error_response:
         return error_response, status_code
 
@@ -164,25 +233,22 @@ def handle_chat_request(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
     student_details['userId'] = user_id
 
     if message.lower() == 'reset':
-        counselor.reset_conversation(user_id)
+        get_counselor().reset_conversation(user_id)
         return {'response': 'Conversation reset successfully'}, HTTPStatus.OK
 
-    # Use cached response if available
-    response = get_cached_response(message, user_id, student_details)
-    if not response:
-        try:
-            future = executor.submit(
-                # counselor.get_loan_recommendation,
-                student_details,
-                message,
-                user_id
+    # The counselor's admission controller bounds concurrent model calls and
+    # the deadline bounds how long this request waits for them; overload
+    # errors propagate to the route, which answers 429/503
+    try:
+        with request_deadline(REQUEST_TIMEOUT_SECONDS):
+            response = get_counselor().get_loan_recommendation(
+                student_details, message, user_id, response_mode=data.get('response_mode')
             )
-            response = future.result(timeout=30)
-        except TimeoutError:
-            return {'error': 'Request timed out'}, HTTPStatus.REQUEST_TIMEOUT
-        except Exception as e:
-            return {'error': f'Error getting recommendation: {str(e)}'}, HTTPStatus.INTERNAL_SERVER_ERROR
-            
+    except OverloadError:
+        raise
+    except Exception as e:
+        return {'error': f'Error getting recommendation: {str(e)}'}, HTTPStatus.INTERNAL_SERVER_ERROR
+
     return {'response': response}, HTTPStatus.OK
 
 @traceable(project_name="loan-counselor-agent")
@@ -196,8 +262,196 @@ def chat() -> Response:
         Response: JSON response containing counselor's message or error
     """
     try:
-        response, status_code = handle_chat_request(request.json)
+        with get_counselor().metrics.timed("chat_request"):
+            response, status_code = handle_chat_request(request.json)
         return jsonify(response), status_code
+    except OverloadError as e:
+        return overload_response(e)
+    except Exception as e:
+        return jsonify({
+            'error': f'Internal server error: {str(e)}'
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Format a server-sent event.
+
+    Args:
+        event (str): Event name
+        data (Any): JSON-serializable event payload
+
+    Returns:
+        str: The event in text/event-stream wire format
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream() -> Response:
+    """
+    API endpoint for chatting with the loan counselor over server-sent events.
+    Sends `token` events as the response is generated, then a `done` event
+    carrying the full response and the follow-up questions.
+
+    Returns:
+        Response: text/event-stream response, JSON error if validation fails,
+                  or 429 with a Retry-After header if the model is saturated
+                  before the stream starts
+    """
+    try:
+        data = request.json
+        with get_counselor().metrics.timed("validation"):
+            error_response, status_code = validate_request_data(data)
+        if error_response:
+            return jsonify(error_response), status_code
+
+        message = data['message']
+        user_id = data['userId']
+        student_details = data['student_details']
+        student_details['userId'] = user_id
+
+        if message.lower() == 'reset':
+            get_counselor().reset_conversation(user_id)
+            return jsonify({'response': 'Conversation reset successfully'}), HTTPStatus.OK
+
+        # Once the stream has started its status is sent, so a model that is
+        # already saturated is reported now as a 429 rather than as an error event
+        get_counselor().admission.check_capacity()
+
+        def generate() -> Iterator[str]:
+            # Entered in the generator, which runs after this function has
+            # returned, so the deadline covers the whole stream and a hung
+            # model cannot hold an admission slot indefinitely
+            with request_deadline(REQUEST_TIMEOUT_SECONDS):
+                for event in get_counselor().stream_loan_recommendation(student_details, message, user_id):
+                    yield format_sse(event['event'], event['data'])
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    except OverloadError as e:
+        return overload_response(e)
+    except Exception as e:
+        return jsonify({
+            'error': f'Internal server error: {str(e)}'
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+
+# Largest number of students accepted by one /chat/batch request
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '1000'))
+# Batch items generated at once; unset matches the model's admission limit
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '0')) or None
+
+def format_ndjson(index: int, user_id: Any, payload: Dict[str, Any], status_code: int) -> str:
+    """
+    Format one result line of a batch response.
+
+    Args:
+        index (int): Position of the item in the request
+        user_id (Any): The item's userId, if it had one
+        payload (Dict[str, Any]): Body the item would have had as a /chat request
+        status_code (int): Status code the item would have had as a /chat request
+
+    Returns:
+        str: The result as a line of newline-delimited JSON
+    """
+    return json.dumps({'index': index, 'userId': user_id, 'status': int(status_code), **payload}) + "\n"
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch() -> Response:
+    """
+    API endpoint for precomputing the first turns of many students at once.
+
+    Takes {"items": [...], "response_mode": ...} (or just the list of items),
+    where each item is a /chat request body. Every item is validated like a
+    /chat request; valid items are passed to the counselor's batch method,
+    which sends identical prompts to the model once and keeps as many items
+    in flight as the model's admission limit allows. Results are streamed as
+    newline-delimited JSON in completion order, one line per item carrying
+    its index, userId and status code, so a client can match them to its
+    items. A successful item carries the body /chat would have returned and
+    an invalid item its 400 error; unlike /chat, which reports a failed
+    generation inside a 200 body, a failed item is {"error"} with status
+    500, and an item the model was too busy for is {"error", "retryAfter"}
+    with status 503.
+
+    Returns:
+        Response: application/x-ndjson response, or JSON error if the batch itself is invalid
+    """
+    try:
+        data = request.json
+        items = data.get('items') if isinstance(data, dict) else data
+        response_mode = data.get('response_mode') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'items must be a non-empty list'}), HTTPStatus.BAD_REQUEST
+        if len(items) > BATCH_MAX_ITEMS:
+            return jsonify({
+                'error': f'A batch can hold at most {BATCH_MAX_ITEMS} items'
+            }), HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        if response_mode not in (None, *RESPONSE_MODES):
+            return jsonify({
+                'error': f'response_mode must be one of: {", ".join(RESPONSE_MODES)}'
+            }), HTTPStatus.BAD_REQUEST
+
+        counselor = get_counselor()
+        rejected = []
+        accepted = []
+        indexes = []
+        seen_users = set()
+        for index, item in enumerate(items):
+            user_id = item.get('userId') if isinstance(item, dict) else None
+            if not isinstance(item, dict):
+                error_response, status_code = {'error': 'Each item must be a JSON object'}, HTTPStatus.BAD_REQUEST
+            else:
+                with counselor.metrics.timed("validation"):
+                    error_response, status_code = validate_request_data(item)
+            if not error_response and item['message'].lower() == 'reset':
+                error_response, status_code = {
+                    'error': 'reset is not supported in a batch; use /reset'
+                }, HTTPStatus.BAD_REQUEST
+            if not error_response and user_id in seen_users:
+                error_response, status_code = {
+                    'error': f'userId {user_id} appears more than once in the batch'
+                }, HTTPStatus.BAD_REQUEST
+            if not error_response and 'response_mode' in item:
+                error_response, status_code = {
+                    'error': 'response_mode is set for the whole batch, not per item'
+                }, HTTPStatus.BAD_REQUEST
+            if error_response:
+                rejected.append(format_ndjson(index, user_id, error_response, status_code))
+                continue
+            student_details = item['student_details']
+            student_details['userId'] = user_id
+            accepted.append((student_details, item['message'], user_id))
+            seen_users.add(user_id)
+            indexes.append(index)
+
+        def generate() -> Iterator[str]:
+            yield from rejected
+            results = counselor.get_loan_recommendations_batch(
+                accepted,
+                max_concurrency=BATCH_MAX_CONCURRENCY,
+                item_timeout=REQUEST_TIMEOUT_SECONDS,
+                response_mode=response_mode
+            )
+            for position, result in results:
+                index = indexes[position]
+                if 'retry_after' in result:
+                    yield format_ndjson(index, accepted[position][2], {
+                        'error': result['error'], 'retryAfter': result['retry_after']
+                    }, HTTPStatus.SERVICE_UNAVAILABLE)
+                elif 'error' in result:
+                    yield format_ndjson(index, accepted[position][2], {
+                        'error': result['error']
+                    }, HTTPStatus.INTERNAL_SERVER_ERROR)
+                else:
+                    yield format_ndjson(index, accepted[position][2], {'response': result}, HTTPStatus.OK)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/x-ndjson',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
     except Exception as e:
         return jsonify({
             'error': f'Internal server error: {str(e)}'
@@ -217,7 +471,7 @@ def reset_memory() -> Response:
         if not data or 'userId' not in data:
             return jsonify({'error': 'Missing userId in request'}), HTTPStatus.BAD_REQUEST
 
-        counselor.reset_conversation(data['userId'])
+        get_counselor().reset_conversation(data['userId'])
         return jsonify({'message': 'Conversation history cleared successfully'})
     except Exception as e:
         return jsonify({
@@ -236,13 +490,34 @@ def user_report() -> Response:
         if not request.json or 'userId' not in request.json:
             return jsonify({'error': 'Missing userId in request'}), HTTPStatus.BAD_REQUEST
             
-        response = counselor.get_user_report(request.json['userId'])
+        with request_deadline(REQUEST_TIMEOUT_SECONDS):
+            response = get_counselor().get_user_report(request.json['userId'])
         return jsonify(response), HTTPStatus.OK
+    except OverloadError as e:
+        return overload_response(e)
     except Exception as e:
         return jsonify({
             'error': f'Error getting user report: {str(e)}'
         }), HTTPStatus.INTERNAL_SERVER_ERROR
 
+@app.route('/metrics', methods=['GET'])
+def metrics() -> Response:
+    """
+    API endpoint exposing the counselor's metrics in Prometheus text format.
+    Includes per-stage latency histograms, model call counts and sizes,
+    cache hits, executor queue depth and active sessions.
+
+    A scrape never creates the counselor: until this worker has served a
+    request (or when it cannot create one, e.g. without a model key) there
+    are no metrics and the response is empty.
+
+    Returns:
+        Response: Prometheus exposition text
+    """
+    counselor = _counselor if _counselor_pid == os.getpid() else None
+    body = counselor.metrics.render() if counselor is not None else ""
+    return Response(body, content_type=METRICS_CONTENT_TYPE)
+
 @app.errorhandler(404)
 def not_found() -> Tuple[Response, int]:
     """
@@ -0,0 +1,215 @@
+"""
+This is the ASGI entry point for the loan counselor agent.
+
+It serves the same chat, reset and user-report endpoints as the Flask `app`,
+but handles each request on an event loop with the counselor's async methods,
+so a single process can keep thousands of model calls in flight instead of
+one per worker thread. It shares the counselor and request validation with
+`app.py` and needs no web framework beyond an ASGI server:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import json
+import math
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from app import REQUEST_TIMEOUT_SECONDS, get_counselor, validate_request_data
+from utils.admission import AdmissionRejected, OverloadError, request_deadline
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+async def read_json(receive: Receive) -> Any:
+    """
+    Read and decode a JSON request body.
+
+    Args:
+        receive: ASGI receive callable
+
+    Returns:
+        Any: Decoded body, or None if the body is empty or not valid JSON
+    """
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get('body', b"")
+        if not message.get('more_body'):
+            break
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+async def send_json(send: Send, payload: Dict[str, Any], status_code: int,
+                    headers: Optional[Dict[str, str]] = None) -> None:
+    """
+    Send a JSON response.
+
+    Args:
+        send: ASGI send callable
+        payload: JSON-serializable response body
+        status_code: HTTP status code
+        headers: Additional response headers
+    """
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': int(status_code),
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+            (b'access-control-allow-origin', b'*')
+        ] + [
+            (name.lower().encode('ascii'), value.encode('ascii'))
+            for name, value in (headers or {}).items()
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_preflight(send: Send, scope: Scope, methods: Sequence[str]) -> None:
+    """
+    Answer a CORS preflight request the way the Flask app's `CORS()` does.
+
+    Args:
+        send: ASGI send callable
+        scope: ASGI connection scope of the OPTIONS request
+        methods: Methods served on the requested path
+    """
+    requested_headers = dict(scope.get('headers') or []).get(b'access-control-request-headers')
+    await send({
+        'type': 'http.response.start',
+        'status': int(HTTPStatus.OK),
+        'headers': [
+            (b'content-length', b'0'),
+            (b'access-control-allow-origin', b'*'),
+            (b'access-control-allow-methods', ", ".join(sorted({*methods, 'OPTIONS'})).encode('ascii')),
+            (b'access-control-allow-headers', requested_headers or b'Content-Type')
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': b""})
+
+async def chat(data: Any) -> Tuple[Dict[str, Any], int]:
+    """
+    Process chat requests and generate appropriate responses.
+
+    Args:
+        data: Request data containing message and student details
+
+    Returns:
+        Tuple[Dict[str, Any], int]: Response data and HTTP status code
+    """
+    error_response, status_code = validate_request_data(data)
+    if error_response:
+        return error_response, status_code
+
+    message = data['message']
+    user_id = data['userId']
+    student_details = data['student_details']
+    student_details['userId'] = user_id
+
+    if message.lower() == 'reset':
+        get_counselor().reset_conversation(user_id)
+        return {'response': 'Conversation reset successfully'}, HTTPStatus.OK
+
+    with request_deadline(REQUEST_TIMEOUT_SECONDS):
+        response = await get_counselor().aget_loan_recommendation(
+            student_details, message, user_id, response_mode=data.get('response_mode')
+        )
+    return {'response': response}, HTTPStatus.OK
+
+async def reset_memory(data: Any) -> Tuple[Dict[str, Any], int]:
+    """
+    Clear conversation memory for a user.
+
+    Args:
+        data: Request data containing the userId
+
+    Returns:
+        Tuple[Dict[str, Any], int]: Response data and HTTP status code
+    """
+    if not data or 'userId' not in data:
+        return {'error': 'Missing userId in request'}, HTTPStatus.BAD_REQUEST
+
+    get_counselor().reset_conversation(data['userId'])
+    return {'message': 'Conversation history cleared successfully'}, HTTPStatus.OK
+
+async def user_report(data: Any) -> Tuple[Dict[str, Any], int]:
+    """
+    Generate a conversation report for a user.
+
+    Args:
+        data: Request data containing the userId
+
+    Returns:
+        Tuple[Dict[str, Any], int]: Response data and HTTP status code
+    """
+    if not data or 'userId' not in data:
+        return {'error': 'Missing userId in request'}, HTTPStatus.BAD_REQUEST
+
+    with request_deadline(REQUEST_TIMEOUT_SECONDS):
+        return await get_counselor().aget_user_report(data['userId']), HTTPStatus.OK
+
+ROUTES = {
+    ('POST', '/chat'): chat,
+    ('POST', '/reset'): reset_memory,
+    ('POST', '/user-report'): user_report
+}
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    """
+    ASGI application serving the counselor's async endpoints.
+
+    Args:
+        scope: ASGI connection scope
+        receive: ASGI receive callable
+        send: ASGI send callable
+    """
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Create the counselor before serving, off the event loop, so
+                # the first request neither pays for it nor blocks the loop
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, get_counselor)
+                except Exception as e:
+                    await send({
+                        'type': 'lifespan.startup.failed',
+                        'message': f'Error creating the counselor: {str(e)}'
+                    })
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    if scope['method'] == 'OPTIONS':
+        methods = [method for method, path in ROUTES if path == scope['path']]
+        if methods:
+            await send_preflight(send, scope, methods)
+            return
+
+    handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is None:
+        await send_json(send, {'error': 'Not found'}, HTTPStatus.NOT_FOUND)
+        return
+
+    headers = None
+    try:
+        response, status_code = await handler(await read_json(receive))
+    except OverloadError as e:
+        response = {'error': str(e)}
+        status_code = (
+            HTTPStatus.TOO_MANY_REQUESTS if isinstance(e, AdmissionRejected)
+            else HTTPStatus.SERVICE_UNAVAILABLE
+        )
+        headers = {'Retry-After': str(max(1, math.ceil(e.retry_after)))}
+    except Exception as e:
+        response, status_code = {'error': f'Internal server error: {str(e)}'}, HTTPStatus.INTERNAL_SERVER_ERROR
+    await send_json(send, response, status_code, headers)
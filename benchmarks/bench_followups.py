@@ -0,0 +1,126 @@
+"""
+Benchmark of the local follow-up question generator against the model.
+
+Builds conversations with a few turns each, then asks for follow-up
+questions with `LoanCounselorAgent.get_query_recommendation` in the
+"template" follow-up mode (local template bank) and the "llm" mode (a call
+to the fake model), and reports latency percentiles, model calls and the
+prompt and response size per request, with tokens estimated at four bytes
+each:
+
+    python -m benchmarks.bench_followups --users 64 --turns 3 --latency-ms 300
+"""
+import os
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from benchmarks.fake_llm import FakeLLM
+from benchmarks.run_benchmarks import MESSAGES, percentile, student_profile
+
+MODES = ("template", "llm")
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Parse command-line options.
+
+    Args:
+        argv: Command-line arguments
+
+    Returns:
+        argparse.Namespace: Parsed options
+    """
+    parser = argparse.ArgumentParser(description="Benchmark follow-up question generation offline.")
+    parser.add_argument("--users", type=int, default=64, help="Number of simulated students")
+    parser.add_argument("--turns", type=int, default=3, help="Turns in each conversation before measuring")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Median model latency")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+def run_mode(mode: str, counselor: Any, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Ask for follow-up questions for every conversation in one follow-up mode.
+
+    Args:
+        mode: "template" or "llm"
+        counselor: Agent holding the conversations
+        args: Command-line options
+
+    Returns:
+        Dict: Latency percentiles, model calls and sizes per request
+    """
+    llm = FakeLLM(latency_ms=args.latency_ms, seed=args.seed)
+    counselor.llm = llm
+    counselor.followup_mode = mode
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def request(user: int) -> None:
+        started = time.perf_counter()
+        counselor.get_query_recommendation(
+            MESSAGES[(user + args.turns) % len(MESSAGES)], f"student-{user}", student_profile(user)
+        )
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(request, range(args.users)))
+
+    latencies.sort()
+    requests = len(latencies)
+    return {
+        'mode': mode,
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+        'calls_per_request': llm.calls / requests,
+        'prompt_bytes_per_request': llm.prompt_bytes / requests,
+        'response_bytes_per_request': llm.response_bytes / requests,
+        'tokens_per_request': (llm.prompt_bytes + llm.response_bytes) / 4 / requests
+    }
+
+def main(argv: List[str]) -> List[Dict[str, Any]]:
+    """
+    Compare template and model-written follow-up questions.
+
+    Args:
+        argv: Command-line arguments
+
+    Returns:
+        List[Dict]: One result per follow-up mode
+    """
+    args = parse_args(argv)
+    os.environ.setdefault("GOOGLE_GENAI_MODEL", "fake-gemini")
+    os.environ.setdefault("GOOGLE_GENAI_API_KEY", "offline")
+    os.environ["RESPONSE_CACHE_BACKEND"] = "none"
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+    from loan_counselor_agent import LoanCounselorAgent
+    LoanCounselorAgent._initialize_llm = staticmethod(
+        lambda model, api_key, temperature: FakeLLM(latency_ms=0, seed=args.seed)
+    )
+    counselor = LoanCounselorAgent(followup_mode="template")
+    for user in range(args.users):
+        for turn in range(args.turns):
+            counselor.get_loan_recommendation(
+                student_profile(user), MESSAGES[(user + turn) % len(MESSAGES)], f"student-{user}"
+            )
+
+    results = [run_mode(mode, counselor, args) for mode in MODES]
+
+    header = (f"{'mode':<10}{'p50 ms':>10}{'p99 ms':>10}{'calls/req':>11}"
+              f"{'prompt B/req':>14}{'response B/req':>16}{'~tokens/req':>13}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(f"{result['mode']:<10}{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}"
+              f"{result['calls_per_request']:>11.2f}{result['prompt_bytes_per_request']:>14.0f}"
+              f"{result['response_bytes_per_request']:>16.0f}{result['tokens_per_request']:>13.0f}")
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
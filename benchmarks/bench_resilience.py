@@ -0,0 +1,148 @@
+"""
+Benchmark of retries and hedging against a fake model with latency spikes
+and injected failures.
+
+Runs the same workload through `LoanCounselorAgent._predict` with no
+retries, with retries, and with retries plus hedging, and reports latency
+percentiles, error rate and upstream calls per request for each policy:
+
+    python -m benchmarks.bench_resilience --requests 400 --spike-rate 0.05 --failure-rate 0.02
+"""
+import os
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from benchmarks.fake_llm import FakeLLM
+from benchmarks.run_benchmarks import percentile
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Parse command-line options.
+
+    Args:
+        argv: Command-line arguments
+
+    Returns:
+        argparse.Namespace: Parsed options
+    """
+    parser = argparse.ArgumentParser(description="Benchmark retries and hedging offline.")
+    parser.add_argument("--requests", type=int, default=400, help="Model calls per policy")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Median model latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.2)
+    parser.add_argument("--spike-rate", type=float, default=0.05, help="Fraction of calls hit by a spike")
+    parser.add_argument("--spike-multiplier", type=float, default=10.0)
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="Fraction of calls that fail")
+    parser.add_argument("--attempt-timeout", type=float, default=None, help="Per-attempt timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+def run_policy(name: str, args: argparse.Namespace, resilience: Any) -> Dict[str, Any]:
+    """
+    Run the workload with one retry/hedging policy.
+
+    Args:
+        name: Policy name
+        args: Command-line options
+        resilience: ResilientCaller implementing the policy
+
+    Returns:
+        Dict: Latency percentiles, error rate and upstream calls per request
+    """
+    from loan_counselor_agent import LoanCounselorAgent
+    from utils.admission import AdmissionController
+
+    llm = FakeLLM(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        spike_rate=args.spike_rate,
+        spike_multiplier=args.spike_multiplier,
+        failure_rate=args.failure_rate,
+        seed=args.seed
+    )
+    LoanCounselorAgent._initialize_llm = staticmethod(lambda model, api_key, temperature: llm)
+    counselor = LoanCounselorAgent(
+        admission=AdmissionController(max_concurrency=args.concurrency * 2, max_queue=args.requests),
+        resilience=resilience
+    )
+
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def request(index: int) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            # Distinct prompts, so neither caching nor coalescing hides anything
+            counselor._predict(f"Benchmark prompt {index}")
+            failed = False
+        except Exception:
+            failed = True
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            errors += failed
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(request, range(args.requests)))
+
+    latencies.sort()
+    stats = resilience.stats()
+    return {
+        'policy': name,
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p95_ms': 1000 * percentile(latencies, 0.95),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+        'error_rate': errors / len(latencies),
+        'calls_per_request': llm.calls / len(latencies),
+        'retries': stats['retries'],
+        'hedges': stats['hedges'],
+        'hedge_wins': stats['hedge_wins']
+    }
+
+def main(argv: List[str]) -> List[Dict[str, Any]]:
+    """
+    Compare the retry and hedging policies.
+
+    Args:
+        argv: Command-line arguments
+
+    Returns:
+        List[Dict]: One result per policy
+    """
+    args = parse_args(argv)
+    os.environ.setdefault("GOOGLE_GENAI_MODEL", "fake-gemini")
+    os.environ.setdefault("GOOGLE_GENAI_API_KEY", "offline")
+    os.environ["RESPONSE_CACHE_BACKEND"] = "none"
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+    from utils.resilience import ResilientCaller
+    # One attempt thread per admission slot of the benchmark's counselor, so
+    # attempts never wait for a thread held by an abandoned one
+    backoff = dict(backoff_base=args.latency_ms / 1000, backoff_max=args.latency_ms / 100, seed=args.seed,
+                   pool_size=args.concurrency * 2)
+    policies = [
+        ("no retries", ResilientCaller(max_retries=0, attempt_timeout=args.attempt_timeout)),
+        ("retries", ResilientCaller(max_retries=2, attempt_timeout=args.attempt_timeout, **backoff)),
+        ("retries+hedge", ResilientCaller(max_retries=2, attempt_timeout=args.attempt_timeout,
+                                          hedge=True, **backoff))
+    ]
+    results = [run_policy(name, args, resilience) for name, resilience in policies]
+
+    header = (f"{'policy':<15}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}"
+              f"{'calls/req':>11}{'retries':>9}{'hedges':>8}{'wins':>6}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(f"{result['policy']:<15}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+              f"{result['p99_ms']:>10.1f}{result['error_rate']:>9.1%}{result['calls_per_request']:>11.2f}"
+              f"{result['retries']:>9}{result['hedges']:>8}{result['hedge_wins']:>6}")
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,140 @@
+"""
+Startup-time benchmark for the Flask app.
+
+Each run starts a fresh interpreter and times the phases between process
+start and the first answered request: importing `app`, building the shared
+state, creating the counselor, and the first `/chat` request (served by the
+fake model, so no network access is needed). Runs are repeated and the
+median of each phase is reported, for a cold worker and for a worker forked
+from a master that already built the shared state, as gunicorn does with
+`preload_app`:
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import os
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+PHASES = ("import_app", "warm_shared_state", "create_counselor", "first_request")
+
+# Runs in a fresh interpreter and prints the phase timings as JSON
+CHILD = r"""
+import os, sys, json, time, gc
+timings = {}
+started = time.perf_counter()
+import app
+timings['import_app'] = time.perf_counter() - started
+preload = sys.argv[1] == "preload"
+if preload:
+    started = time.perf_counter()
+    app.warm_shared_state()
+    timings['warm_shared_state'] = time.perf_counter() - started
+    gc.freeze()
+    read_fd, write_fd = os.pipe()
+    if os.fork():
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            child = json.loads(pipe.read())
+        os.wait()
+        timings.update(child)
+        print(json.dumps(timings))
+        sys.exit(0)
+    os.close(read_fd)
+
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+worker = {}
+started = time.perf_counter()
+# Importing the agent is part of creating the counselor on a cold worker
+from benchmarks.fake_llm import FakeLLM
+from loan_counselor_agent import LoanCounselorAgent
+LoanCounselorAgent._initialize_llm = staticmethod(lambda model, api_key, temperature: FakeLLM(latency_ms=0))
+app.get_counselor()
+worker['create_counselor'] = time.perf_counter() - started
+started = time.perf_counter()
+app.app.test_client().post('/chat', json={
+    'userId': 'startup', 'message': 'What loans can I get?',
+    'student_details': {'name': 'A', 'origin_country': 'India', 'destination_country': 'USA',
+                        'loan_amount_needed': 30000, 'course_of_study': 'MS'}
+})
+worker['first_request'] = time.perf_counter() - started
+if preload:
+    with os.fdopen(write_fd, "w") as pipe:
+        pipe.write(json.dumps(worker))
+    os._exit(0)
+timings.update(worker)
+print(json.dumps(timings))
+"""
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Parse command-line options.
+
+    Args:
+        argv: Command-line arguments
+
+    Returns:
+        argparse.Namespace: Parsed options
+    """
+    parser = argparse.ArgumentParser(description="Benchmark application startup.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per mode")
+    return parser.parse_args(argv)
+
+def run_once(mode: str) -> Dict[str, float]:
+    """
+    Time one startup in a fresh interpreter.
+
+    Args:
+        mode: "cold" or "preload"
+
+    Returns:
+        Dict: Seconds spent in each phase
+    """
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_GENAI_MODEL", "fake-gemini")
+    env.setdefault("GOOGLE_GENAI_API_KEY", "offline")
+    env["RESPONSE_CACHE_BACKEND"] = "none"
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, mode],
+        capture_output=True, text=True, check=True, env=env
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(argv: List[str]) -> Dict[str, Dict[str, float]]:
+    """
+    Run the startup benchmark in both modes.
+
+    Args:
+        argv: Command-line arguments
+
+    Returns:
+        Dict: Median seconds per phase, per mode
+    """
+    args = parse_args(argv)
+    results = {}
+    for mode in ("cold", "preload"):
+        runs = [run_once(mode) for _ in range(args.runs)]
+        results[mode] = {
+            phase: statistics.median(run[phase] for run in runs)
+            for phase in PHASES if phase in runs[0]
+        }
+
+    header = f"{'mode':<10}" + "".join(f"{phase:>20}" for phase in PHASES) + f"{'worker ready':>16}"
+    print(header)
+    print("-" * len(header))
+    for mode, phases in results.items():
+        # Time a worker spends before answering its first request
+        worker = sum(phases[phase] for phase in ("create_counselor", "first_request"))
+        if mode == "cold":
+            worker += phases["import_app"]
+        cells = "".join(
+            f"{1000 * phases[phase]:>18.1f}ms" if phase in phases else f"{'-':>20}" for phase in PHASES
+        )
+        print(f"{mode:<10}{cells}{1000 * worker:>14.1f}ms")
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,371 @@
+"""
+This module contains a deterministic stand-in for the Gemini chat model, used to
+benchmark the counselor fully offline.
+
+The fake model exposes the parts of the LangChain chat model interface the
+agent uses (`predict`, `apredict`, `stream`, `astream`, `model`, `temperature`)
+and simulates generation time from a configurable latency distribution and
+token rate, with optional latency spikes and injected failures. Answers are
+derived from a hash of the prompt, so runs with the same seed are
+reproducible. Like the real client, a call given a `timeout` gives up with
+`TimeoutError` once it has waited that long.
+
+Like Gemini's context cache, `create_cached_content` stores a prompt prefix
+and returns a handle that calls pass as `cached_content` instead of the
+prefix. Answers are the same as for the whole prompt, and the bytes spent on
+prefixes are counted separately, so tests can check how often each prefix is
+uploaded.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "lognormal")
+
+class FakeLLMError(RuntimeError):
+    """Injected transient failure of the fake model, shaped like a 503 from the API."""
+    code = 503
+
+class FakeChunk(NamedTuple):
+    """A streamed piece of a fake response, shaped like a LangChain message chunk."""
+    content: str
+
+class FakeLLM:
+    """
+    Offline chat model with configurable latency and token rate.
+
+    Each call waits for a time-to-first-token drawn from the latency
+    distribution, then emits `response_tokens` tokens at `tokens_per_second`.
+
+    Attributes:
+        model (str): Model name reported to the agent (used in cache keys)
+        temperature (float): Sampling temperature reported to the agent
+        latency_ms (float): Median time to first token in milliseconds
+        latency_distribution (str): "constant", "uniform" or "lognormal"
+        latency_sigma (float): Spread of the latency distribution
+        tokens_per_second (float): Generation speed (0 emits instantly)
+        response_tokens (int): Number of tokens in each response
+        spike_rate (float): Fraction of calls hit by a latency spike
+        spike_multiplier (float): Latency multiplier during a spike
+        failure_rate (float): Fraction of calls that fail with FakeLLMError
+        calls (int): Number of calls made
+        failures (int): Number of injected failures
+        timeouts (int): Number of calls that gave up at their timeout
+        prompt_bytes (int): Total bytes of prompt text received
+        response_bytes (int): Total bytes of response text returned
+        cached_contents (int): Number of prefixes stored with `create_cached_content`
+        prefix_bytes (int): Total bytes of prefixes stored
+    """
+    def __init__(self,
+                 latency_ms: float = 500.0,
+                 latency_distribution: str = "lognormal",
+                 latency_sigma: float = 0.3,
+                 tokens_per_second: float = 0.0,
+                 response_tokens: int = 120,
+                 spike_rate: float = 0.0,
+                 spike_multiplier: float = 10.0,
+                 failure_rate: float = 0.0,
+                 seed: int = 0,
+                 model: str = "fake-gemini",
+                 temperature: float = 0.6):
+        """
+        Initialize the fake model.
+
+        Args:
+            latency_ms: Median time to first token in milliseconds
+            latency_distribution: "constant", "uniform" or "lognormal"
+            latency_sigma: Spread of the latency distribution (relative spread
+                           for "uniform", log-space sigma for "lognormal")
+            tokens_per_second: Generation speed (0 emits instantly)
+            response_tokens: Number of tokens in each response
+            spike_rate: Fraction of calls hit by a latency spike
+            spike_multiplier: Latency multiplier during a spike
+            failure_rate: Fraction of calls that fail with FakeLLMError
+                          (after their time to first token)
+            seed: Seed for the latency distribution, spikes and failures
+            model: Model name reported to the agent
+            temperature: Sampling temperature reported to the agent
+
+        Raises:
+            ValueError: If the latency distribution is unknown
+        """
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Latency distribution must be one of: {', '.join(LATENCY_DISTRIBUTIONS)}")
+        self.model = model
+        self.temperature = temperature
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.spike_rate = spike_rate
+        self.spike_multiplier = spike_multiplier
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.prompt_bytes = 0
+        self.response_bytes = 0
+        self.cached_contents = 0
+        self.prefix_bytes = 0
+        self._prefixes: Dict[str, str] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _start_call(self, prompt: str) -> Tuple[float, bool]:
+        """
+        Record a call and draw its time to first token and whether it fails.
+
+        Args:
+            prompt: Prompt sent to the model
+
+        Returns:
+            Tuple[float, bool]: Time to first token in seconds, and whether the
+                                call fails
+        """
+        with self._lock:
+            self.calls += 1
+            self.prompt_bytes += len(prompt.encode('utf-8'))
+            if self.latency_distribution == "constant":
+                latency = self.latency_ms
+            elif self.latency_distribution == "uniform":
+                spread = self.latency_ms * self.latency_sigma
+                latency = self._random.uniform(self.latency_ms - spread, self.latency_ms + spread)
+            else:
+                latency = self.latency_ms * self._random.lognormvariate(0.0, self.latency_sigma)
+            if self.spike_rate and self._random.random() < self.spike_rate:
+                latency *= self.spike_multiplier
+            fails = bool(self.failure_rate) and self._random.random() < self.failure_rate
+            if fails:
+                self.failures += 1
+        return max(latency, 0.0) / 1000.0, fails
+
+    def create_cached_content(self, prefix: str, ttl_seconds: float, timeout: Optional[float] = None) -> str:
+        """
+        Store a prompt prefix that later calls refer to by handle.
+
+        Args:
+            prefix: Prompt prefix
+            ttl_seconds: Requested lifetime (the fake keeps prefixes forever)
+            timeout: Time limit for the call (storing is instant)
+
+        Returns:
+            str: Handle to pass as `cached_content`
+        """
+        with self._lock:
+            self.cached_contents += 1
+            self.prefix_bytes += len(prefix.encode('utf-8'))
+            handle = f"cachedContents/fake-{self.cached_contents}"
+            self._prefixes[handle] = prefix
+        return handle
+
+    def _full_prompt(self, prompt: str, kwargs: Dict[str, Any]) -> str:
+        """
+        Prepend the cached prefix a call refers to.
+
+        Args:
+            prompt: Text sent with the call
+            kwargs: Keyword arguments of the call
+
+        Returns:
+            str: The whole prompt
+
+        Raises:
+            ValueError: If the call refers to an unknown prefix
+        """
+        handle = kwargs.get('cached_content')
+        if handle is None:
+            return prompt
+        if handle not in self._prefixes:
+            raise ValueError(f"Unknown cached content: {handle}")
+        return self._prefixes[handle] + prompt
+
+    @staticmethod
+    def _capped(delay: float, timeout: Optional[float]) -> float:
+        """
+        Cap a wait at the call's timeout.
+
+        Args:
+            delay: Seconds the call would wait
+            timeout: The call's timeout, if any
+
+        Returns:
+            float: Seconds to actually wait
+        """
+        if timeout is None or delay <= timeout:
+            return delay
+        return max(timeout, 0.0)
+
+    def _after_wait(self, delay: float, timeout: Optional[float], fails: bool) -> None:
+        """
+        Raise the outcome of a call that has finished waiting.
+
+        Args:
+            delay: Seconds the call needed
+            timeout: The call's timeout, if any
+            fails: Whether the call was drawn to fail
+
+        Raises:
+            TimeoutError: If the call needed longer than its timeout
+            FakeLLMError: If the call was drawn to fail
+        """
+        if timeout is not None and delay > timeout:
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"Fake model timed out after {timeout:.2f}s")
+        if fails:
+            raise FakeLLMError("Injected fake model failure")
+
+    def _token_delay(self) -> float:
+        """Seconds between two generated tokens."""
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _respond(self, prompt: str) -> List[str]:
+        """
+        Build a deterministic response for a prompt, split into tokens.
+
+        Follow-up question, structured response and sentiment prompts get
+        answers in the format the agent expects from the real model.
+
+        Args:
+            prompt: Prompt sent to the model
+
+        Returns:
+            List[str]: Response tokens
+        """
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        if "Generate 3 natural follow-up questions" in prompt:
+            text = json.dumps([f"Follow-up question {digest[i:i + 6]}?" for i in (0, 6, 12)])
+            return [text]
+        if "Analyze the sentiment" in prompt or "sentiment scores" in prompt:
+            scores = [int(digest[i:i + 2], 16) / 255 for i in (0, 2, 4)]
+            text = json.dumps(dict(zip(("positivity", "engagement", "concern_level"), scores)))
+            return [text]
+        words = [digest[i % 60:i % 60 + 4] for i in range(self.response_tokens)]
+        if '"follow_up_questions"' in prompt:
+            text = json.dumps({
+                'response': " ".join(words),
+                'follow_up_questions': [f"Follow-up question {digest[i:i + 6]}?" for i in (0, 6, 12)]
+            })
+            # Split like a streamed reply, one token per word
+            return [token + " " for token in text.split(" ")]
+        return [word + " " for word in words]
+
+    def _finish_call(self, tokens: List[str]) -> None:
+        """
+        Record the size of a response.
+
+        Args:
+            tokens: Response tokens
+        """
+        with self._lock:
+            self.response_bytes += sum(len(token.encode('utf-8')) for token in tokens)
+
+    def predict(self, prompt: str, **kwargs: Any) -> str:
+        """
+        Generate a complete response, blocking for the simulated generation time.
+
+        Args:
+            prompt: Prompt sent to the model
+
+        Returns:
+            str: Response text
+
+        Raises:
+            TimeoutError: If the call takes longer than its `timeout` keyword argument
+            FakeLLMError: If the call was drawn to fail
+        """
+        tokens = self._respond(self._full_prompt(prompt, kwargs))
+        first_token, fails = self._start_call(prompt)
+        delay = first_token if fails else first_token + self._token_delay() * len(tokens)
+        timeout = kwargs.get('timeout')
+        time.sleep(self._capped(delay, timeout))
+        self._after_wait(delay, timeout, fails)
+        self._finish_call(tokens)
+        return "".join(tokens)
+
+    async def apredict(self, prompt: str, **kwargs: Any) -> str:
+        """
+        Asynchronously generate a complete response.
+
+        Args:
+            prompt: Prompt sent to the model
+
+        Returns:
+            str: Response text
+
+        Raises:
+            TimeoutError: If the call takes longer than its `timeout` keyword argument
+            FakeLLMError: If the call was drawn to fail
+        """
+        tokens = self._respond(self._full_prompt(prompt, kwargs))
+        first_token, fails = self._start_call(prompt)
+        delay = first_token if fails else first_token + self._token_delay() * len(tokens)
+        timeout = kwargs.get('timeout')
+        await asyncio.sleep(self._capped(delay, timeout))
+        self._after_wait(delay, timeout, fails)
+        self._finish_call(tokens)
+        return "".join(tokens)
+
+    def stream(self, prompt: str, **kwargs: Any) -> Iterator[FakeChunk]:
+        """
+        Generate a response token by token.
+
+        Args:
+            prompt: Prompt sent to the model
+
+        Yields:
+            FakeChunk: One token at a time
+        """
+        tokens = self._respond(self._full_prompt(prompt, kwargs))
+        first_token, fails = self._start_call(prompt)
+        timeout = kwargs.get('timeout')
+        time.sleep(self._capped(first_token, timeout))
+        self._after_wait(first_token, timeout, fails)
+        for token in tokens:
+            yield FakeChunk(token)
+            time.sleep(self._token_delay())
+        self._finish_call(tokens)
+
+    async def astream(self, prompt: str, **kwargs: Any) -> AsyncIterator[FakeChunk]:
+        """
+        Asynchronously generate a response token by token.
+
+        Args:
+            prompt: Prompt sent to the model
+
+        Yields:
+            FakeChunk: One token at a time
+        """
+        tokens = self._respond(self._full_prompt(prompt, kwargs))
+        first_token, fails = self._start_call(prompt)
+        timeout = kwargs.get('timeout')
+        await asyncio.sleep(self._capped(first_token, timeout))
+        self._after_wait(first_token, timeout, fails)
+        for token in tokens:
+            yield FakeChunk(token)
+            await asyncio.sleep(self._token_delay())
+        self._finish_call(tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the traffic the fake model has received.
+
+        Returns:
+            Dict: Call, failure and timeout counts, prompt/response byte totals
+                  and stored prefixes
+        """
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'prompt_bytes': self.prompt_bytes,
+            'response_bytes': self.response_bytes,
+            'cached_contents': self.cached_contents,
+            'prefix_bytes': self.prefix_bytes
+        }
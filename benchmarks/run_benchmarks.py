@@ -0,0 +1,270 @@
+"""
+Offline benchmark suite for the loan counselor agent.
+
+Replaces the Gemini model created in `LoanCounselorAgent._initialize_llm` with
+the deterministic `FakeLLM`, drives the agent and the Flask `/chat` route at a
+configurable concurrency and conversation length, and reports latency
+percentiles, throughput, prompt bytes and RSS growth. No network access or
+API key is needed. Run it from the repository root:
+
+    python -m benchmarks.run_benchmarks --users 64 --turns 4 --concurrency 16
+"""
+import os
+import argparse
+import json
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from benchmarks.fake_llm import LATENCY_DISTRIBUTIONS, FakeLLM
+from utils.followups import FOLLOWUP_MODE_LLM, FOLLOWUP_MODE_TEMPLATE, FOLLOWUP_MODES
+
+SCENARIOS = ("recommendation", "query", "report", "flask")
+DESTINATIONS = ("USA", "UK", "Canada", "Germany", "Australia")
+MESSAGES = (
+    "What loans can I get for my studies?",
+    "Which of these has the lowest interest rate?",
+    "Do I need collateral for that one?",
+    "How long does the application take?",
+    "What documents should I prepare?",
+    "Can I repay early without a penalty?"
+)
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Parse command-line options.
+
+    Args:
+        argv: Command-line arguments
+
+    Returns:
+        argparse.Namespace: Parsed options
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the loan counselor offline.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--users", type=int, default=32, help="Number of simulated students")
+    parser.add_argument("--turns", type=int, default=3, help="Conversation length per student")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent students")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Median model latency")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--response-cache", choices=("none", "memory", "sqlite"), default="none",
+                        help="Response cache backend used during the run")
+    parser.add_argument("--response-mode", choices=("separate", "structured"), default="separate",
+                        help="Two model calls per turn, or one structured call")
+    parser.add_argument("--followup-mode", choices=FOLLOWUP_MODES, default=FOLLOWUP_MODE_TEMPLATE,
+                        help="How the recommendation and flask scenarios get follow-up questions; "
+                             "the query scenario always has the model write them")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    return parser.parse_args(argv)
+
+def current_rss_bytes() -> int:
+    """
+    Return the resident set size of this process.
+
+    Returns:
+        int: RSS in bytes (peak RSS where the current value is unavailable)
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Linearly interpolated percentile of sorted values.
+
+    Args:
+        sorted_values: Values in ascending order
+        fraction: Percentile as a fraction (0.95 for p95)
+
+    Returns:
+        float: The percentile, or 0 if there are no values
+    """
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def student_profile(index: int) -> Dict[str, Any]:
+    """
+    Build a deterministic student profile.
+
+    Args:
+        index: Student number
+
+    Returns:
+        Dict: Student details accepted by the /chat endpoint
+    """
+    return {
+        'name': f"Student {index}",
+        'origin_country': "India",
+        'destination_country': DESTINATIONS[index % len(DESTINATIONS)],
+        'loan_amount_needed': 20000 + 5000 * (index % 12),
+        'course_of_study': "MS Computer Science"
+    }
+
+def run_scenario(name: str, users: List[int], concurrency: int, llm: FakeLLM,
+                 conversation: Callable[[int, Callable[[Callable[[], Any]], None]], None]) -> Dict[str, Any]:
+    """
+    Run one scenario and measure it.
+
+    Args:
+        name: Scenario name
+        users: Student numbers to simulate
+        concurrency: Number of students served concurrently
+        llm: Fake model serving the scenario (for traffic counters)
+        conversation: Runs one student's requests, passing each request to
+                      the timing callback it is given
+
+    Returns:
+        Dict: Latency percentiles, throughput, model traffic and RSS growth
+    """
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def timed(request: Callable[[], Any]) -> None:
+        started = time.perf_counter()
+        request()
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+
+    calls_before, bytes_before = llm.calls, llm.prompt_bytes
+    rss_before = current_rss_bytes()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda user: conversation(user, timed), users))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    requests = len(latencies)
+    return {
+        'scenario': name,
+        'requests': requests,
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p95_ms': 1000 * percentile(latencies, 0.95),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+        'throughput_rps': requests / elapsed if elapsed else 0.0,
+        'llm_calls': llm.calls - calls_before,
+        'prompt_bytes_per_request': (llm.prompt_bytes - bytes_before) / requests if requests else 0.0,
+        'rss_growth_mb': (current_rss_bytes() - rss_before) / (1024 * 1024)
+    }
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    """
+    Print benchmark results as a table.
+
+    Args:
+        results: One result per scenario
+    """
+    header = (f"{'scenario':<15}{'requests':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'req/s':>10}{'llm calls':>11}{'prompt B/req':>14}{'RSS +MB':>10}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(f"{result['scenario']:<15}{result['requests']:>9}{result['p50_ms']:>10.1f}"
+              f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['throughput_rps']:>10.1f}"
+              f"{result['llm_calls']:>11}{result['prompt_bytes_per_request']:>14.0f}"
+              f"{result['rss_growth_mb']:>10.1f}")
+
+def main(argv: List[str]) -> List[Dict[str, Any]]:
+    """
+    Run the selected benchmark scenarios.
+
+    Args:
+        argv: Command-line arguments
+
+    Returns:
+        List[Dict]: One result per scenario
+    """
+    args = parse_args(argv)
+
+    # The agent refuses to start without model settings; the values are never used
+    os.environ.setdefault("GOOGLE_GENAI_MODEL", "fake-gemini")
+    os.environ.setdefault("GOOGLE_GENAI_API_KEY", "offline")
+    os.environ["RESPONSE_CACHE_BACKEND"] = args.response_cache
+
+    def make_llm(model: str, api_key: str, temperature: float) -> FakeLLM:
+        return FakeLLM(
+            latency_ms=args.latency_ms,
+            latency_distribution=args.latency_distribution,
+            latency_sigma=args.latency_sigma,
+            tokens_per_second=args.tokens_per_second,
+            response_tokens=args.response_tokens,
+            seed=args.seed,
+            temperature=temperature
+        )
+
+    from loan_counselor_agent import LoanCounselorAgent
+    LoanCounselorAgent._initialize_llm = staticmethod(make_llm)
+
+    import app as flask_app
+    from langsmith import utils as langsmith_utils
+    # app.py switches LangSmith tracing on; keep the run offline
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    langsmith_utils.get_env_var.cache_clear()
+
+    counselor = flask_app.get_counselor()
+    llm = counselor.llm
+    users = list(range(args.users))
+
+    def recommendation(user: int, timed: Callable[[Callable[[], Any]], None]) -> None:
+        for turn in range(args.turns):
+            timed(lambda: counselor.get_loan_recommendation(
+                dict(student_profile(user)), MESSAGES[turn % len(MESSAGES)], f"student-{user}",
+                response_mode=args.response_mode
+            ))
+
+    def query(user: int, timed: Callable[[Callable[[], Any]], None]) -> None:
+        timed(lambda: counselor.get_query_recommendation(MESSAGES[user % len(MESSAGES)], f"student-{user}"))
+
+    def report(user: int, timed: Callable[[Callable[[], Any]], None]) -> None:
+        timed(lambda: counselor.get_user_report(f"student-{user}"))
+
+    def flask_chat(user: int, timed: Callable[[Callable[[], Any]], None]) -> None:
+        client = flask_app.app.test_client()
+        for turn in range(args.turns):
+            timed(lambda: client.post('/chat', json={
+                'userId': f"flask-student-{user}",
+                'message': MESSAGES[turn % len(MESSAGES)],
+                'student_details': student_profile(user),
+                'response_mode': args.response_mode
+            }))
+
+    conversations = {
+        'recommendation': recommendation,
+        'query': query,
+        'report': report,
+        'flask': flask_chat
+    }
+    results = []
+    for name in SCENARIOS:
+        if name not in args.scenarios:
+            continue
+        # The query scenario measures the model call behind follow-up
+        # questions, which the template mode does not make
+        counselor.followup_mode = FOLLOWUP_MODE_LLM if name == "query" else args.followup_mode
+        results.append(run_scenario(name, users, args.concurrency, llm, conversations[name]))
+
+    print_results(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as output:
+            json.dump({'options': vars(args), 'results': results}, output, indent=2)
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
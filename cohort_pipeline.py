@@ -0,0 +1,468 @@
+"""
+This is the command-line entry point for precomputing first-turn
+recommendations of a whole cohort offline.
+
+It streams a CSV or JSONL file of student profiles through the loan counselor
+agent and writes one JSON line per student to an output file as results
+complete:
+
+    python cohort_pipeline.py students.csv --output recommendations.jsonl
+
+The pipeline is a chain of generators, so memory stays small however large
+the input is: rows are parsed and validated one at a time, and only one
+chunk of `--chunk-size` students is in flight. Beyond that, only the userIds
+seen so far are kept, to reject a student who appears twice, as `/chat/batch`
+does within a batch. Each chunk is sent to
+`LoanCounselorAgent.get_loan_recommendations_batch`, which matches lenders,
+builds the prompts, sends identical prompts to the model once and runs the
+model calls on a worker pool within the admission limit. Output lines have
+the format of the `/chat/batch` endpoint, with `index` being the row's
+position in the input file.
+
+After every chunk the output is flushed to disk and a checkpoint recording
+the next input position and the output size is written next to the output
+file. A run that crashed or was interrupted is resumed from the checkpoint
+by running the same command again: output written after the checkpoint is
+truncated and at most one chunk is redone. Without a checkpoint, an existing
+non-empty output is left alone unless `--restart` is given, which ignores
+the checkpoint and overwrites the output.
+
+Students whose generation failed (a 503 or 500 line) are listed in the
+checkpoint. Running the command again with `--retry-errors` first sends
+those students again, appending a new line for each; the last line for an
+index is the one that counts. Students that fail again stay listed.
+
+CSV files have one column per student detail, plus optional `userId` and
+`message` columns. JSONL files hold either `/chat` request bodies
+(`{"userId", "message", "student_details"}`) or flat profiles like the CSV
+rows. Students without a userId are named after their row, and students
+without a message are sent `--message`.
+"""
+import os
+import argparse
+import csv
+import json
+import logging
+import sys
+import tempfile
+import time
+from http import HTTPStatus
+from itertools import islice
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from app import REQUEST_TIMEOUT_SECONDS, format_ndjson, validate_request_data
+from utils.structured_response import RESPONSE_MODES
+
+logger = logging.getLogger("cohort_pipeline")
+
+DEFAULT_MESSAGE = "Which education loans would you recommend for me?"
+
+# Bump when the layout of the checkpoint changes, so that older ones are refused
+CHECKPOINT_FORMAT = 2
+
+class Student(NamedTuple):
+    """
+    One row of the input file, shaped like a /chat request.
+
+    Attributes:
+        position: Row number in the input file, starting at 0
+        request: {"userId", "message", "student_details"} request body, or
+                 None if the row could not be parsed
+    """
+    position: int
+    request: Optional[Dict[str, Any]]
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Parse command-line options.
+
+    Args:
+        argv: Command-line arguments
+
+    Returns:
+        argparse.Namespace: Parsed options
+    """
+    parser = argparse.ArgumentParser(description="Precompute first-turn recommendations for a cohort.")
+    parser.add_argument("input", help="CSV or JSONL file of student profiles")
+    parser.add_argument("--output", required=True, help="JSONL file the results are appended to")
+    parser.add_argument("--checkpoint", help="Checkpoint file (defaults to the output path plus .checkpoint)")
+    parser.add_argument("--chunk-size", type=int, default=256,
+                        help="Students in flight at once, and between checkpoints")
+    parser.add_argument("--concurrency", type=int,
+                        help="Students generated at once (defaults to LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT_SECONDS,
+                        help="Time budget for each student in seconds")
+    parser.add_argument("--response-mode", choices=RESPONSE_MODES,
+                        help="Response mode (defaults to RESPONSE_MODE)")
+    parser.add_argument("--message", default=DEFAULT_MESSAGE, help="Message for students without one")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the checkpoint and overwrite the output")
+    parser.add_argument("--retry-errors", action="store_true",
+                        help="First send again the students whose generation failed in earlier runs")
+    return parser.parse_args(argv)
+
+def read_rows(path: str) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    Read the records of a CSV or JSONL file one at a time.
+
+    Blank JSONL lines are kept as empty records, so that positions match
+    line numbers.
+
+    Args:
+        path: Location of the input file (.csv, .jsonl or .ndjson)
+
+    Yields:
+        Optional[Dict]: One record per row (None for a JSONL line that is not
+                        a JSON object); empty CSV cells are left out
+
+    Raises:
+        ValueError: If the file type is not supported
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, encoding="utf-8", newline="") as rows:
+            for row in csv.DictReader(rows):
+                yield {field: value for field, value in row.items() if field and value not in (None, "")}
+    elif extension in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as rows:
+            for line in rows:
+                if not line.strip():
+                    yield {}
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield record if isinstance(record, dict) else None
+    else:
+        raise ValueError(f"Unsupported cohort file format: {path}")
+
+def to_request(record: Dict[str, Any], position: int, default_message: str) -> Dict[str, Any]:
+    """
+    Shape an input record as a /chat request body.
+
+    Args:
+        record: Parsed row
+        position: Row number in the input file
+        default_message: Message for records without one
+
+    Returns:
+        Dict: {"userId", "message", "student_details"} request body
+    """
+    if 'student_details' in record:
+        student_details = record['student_details']
+    else:
+        student_details = {key: value for key, value in record.items() if key not in ('userId', 'message')}
+    return {
+        'userId': str(record.get('userId') or f"row-{position}"),
+        'message': record.get('message') or default_message,
+        'student_details': student_details
+    }
+
+def read_students(path: str, start: int, default_message: str,
+                  positions: Optional[Set[int]] = None) -> Iterator[Student]:
+    """
+    Parse the students of the input file, skipping those already done.
+
+    Args:
+        path: Location of the input file
+        start: Position of the first student to return
+        default_message: Message for students without one
+        positions: Only return the students at these positions, if given
+
+    Yields:
+        Student: Each remaining row as a /chat request
+    """
+    for position, record in enumerate(read_rows(path)):
+        if position >= start and (positions is None or position in positions):
+            yield Student(position, None if record is None else to_request(record, position, default_message))
+
+def chunks(students: Iterator[Student], size: int) -> Iterator[List[Student]]:
+    """
+    Group students into chunks.
+
+    Args:
+        students: Students in input order
+        size: Students per chunk
+
+    Yields:
+        List[Student]: Up to `size` consecutive students
+    """
+    while True:
+        chunk = list(islice(students, size))
+        if not chunk:
+            return
+        yield chunk
+
+def input_signature(path: str) -> Dict[str, Any]:
+    """
+    Identify the version of the input file a checkpoint belongs to.
+
+    Args:
+        path: Location of the input file
+
+    Returns:
+        Dict: Absolute path, size and modification time of the file
+    """
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def read_checkpoint(checkpoint_path: str, signature: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Read the checkpoint of an earlier run over the same input.
+
+    Args:
+        checkpoint_path: Location of the checkpoint file
+        signature: Signature of the current input file
+
+    Returns:
+        Optional[Dict]: Next input position, output size, counts and failed
+                        positions, or None if there is no checkpoint
+
+    Raises:
+        ValueError: If the checkpoint is unreadable or belongs to another input
+    """
+    try:
+        with open(checkpoint_path, encoding="utf-8") as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except FileNotFoundError:
+        return None
+    if not isinstance(checkpoint, dict) or checkpoint.get('format') != CHECKPOINT_FORMAT:
+        raise ValueError(f"Checkpoint {checkpoint_path} is not readable; use --restart to start over")
+    if checkpoint.get('input') != signature:
+        raise ValueError(
+            f"Checkpoint {checkpoint_path} belongs to another version of the input; use --restart to start over"
+        )
+    return checkpoint
+
+def write_checkpoint(checkpoint_path: str, checkpoint: Dict[str, Any]) -> None:
+    """
+    Write the checkpoint, atomically.
+
+    Args:
+        checkpoint_path: Location of the checkpoint file
+        checkpoint: Input signature, next input position, output size, counts
+                    and failed positions
+    """
+    directory = os.path.dirname(os.path.abspath(checkpoint_path))
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, checkpoint_path)
+    except OSError:
+        try:
+            os.unlink(temporary_path)
+        except OSError:
+            pass
+        raise
+
+def check_request(request: Dict[str, Any], seen_users: Set[str]) -> Tuple[Dict[str, str], int]:
+    """
+    Validate a student as /chat/batch validates its items, and remember their userId.
+
+    Args:
+        request: The student's /chat request body
+        seen_users: UserIds of the students accepted so far; a valid student's is added
+
+    Returns:
+        Tuple[Dict[str, str], int]: Error response and HTTP status code if the
+                                    student is rejected, empty dict and OK otherwise
+    """
+    error_response, status_code = validate_request_data(request)
+    if not error_response and request['message'].lower() == 'reset':
+        error_response, status_code = {
+            'error': 'reset is not supported in a cohort file'
+        }, HTTPStatus.BAD_REQUEST
+    if not error_response and request['userId'] in seen_users:
+        error_response, status_code = {
+            'error': f"userId {request['userId']} appears more than once in the input"
+        }, HTTPStatus.BAD_REQUEST
+    if not error_response:
+        seen_users.add(request['userId'])
+    return error_response, status_code
+
+def seen_user_ids(path: str, end: int, default_message: str) -> Set[str]:
+    """
+    Collect the userIds accepted before a checkpoint, to resume duplicate checks.
+
+    Args:
+        path: Location of the input file
+        end: Position of the first student not yet processed
+        default_message: Message for students without one
+
+    Returns:
+        Set[str]: UserIds of the valid students before `end`
+    """
+    seen_users: Set[str] = set()
+    for student in islice(read_students(path, 0, default_message), end):
+        if student.request is not None:
+            check_request(student.request, seen_users)
+    return seen_users
+
+def process_chunk(counselor: Any, chunk: List[Student], args: argparse.Namespace,
+                  seen_users: Set[str]) -> Iterator[Tuple[str, int, str]]:
+    """
+    Validate a chunk of students and generate the recommendations of the valid ones.
+
+    Args:
+        counselor: The loan counselor agent
+        chunk: Students to process
+        args: Command-line options
+        seen_users: UserIds of the students accepted so far, updated with this chunk's
+
+    Yields:
+        Tuple[str, int, str]: Outcome ("ok", "invalid" or "error"), position
+                              and output line per student, invalid students
+                              first, then in completion order
+    """
+    accepted = []
+    positions = []
+    for student in chunk:
+        request = student.request
+        if request is None:
+            yield "invalid", student.position, format_ndjson(
+                student.position, None, {'error': 'Row is not a JSON object'}, HTTPStatus.BAD_REQUEST
+            )
+            continue
+        error_response, status_code = check_request(request, seen_users)
+        if error_response:
+            yield "invalid", student.position, format_ndjson(
+                student.position, request['userId'], error_response, status_code
+            )
+            continue
+        student_details = dict(request['student_details'], userId=request['userId'])
+        accepted.append((student_details, request['message'], request['userId']))
+        positions.append(student.position)
+
+    results = counselor.get_loan_recommendations_batch(
+        accepted,
+        max_concurrency=args.concurrency,
+        item_timeout=args.timeout,
+        response_mode=args.response_mode
+    )
+    for index, result in results:
+        user_id, position = accepted[index][2], positions[index]
+        if 'retry_after' in result:
+            yield "error", position, format_ndjson(position, user_id, {
+                'error': result['error'], 'retryAfter': result['retry_after']
+            }, HTTPStatus.SERVICE_UNAVAILABLE)
+        elif 'error' in result:
+            yield "error", position, format_ndjson(position, user_id, {
+                'error': result['error']
+            }, HTTPStatus.INTERNAL_SERVER_ERROR)
+        else:
+            yield "ok", position, format_ndjson(position, user_id, {'response': result}, HTTPStatus.OK)
+
+def run(args: argparse.Namespace, counselor: Any = None) -> Dict[str, int]:
+    """
+    Run the pipeline, resuming from the checkpoint if there is one.
+
+    Args:
+        args: Command-line options
+        counselor: Agent to use (defaults to a new LoanCounselorAgent)
+
+    Returns:
+        Dict[str, int]: Students processed in total, by outcome
+
+    Raises:
+        ValueError: If the checkpoint cannot be used, the output exists without
+                    a checkpoint, or the input format is unknown
+    """
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    signature = input_signature(args.input)
+    checkpoint = None if args.restart else read_checkpoint(checkpoint_path, signature)
+    counts = {'ok': 0, 'invalid': 0, 'error': 0}
+    failed: Set[int] = set()
+    if checkpoint is not None:
+        start, output_size = checkpoint['position'], checkpoint['output_bytes']
+        counts.update(checkpoint['counts'])
+        failed = set(checkpoint['failed'])
+        logger.info("Resuming %s from row %d", args.input, start)
+    else:
+        start, output_size = 0, 0
+        if not args.restart and os.path.exists(args.output) and os.path.getsize(args.output):
+            raise ValueError(
+                f"Output {args.output} already exists and has no checkpoint; use --restart to overwrite it"
+            )
+
+    if counselor is None:
+        from loan_counselor_agent import LoanCounselorAgent
+        counselor = LoanCounselorAgent()
+
+    if output_size and (not os.path.exists(args.output) or os.path.getsize(args.output) < output_size):
+        raise ValueError(f"Output {args.output} is shorter than its checkpoint; use --restart to start over")
+
+    seen_users = seen_user_ids(args.input, start, args.message) if start else set()
+    with open(args.output, "ab") as output:
+        # Lines written after the checkpoint belong to a chunk that is redone
+        output.truncate(output_size)
+        output.seek(output_size)
+        started = time.perf_counter()
+        done = 0
+
+        def process(students: Iterator[Student], position: int) -> None:
+            nonlocal done
+            for chunk in chunks(students, args.chunk_size):
+                for outcome, student_position, line in process_chunk(counselor, chunk, args, seen_users):
+                    output.write(line.encode("utf-8"))
+                    counts[outcome] += 1
+                    if outcome == "error":
+                        failed.add(student_position)
+                output.flush()
+                os.fsync(output.fileno())
+                done += len(chunk)
+                write_checkpoint(checkpoint_path, {
+                    'format': CHECKPOINT_FORMAT,
+                    'input': signature,
+                    'position': max(position, chunk[-1].position + 1),
+                    'output_bytes': output.tell(),
+                    'counts': counts,
+                    'failed': sorted(failed)
+                })
+                logger.info("Processed %d rows (%.1f/s): %d ok, %d invalid, %d errors",
+                            done, done / (time.perf_counter() - started),
+                            counts['ok'], counts['invalid'], counts['error'])
+
+        if args.retry_errors and failed:
+            logger.info("Retrying %d rows that failed", len(failed))
+
+            def retry_students() -> Iterator[Student]:
+                for student in read_students(args.input, 0, args.message, set(failed)):
+                    # Still listed, in the checkpoint, until the chunk holding
+                    # the student's new line is written
+                    failed.discard(student.position)
+                    counts['error'] -= 1
+                    if student.request is not None:
+                        # The userId was taken by this very student
+                        seen_users.discard(student.request['userId'])
+                    yield student
+
+            process(retry_students(), start)
+        process(read_students(args.input, start, args.message), start)
+    return counts
+
+def main(argv: List[str]) -> int:
+    """
+    Precompute the recommendations of a cohort file.
+
+    Args:
+        argv: Command-line arguments
+
+    Returns:
+        int: Exit status
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    args = parse_args(argv)
+    try:
+        counts = run(args)
+    except (OSError, ValueError) as e:
+        logger.error("%s", e)
+        return 1
+    print(json.dumps(counts))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
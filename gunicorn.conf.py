@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for the loan counselor API.
+
+The app is preloaded: the master imports it and builds the counselor's
+immutable shared state (lender catalog, prompt template, formatted lender
+blocks, and the LangChain modules behind them) once, then forks workers that
+share those pages copy-on-write. The objects are frozen out of the garbage
+collector first, so collections in the workers do not touch (and thereby copy)
+the shared pages. Each worker creates its own counselor on its first request.
+
+    gunicorn app:app
+"""
+import os
+import gc
+
+bind = os.getenv("GUNICORN_BIND", f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', '8000')}")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+preload_app = True
+
+def when_ready(server):
+    """
+    Build the shared state in the master, before any worker is forked.
+
+    Args:
+        server: Gunicorn arbiter
+    """
+    from app import warm_shared_state
+    warm_shared_state()
+    gc.freeze()
@@ -3,9 +3,15 @@ This module contains helper functions for formatting and displaying loan-related
 to students in a clear and understandable way.
 """
 
-from typing import Any, Dict, List
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Union
 
-def format_lenders_data(lenders: List[Dict[str, Any]]) -> str:
+from utils.lender_matching import Lender, as_lender
+
+def format_lenders_data(lenders: Sequence[Union[Lender, Dict[str, Any]]]) -> str:
     """
     Format loan provider information into a student-friendly display format.
     
@@ -17,28 +23,103 @@ def format_lenders_data(lenders: List[Dict[str, Any]]) -> str:
     - Geographic availability and currency
     
     Args:
-        lenders: List of dictionaries containing lender information
-                Each dictionary should have fields for name, interest rate,
-                maximum amount, etc.
+        lenders: Lenders from the catalog; plain dictionaries with the same
+                fields (name, interest rate, maximum amount, etc.) are
+                accepted too
     
     Returns:
         A formatted string containing all lender information, with each lender
         separated by newlines
     """
     formatted_data = []
-    for lender in lenders:
+    for lender in map(as_lender, lenders):
         lender_info = (
-            f"{lender['name']}:\n"
-            f"- Interest Rate: {lender['interest_rate']}\n"
-            f"- Maximum Amount: {lender['maximum_amount']}\n"
-            f"- About: {lender['about']}\n"
-            f"- Key Points: {', '.join(lender['key_points'])}\n"
-            f"- Currency: {lender['currency']}\n"
-            f"- Collateral Required: {lender['collateral_required']}\n"
-            f"- Non-Collateral Option: {lender['non_collateral_option']}\n"
-            f"- US Cosigner Required: {lender['us_cosigner_required']}\n"
-            f"- Country: {lender['country']}\n"
-            f"- University Country: {lender['university_country']}"
+            f"{lender.name}:\n"
+            f"- Interest Rate: {lender.interest_rate}\n"
+            f"- Maximum Amount: {lender.maximum_amount}\n"
+            f"- About: {lender.about}\n"
+            f"- Key Points: {', '.join(lender.key_points)}\n"
+            f"- Currency: {lender.currency}\n"
+            f"- Collateral Required: {lender.collateral_required}\n"
+            f"- Non-Collateral Option: {lender.non_collateral_option}\n"
+            f"- US Cosigner Required: {lender.us_cosigner_required}\n"
+            f"- Country: {lender.country}\n"
+            f"- University Country: {lender.university_country}"
         )
         formatted_data.append(lender_info)
-    return "\n\n".join(formatted_data)
\ No newline at end of file
+    return "\n\n".join(formatted_data)
+
+def lenders_fingerprint(lenders: Sequence[Union[Lender, Dict[str, Any]]]) -> str:
+    """
+    Compute a content hash that identifies one version of the lender catalog.
+
+    Two catalogs with the same lenders and details always produce the same
+    fingerprint, so it can be used to tell when the catalog actually changed.
+
+    Args:
+        lenders: Lenders, or dictionaries containing lender information
+
+    Returns:
+        Hex digest of the catalog contents
+    """
+    records = [as_lender(lender).to_dict() for lender in lenders]
+    payload = json.dumps(records, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class LenderContextCache:
+    """
+    Cache of formatted lender blocks, keyed on the catalog fingerprint.
+
+    The lender block sent to the model only changes when the catalog changes,
+    so it is rendered once per catalog version and reused on every turn.
+
+    Attributes:
+        maxsize (int): Maximum number of formatted blocks kept in the cache
+        hits (int): Number of lookups served from the cache
+        misses (int): Number of lookups that had to format the block
+    """
+    def __init__(self, maxsize: int = 128):
+        """
+        Initialize an empty lender context cache.
+
+        Args:
+            maxsize: Maximum number of formatted blocks kept in the cache
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._blocks: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, lenders: Sequence[Union[Lender, Dict[str, Any]]], fingerprint: Optional[str] = None) -> str:
+        """
+        Return the formatted lender block, rendering it only on a cache miss.
+
+        Args:
+            lenders: Lenders to format
+            fingerprint: Precomputed catalog fingerprint; computed from the
+                         lenders when not given
+
+        Returns:
+            The formatted lender block
+        """
+        key = fingerprint or lenders_fingerprint(lenders)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return block
+
+        block = format_lenders_data(lenders)
+        with self._lock:
+            self.misses += 1
+            self._blocks[key] = block
+            while len(self._blocks) > self.maxsize:
+                self._blocks.popitem(last=False)
+        return block
+
+    def clear(self) -> None:
+        """Drop every cached lender block."""
+        with self._lock:
+            self._blocks.clear()
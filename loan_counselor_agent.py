@@ -11,23 +11,228 @@ The LoanCounselorAgent uses AI models and conversation memory to:
 """
 import os
 import json
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Dict, Any, Optional
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import (
+    TYPE_CHECKING, List, Dict, Any, Awaitable, Callable, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+)
 from functools import lru_cache
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.memory import ConversationBufferMemory
 from langchain_core.prompts import PromptTemplate
-from langsmith import traceable
-from helpers import format_lenders_data
-from prompts import QUERY_RECOMMENDATION_PROMPT, INITIAL_PROMPT
-from utils.constant import LENDER_DATA
-# from vector_store.loan_recommendations import LoanRecommendationStore
+from helpers import LenderContextCache, lenders_fingerprint
+from prompts import (
+    QUERY_RECOMMENDATION_PROMPT,
+    INITIAL_PROMPT_PREFIX,
+    INITIAL_PROMPT_SUFFIX,
+    STRUCTURED_RESPONSE_SUFFIX,
+    CONVERSATION_SUMMARY_PROMPT,
+    SENTIMENT_UPDATE_PROMPT
+)
+from utils.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    DeadlineExceeded,
+    check_deadline,
+    OverloadError,
+    remaining_time,
+    request_deadline,
+    result_within_deadline
+)
+from utils.conversation_window import HISTORY_MODE_SUMMARY, HISTORY_MODES, RollingSummaryWindow
+from utils.followups import FOLLOWUP_MODE_TEMPLATE, FOLLOWUP_MODES, FollowUpGenerator
+from utils.lender_catalog import CatalogWatcher
+from utils.lender_matching import Lender, LenderMatcher
+from utils.memory_store import SessionMemoryStore
+from utils.metrics import DEFAULT_SIZE_BUCKETS, MetricsRegistry
+from utils.prompt_prefix import PromptAdapter, PromptParts, prompt_text
+from utils.report_cache import CachedReport, ReportCache, text_digest
+from utils.resilience import ResilientCaller
+from utils.response_cache import ResponseCache, make_cache_key
+from utils.singleflight import SingleFlight
+from utils.structured_response import (
+    RESPONSE_MODE_SEPARATE,
+    RESPONSE_MODE_STRUCTURED,
+    RESPONSE_MODES,
+    StructuredReply,
+    parse_structured_reply
+)
+from utils.tracing import traceable
+from utils.write_behind import WriteBehindQueue
+from vector_store.conversation_store import ConversationStore, StoredChatMessageHistory
+from vector_store.loan_recommendations import LoanRecommendationStore
 # from vector_store.lender_store import LenderStore
-# from vector_store.conversation_store import ConversationStore
+
+if TYPE_CHECKING:
+    from langchain_google_genai import ChatGoogleGenerativeAI
 
 load_dotenv()
 
+class ReportSection(NamedTuple):
+    """
+    An analysis included in user reports.
+
+    Attributes:
+        run: Computes the section from (conversation_text, conversation_history, user_id)
+        arun: Optional asynchronous version of `run`
+        update: Optionally updates a previous result from (previous_result,
+                new_turns_text, new_turns, user_id) instead of recomputing it
+        aupdate: Optional asynchronous version of `update`
+    """
+    run: Callable[[str, List[Any], str], Any]
+    arun: Optional[Callable[[str, List[Any], str], Awaitable[Any]]] = None
+    update: Optional[Callable[[Any, str, List[Any], str], Any]] = None
+    aupdate: Optional[Callable[[Any, str, List[Any], str], Awaitable[Any]]] = None
+
+class QueueDepthExecutor(ThreadPoolExecutor):
+    """
+    Thread pool that counts the tasks waiting for a worker thread.
+
+    Every way of using the pool (`submit`, `run_in_executor`) goes through
+    `submit`, so the count covers them all.
+
+    Attributes:
+        queued (int): Tasks submitted but not yet started or cancelled
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        """
+        Initialize the pool; takes the same arguments as ThreadPoolExecutor.
+        """
+        super().__init__(*args, **kwargs)
+        self.queued = 0
+        self._queued_lock = threading.Lock()
+
+    def _count(self, delta: int) -> None:
+        """
+        Change the number of waiting tasks.
+
+        Args:
+            delta: Amount to add
+        """
+        with self._queued_lock:
+            self.queued += delta
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> "Future[Any]":
+        """
+        Schedule a call, counting it as waiting until a worker starts it.
+
+        Args:
+            fn: Function to call
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            Future: The call's pending result
+        """
+        def start(*call_args: Any, **call_kwargs: Any) -> Any:
+            self._count(-1)
+            return fn(*call_args, **call_kwargs)
+
+        self._count(1)
+        try:
+            future = super().submit(start, *args, **kwargs)
+        except BaseException:
+            self._count(-1)
+            raise
+        # A task cancelled before it started never runs `start`
+        future.add_done_callback(lambda done: done.cancelled() and self._count(-1))
+        return future
+
+class SharedState(NamedTuple):
+    """
+    Immutable pieces every counselor in a process shares.
+
+    Built once per process, or once in the gunicorn master before it forks
+    when the app is preloaded, so that workers share these pages
+    copy-on-write instead of each building a copy of their own. When the
+    lender catalog changes, a complete new state is built and swapped in;
+    a request keeps the state it started with.
+
+    Attributes:
+        version: Catalog version, increased by every reload
+        lenders: Lender catalog
+        lenders_version: Content fingerprint of the catalog
+        lender_context: Formatted lender blocks per catalog version and selection
+        lender_matcher: Filters and ranks lenders for each student
+        prompt_prefix: Template of the cacheable head of the recommendation prompt
+        prompt_suffix: Template of the per-turn tail of the recommendation prompt
+        structured_suffix: Tail asking for the response and follow-up questions as JSON
+        followups: Suggests follow-up questions about the catalog's lenders without the model
+    """
+    version: int
+    lenders: List[Lender]
+    lenders_version: str
+    lender_context: LenderContextCache
+    lender_matcher: LenderMatcher
+    prompt_prefix: PromptTemplate
+    prompt_suffix: PromptTemplate
+    structured_suffix: PromptTemplate
+    followups: FollowUpGenerator
+
+def _build_shared_state(lenders: List[Lender], catalog_version: int,
+                        previous: Optional[SharedState] = None) -> SharedState:
+    """
+    Build the shared state for a catalog, including the lender blocks most prompts use.
+
+    The fallback block sent when no lender matches is rendered up front.
+    When the state replaces an older one, the students the older catalog
+    matched most recently are matched again and their blocks rendered too,
+    so a reloaded catalog serves its first requests as fast as the one it
+    replaces. The lender block cache holds as many blocks as the matcher
+    remembers students, so this never evicts what it has just rendered.
+
+    Args:
+        lenders: Lender catalog
+        catalog_version: Version number of the catalog
+        previous: State of the catalog being replaced, if any
+
+    Returns:
+        SharedState: The shared state of this catalog version
+    """
+    version = lenders_fingerprint(lenders)
+    lender_matcher = LenderMatcher(lenders)
+    lender_context = LenderContextCache(maxsize=lender_matcher.recent_size + 1)
+    top_n = int(os.getenv("LENDER_MATCH_TOP_N", "5"))
+    seen = previous.lender_matcher.recent_inputs() if previous is not None else []
+    for inputs in [LenderMatcher.match_inputs({})] + seen:
+        selection = lender_matcher.match_parsed(inputs, top_n)
+        lender_context.get(selection, f"{version}:{','.join(lender.name for lender in selection)}")
+    prompt_prefix, prompt_suffix, structured_suffix = LoanCounselorAgent._initialize_prompt_templates()
+    return SharedState(
+        version=catalog_version,
+        lenders=lenders,
+        lenders_version=version,
+        lender_context=lender_context,
+        lender_matcher=lender_matcher,
+        prompt_prefix=prompt_prefix,
+        prompt_suffix=prompt_suffix,
+        structured_suffix=structured_suffix,
+        followups=FollowUpGenerator(lender.name for lender in lenders)
+    )
+
+@lru_cache(maxsize=1)
+def lender_catalog() -> CatalogWatcher:
+    """
+    Return the process-wide lender catalog, loading it on first use.
+
+    Returns:
+        CatalogWatcher: Watcher holding the current shared state
+    """
+    return CatalogWatcher.from_env(_build_shared_state)
+
+def warm_shared_state() -> SharedState:
+    """
+    Build the shared state of the current catalog, if not built yet.
+
+    Returns:
+        SharedState: The current process-wide shared state
+    """
+    return lender_catalog().current()
+
 class LoanCounselorAgent:
     """
     An AI-powered loan counselor that helps students understand their loan options.
@@ -40,18 +245,58 @@ class LoanCounselorAgent:
     - Storing conversation history and recommendations for future reference
 
     Attributes:
-        lenders (List[Dict]): Available loan providers and their details
+        catalog (CatalogWatcher): Reloads the lender catalog and holds its current SharedState
+        lenders (List[Lender]): Available loan providers and their details
+        lenders_version (str): Content fingerprint of the loaded lender catalog
+        lender_context (LenderContextCache): Formatted lender blocks per catalog version
+        lender_matcher (LenderMatcher): Filters and ranks lenders for each student
+        lender_match_top_n (int): Number of matching lenders included in the prompt
         llm (ChatOpenAI): The AI language model for generating responses
-        memory (Dict): Stores conversation history for each user
-        recommendation_store (LoanRecommendationStore): Database of past recommendations
+        memory (SessionMemoryStore): Stores conversation history for each user,
+                                     evicting idle sessions to stay within bounds
+        history_mode (str): "buffer" sends the full transcript, "summary" sends a
+                            running summary plus the most recent turns
+        history_window (RollingSummaryWindow): Summary window used in "summary" mode
+        response_cache (ResponseCache): Exact-match cache of model responses, if enabled
+        recommendation_store (LoanRecommendationStore): Semantic cache of past first-turn
+                                                        recommendations, if enabled
         lender_store (LenderStore): Searchable database of lenders
-        conversation_store (ConversationStore): Stores full conversation histories
-        executor (ThreadPoolExecutor): Handles parallel processing tasks
+        conversation_store (ConversationStore): Stores full conversation histories shared
+                                                by all workers, if configured
+        conversation_writer (WriteBehindQueue): Batches writes to the conversation store
+        executor (QueueDepthExecutor): Handles parallel processing tasks
+        report_sections (Dict[str, ReportSection]): Analyses included in user reports
+        report_cache (ReportCache): Latest report per user, updated incrementally
+        metrics (MetricsRegistry): Per-stage latencies, model traffic and cache counters
+        admission (AdmissionController): Limits concurrent model calls and queued callers
+        single_flight (SingleFlight): Coalesces identical model calls that are in flight
+        resilience (ResilientCaller): Retries and hedges model calls
+        prompt_adapter (PromptAdapter): Sends the cacheable prompt prefix by handle
+                                        where the model supports it
+        response_mode (str): "separate" generates the response and follow-up questions
+                             in two model calls, "structured" in one
+        followup_mode (str): "template" suggests follow-up questions from a local
+                             template bank, "llm" asks the model for them
     """
     def __init__(self,
                  model: Optional[str] = None,
                  api_key: Optional[str] = None,
-                 temperature: float = 0.6):
+                 temperature: float = 0.6,
+                 lender_match_top_n: Optional[int] = None,
+                 memory_store: Optional[SessionMemoryStore] = None,
+                 history_mode: Optional[str] = None,
+                 history_window_turns: Optional[int] = None,
+                 history_token_budget: Optional[int] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 recommendation_store: Optional[LoanRecommendationStore] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 admission: Optional[AdmissionController] = None,
+                 single_flight: Optional[SingleFlight] = None,
+                 resilience: Optional[ResilientCaller] = None,
+                 conversation_store: Optional[ConversationStore] = None,
+                 prompt_adapter: Optional[PromptAdapter] = None,
+                 response_mode: Optional[str] = None,
+                 followup_mode: Optional[str] = None):
         """
         Initialize the loan counselor with necessary components.
 
@@ -59,24 +304,140 @@ class LoanCounselorAgent:
             model: The AI model name to use (defaults to environment variable)
             api_key: API key for the AI service (defaults to environment variable)
             temperature: Controls randomness in AI responses (0.0 to 1.0)
+            lender_match_top_n: Number of best-matching lenders sent to the model
+                                (defaults to environment variable, then 5)
+            memory_store: Store for per-user conversation memory (defaults to a
+                          bounded store configured from environment variables)
+            history_mode: "buffer" or "summary" (defaults to environment variable,
+                          then "buffer")
+            history_window_turns: Recent turns kept verbatim in "summary" mode
+            history_token_budget: Approximate token budget for the history in
+                                  "summary" mode
+            response_cache: Cache placed in front of the model (defaults to a cache
+                            configured from environment variables)
+            recommendation_store: Semantic cache for first-turn questions (defaults
+                                  to a store configured from environment variables)
+            metrics: Registry the agent records its metrics in (defaults to a new one)
+            admission: Admission controller placed around model calls (defaults to
+                       one configured from environment variables)
+            single_flight: Coalescing layer for identical concurrent prompts
+                           (defaults to a new one)
+            resilience: Retry and hedging policy for model calls (defaults to one
+                        configured from environment variables)
+            conversation_store: Durable store for conversation histories (defaults
+                                to one configured from environment variables;
+                                histories stay in process memory when unset)
+            prompt_adapter: Decides how prompt prefixes are sent to the model
+                            (defaults to one suited to the model, configured
+                            from environment variables)
+            response_mode: Default response mode, "separate" or "structured"
+                           (defaults to the RESPONSE_MODE environment variable)
+            followup_mode: How follow-up questions are generated in the "separate"
+                           response mode, "template" or "llm" (defaults to the
+                           FOLLOWUP_MODE environment variable)
+
+        Raises:
+            ValueError: If the history mode, response mode or follow-up mode is unknown
         """
-        self.lenders = self.load_lenders()
+        self.catalog = lender_catalog()
+        # Started here rather than with the shared state, so that only
+        # workers watch the catalog file, not the gunicorn master
+        self.catalog.start()
+        self.lender_match_top_n = lender_match_top_n or int(os.getenv("LENDER_MATCH_TOP_N", "5"))
         self.llm = self._initialize_llm(
             model=os.getenv("GOOGLE_GENAI_MODEL"),
             api_key=os.getenv("GOOGLE_GENAI_API_KEY"), 
             temperature=temperature
         )
-        self.memory: Dict[str, ConversationBufferMemory] = {}
-        self.prompt_template = self._initialize_prompt_template()
-        self.recommendation_store = None
-        # self.recommendation_store = LoanRecommendationStore()
+        self.conversation_store = (
+            conversation_store if conversation_store is not None
+            else ConversationStore.from_env()
+        )
+        self.memory = (
+            memory_store if memory_store is not None
+            else SessionMemoryStore.from_env(self._create_memory)
+        )
+        self.memory.start()
+        self.conversation_writer = None
+        if self.conversation_store is not None:
+            self.conversation_writer = WriteBehindQueue.from_env(self.conversation_store.append_many)
+            # Every turn is already durable, so evicted sessions need no spilling
+            self.memory.spill_store = None
+        self.history_mode = history_mode or os.getenv("HISTORY_MODE", "buffer")
+        if self.history_mode not in HISTORY_MODES:
+            raise ValueError(f"History mode must be one of: {', '.join(HISTORY_MODES)}")
+        self.history_window = None
+        if self.history_mode == HISTORY_MODE_SUMMARY:
+            self.history_window = RollingSummaryWindow(
+                summarize=self._summarize_lines,
+                window_turns=history_window_turns or int(os.getenv("HISTORY_WINDOW_TURNS", "4")),
+                token_budget=history_token_budget or int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+            )
+        self.response_mode = response_mode or os.getenv("RESPONSE_MODE", RESPONSE_MODE_SEPARATE)
+        if self.response_mode not in RESPONSE_MODES:
+            raise ValueError(f"Response mode must be one of: {', '.join(RESPONSE_MODES)}")
+        self.followup_mode = followup_mode or os.getenv("FOLLOWUP_MODE", FOLLOWUP_MODE_TEMPLATE)
+        if self.followup_mode not in FOLLOWUP_MODES:
+            raise ValueError(f"Follow-up mode must be one of: {', '.join(FOLLOWUP_MODES)}")
+        self.response_cache = response_cache if response_cache is not None else ResponseCache.from_env()
+        self.recommendation_store = (
+            recommendation_store if recommendation_store is not None
+            else LoanRecommendationStore.from_env()
+        )
         # self.lender_store = LenderStore()
         # self.lender_store.index_lenders(self.lenders)
-        # self.conversation_store = ConversationStore()
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.admission = admission if admission is not None else AdmissionController.from_env()
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
+        # Abandoned and hedged attempts keep their threads until the model
+        # answers, so a pool smaller than the number of attempts the admission
+        # controller lets run or wait would delay fresh attempts behind them
+        self.resilience = resilience if resilience is not None else ResilientCaller.from_env(
+            pool_size=self.admission.max_concurrency + self.admission.max_queue
+        )
+        self.prompt_adapter = prompt_adapter if prompt_adapter is not None else PromptAdapter.from_env(self.llm)
+        # Each recommendation runs two model calls on the pool, so it is sized
+        # for the admission limit rather than becoming a hidden second limit
+        self.executor = QueueDepthExecutor(max_workers=max(4, 2 * self.admission.max_concurrency))
+        self.report_sections: Dict[str, ReportSection] = {
+            'sentiment_analysis': ReportSection(
+                lambda text, history, _: self.analyze_sentiment(history, text),
+                lambda text, history, _: self.aanalyze_sentiment(history, text),
+                lambda previous, new_text, *_: self.update_sentiment(previous, new_text),
+                lambda previous, new_text, *_: self.aupdate_sentiment(previous, new_text)
+            ),
+            'user_summary': ReportSection(
+                lambda text, history, user_id: self.generate_user_summary(history, user_id, text),
+                lambda text, history, user_id: self.agenerate_user_summary(history, user_id, text),
+                lambda previous, new_text, *_: self.update_user_summary(previous, new_text),
+                lambda previous, new_text, *_: self.aupdate_user_summary(previous, new_text)
+            )
+        }
+        self.report_cache = ReportCache()
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self._initialize_metrics()
+
+    @property
+    def lenders(self) -> List[Lender]:
+        """Lenders of the current catalog version."""
+        return self.catalog.current().lenders
+
+    @property
+    def lenders_version(self) -> str:
+        """Content fingerprint of the current catalog version."""
+        return self.catalog.current().lenders_version
+
+    @property
+    def lender_context(self) -> LenderContextCache:
+        """Formatted lender blocks of the current catalog version."""
+        return self.catalog.current().lender_context
+
+    @property
+    def lender_matcher(self) -> LenderMatcher:
+        """Lender matcher of the current catalog version."""
+        return self.catalog.current().lender_matcher
 
     @staticmethod
-    def _initialize_llm(model: str, api_key: str, temperature: float) -> ChatGoogleGenerativeAI:
+    def _initialize_llm(model: str, api_key: str, temperature: float) -> "ChatGoogleGenerativeAI":
         """
         Initialize the AI language model.
 
@@ -93,283 +454,1949 @@ class LoanCounselorAgent:
         """
         if not model or not api_key:
             raise ValueError("Model and API key must be provided")
+        # Imported here: the Gemini client is slow to import and not needed
+        # until a counselor is actually created
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        # The client retries on its own (`max_retries` counts its attempts,
+        # six by default), which would multiply with ResilientCaller's
+        # retries; when those are enabled the client makes a single attempt
+        client_attempts = 1 if int(os.getenv("LLM_MAX_RETRIES", "2")) > 0 else 6
         return ChatGoogleGenerativeAI(
             model=os.getenv("GOOGLE_GENAI_MODEL"),
             temperature=temperature,
-            api_key=os.getenv("GOOGLE_GENAI_API_KEY")
+            api_key=os.getenv("GOOGLE_GENAI_API_KEY"),
+            max_retries=client_attempts
         )
 
-    def get_user_memory(self, user_id: str) -> ConversationBufferMemory:
+    def _initialize_metrics(self) -> None:
         """
-        Get or create conversation memory for a specific user.
+        Register the agent's metrics.
+
+        Queue depth and session count are read from the executor and the
+        memory store when the metrics are rendered, so they cost nothing
+        per request.
+        """
+        self._llm_calls = self.metrics.counter(
+            "counselor_llm_calls_total", "Calls made to the language model", ("mode",)
+        )
+        self._llm_seconds = self.metrics.histogram(
+            "counselor_llm_call_seconds", "Latency of language model calls in seconds", ("mode",)
+        )
+        self._llm_prompt_bytes = self.metrics.histogram(
+            "counselor_llm_prompt_bytes", "Size of prompts sent to the language model",
+            buckets=DEFAULT_SIZE_BUCKETS
+        )
+        self._llm_response_bytes = self.metrics.histogram(
+            "counselor_llm_response_bytes", "Size of language model responses",
+            buckets=DEFAULT_SIZE_BUCKETS
+        )
+        self._cache_lookups = self.metrics.counter(
+            "counselor_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result")
+        )
+        self._structured_replies = self.metrics.counter(
+            "counselor_structured_replies_total",
+            "Structured model replies by whether they parsed or fell back to two calls", ("result",)
+        )
+        self._batch_items = self.metrics.counter(
+            "counselor_batch_items_total",
+            "Batch items by whether they were generated, shared an identical item's result or failed",
+            ("result",)
+        )
+        self.metrics.gauge(
+            "counselor_executor_queue_depth", "Tasks waiting for a worker thread",
+            callback=lambda: self.executor.queued
+        )
+        self.metrics.gauge(
+            "counselor_active_sessions", "Conversations held in memory",
+            callback=lambda: len(self.memory)
+        )
+        self.metrics.gauge(
+            "counselor_llm_inflight", "Model calls holding an admission slot",
+            callback=lambda: self.admission.active
+        )
+        self.metrics.gauge(
+            "counselor_llm_waiting", "Model calls waiting for an admission slot",
+            callback=lambda: self.admission.waiting
+        )
+        self.metrics.counter(
+            "counselor_llm_rejected_total", "Model calls rejected because the wait queue was full",
+            callback=lambda: self.admission.rejected
+        )
+        self.metrics.counter(
+            "counselor_llm_coalesced_total", "Model calls saved by sharing an identical in-flight call",
+            callback=lambda: self.single_flight.coalesced
+        )
+        self.metrics.counter(
+            "counselor_llm_retries_total", "Model calls retried after a failure or timeout",
+            callback=lambda: self.resilience.retries
+        )
+        self.metrics.counter(
+            "counselor_llm_hedges_total", "Hedged model requests sent for slow calls",
+            callback=lambda: self.resilience.hedges
+        )
+        self.metrics.counter(
+            "counselor_llm_hedge_wins_total", "Model calls answered by the hedged request",
+            callback=lambda: self.resilience.hedge_wins
+        )
+        self.metrics.counter(
+            "counselor_llm_deadline_exceeded_total", "Model calls whose request deadline passed while waiting",
+            callback=lambda: self.admission.timed_out
+        )
+        self.metrics.counter(
+            "counselor_prompt_prefix_hits_total", "Model calls that referred to a cached prompt prefix",
+            callback=lambda: self.prompt_adapter.hits
+        )
+        self.metrics.counter(
+            "counselor_prompt_prefix_created_total", "Prompt prefixes registered with the model provider",
+            callback=lambda: self.prompt_adapter.created
+        )
+        self.metrics.counter(
+            "counselor_prompt_prefix_fallbacks_total", "Prompts sent whole although they had a cacheable prefix",
+            callback=lambda: self.prompt_adapter.fallbacks
+        )
+        self.metrics.gauge(
+            "counselor_lender_catalog_version", "Version of the lender catalog in use",
+            callback=lambda: self.catalog.version
+        )
+        self.metrics.counter(
+            "counselor_lender_catalog_reload_errors_total", "Lender catalog reloads that failed",
+            callback=lambda: self.catalog.errors
+        )
+        if self.conversation_writer is not None:
+            self.metrics.gauge(
+                "counselor_conversation_writes_pending", "Conversation messages waiting to be written",
+                callback=lambda: self.conversation_writer.pending_items
+            )
+            self.metrics.counter(
+                "counselor_conversation_write_batches_total", "Batched writes to the conversation store",
+                callback=lambda: self.conversation_writer.batches
+            )
+            self.metrics.counter(
+                "counselor_conversation_write_errors_total", "Failed batched writes to the conversation store",
+                callback=lambda: self.conversation_writer.errors
+            )
+
+    def _record_llm_call(self, mode: str, prompt: str, response: str, started: float) -> None:
+        """
+        Record a completed model call.
 
         Args:
-            user_id: Unique identifier for the user
+            mode: "sync", "async" or "stream"
+            prompt: Prompt sent to the model
+            response: Model response
+            started: `time.perf_counter()` value when the call started
+        """
+        self._llm_calls.inc(mode=mode)
+        self._llm_seconds.observe(time.perf_counter() - started, mode=mode)
+        self._llm_prompt_bytes.observe(len(prompt.encode('utf-8')))
+        self._llm_response_bytes.observe(len(response.encode('utf-8')))
+
+    def _record_cache_lookup(self, cache: str, hit: bool) -> None:
+        """
+        Record a cache lookup.
+
+        Args:
+            cache: "response", "semantic" or "report"
+            hit: Whether the lookup was answered from the cache
+        """
+        self._cache_lookups.inc(cache=cache, result="hit" if hit else "miss")
+
+    def _submit(self, func: Callable[..., Any], *args: Any) -> "Future[Any]":
+        """
+        Run part of a request on the thread pool, carrying the request's deadline.
+
+        Args:
+            func: Function to run
+            *args: Arguments for the function
 
         Returns:
-            ConversationBufferMemory: User's conversation memory
+            Future: The function's pending result
         """
-        if user_id not in self.memory:
-            self.memory[user_id] = ConversationBufferMemory(
-                memory_key=f"conversation_history_{user_id}",
-                return_messages=True
-            )
-        return self.memory[user_id]
+        return self.executor.submit(contextvars.copy_context().run, func, *args)
 
-    @staticmethod
-    def _initialize_prompt_template() -> PromptTemplate:
+    async def _arun(self, func: Callable[..., Any], *args: Any) -> Any:
         """
-        Initialize the template for generating AI responses.
+        Run blocking work of an asynchronous request on the thread pool.
+
+        Store reads and writes (the conversation store, the response cache and
+        the semantic cache) may block on SQLite or Redis, so asynchronous flows
+        await them here instead of stalling the event loop.
+
+        Args:
+            func: Function to run
+            *args: Arguments for the function
 
         Returns:
-            PromptTemplate: Configured template for generating responses
+            Any: The function's return value
         """
-        return PromptTemplate(
-            input_variables=["lenders_data", "student_details",
-                           "conversation_history", "student_message"],
-            template=INITIAL_PROMPT
-        )
+        return await asyncio.wrap_future(self._submit(func, *args))
 
-    @lru_cache(maxsize=1)
-    def load_lenders(self) -> List[Dict[str, Any]]:
+    async def _apin(self, user_id: str) -> ConversationBufferMemory:
         """
-        Load and cache lender information.
+        Pin a user's memory for an asynchronous request on the thread pool.
+
+        A pin that completes after the request was cancelled is released
+        again, since the request will never unpin it.
+
+        Args:
+            user_id: Unique identifier for the student
 
         Returns:
-            List[Dict]: List of lender details
+            ConversationBufferMemory: The pinned memory
         """
-        return LENDER_DATA
+        future = self._submit(self.memory.pin, user_id)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(
+                lambda done: done.cancelled() or done.exception() is not None or self.memory.unpin(user_id)
+            )
+            raise
 
-    def _get_conversation_history(self, user_id: str) -> List[Any]:
+    def _timed_call(self, stage: str, func: Callable[..., Any], *args: Any) -> Any:
         """
-        Retrieve conversation history for a user.
+        Call a function and record its duration as a request stage.
 
         Args:
-            user_id: Unique identifier for the user
+            stage: Stage name
+            func: Function to call
+            *args: Arguments for the function
 
         Returns:
-            List: Previous conversation messages
+            Any: The function's return value
         """
-        return self.get_user_memory(user_id).load_memory_variables({}).get(
-            f'conversation_history_{user_id}', []
-        )
+        with self.metrics.timed(stage):
+            return func(*args)
 
-    def _prepare_recommendation_inputs(
-        self,
-        student_details: Dict[str, Any],
-        student_message: str,
-        conversation_history: List[Any]
-    ) -> Dict[str, Any]:
+    async def _atimed(self, stage: str, awaitable: Awaitable[Any]) -> Any:
         """
-        Prepare all necessary inputs for generating recommendations.
+        Await a coroutine and record its duration as a request stage.
 
         Args:
-            student_details: Student's information and requirements
-            student_message: Current message from student
-            conversation_history: Previous conversation context
+            stage: Stage name
+            awaitable: Coroutine to await
 
         Returns:
-            Dict: Prepared inputs for recommendation generation
+            Any: The coroutine's result
         """
-        # Get recommendations, lenders and format data in parallel
-        futures = {
-            # 'similar_recs': self.executor.submit(
-            #     self.recommendation_store.find_similar_recommendations,
-            #     student_details
-            # ),    
-            # 'matching_lenders': self.executor.submit(
-            #     self.lender_store.search_lenders,
-            #     f"{student_details['destination_country']} {student_details['loan_amount_needed']}"
-            # ),
-            'formatted_lenders': self.executor.submit(format_lenders_data, self.lenders),
-            'formatted_student': self.executor.submit(json.dumps, student_details, indent=2)
-        }
+        with self.metrics.timed(stage):
+            return await awaitable
 
-        conversation_summary = [
-            f"{msg.type}: {msg.content}" if hasattr(msg, 'content')
-            else f"{msg.get('type', 'Unknown')}: {msg.get('content', '')}" if isinstance(msg, dict)
-            else str(msg)
-            for msg in conversation_history
-        ]
+    @staticmethod
+    def _call_options(timeout: Optional[float]) -> Dict[str, Any]:
+        """
+        Build per-call model options.
 
-        return {
-            'lenders_data': futures['formatted_lenders'].result(),
-            'student_details': futures['formatted_student'].result(),
-            # 'similar_cases': str(futures['similar_recs'].result()),
-            # 'matching_lenders': str(futures['matching_lenders'].result()),
-            'student_message': student_message,
-            'conversation_history': "\n".join(conversation_summary)
-        }
+        Args:
+            timeout: Time limit for the call, if any
 
-    @traceable(project_name="loan-counselor-agent")
-    def get_loan_recommendation(
-        self,
-        student_details: Dict[str, Any],
-        student_message: str,
-        user_id: str
-    ) -> Dict[str, Any]:
+        Returns:
+            Dict: {'timeout': seconds} when the call has a time limit
         """
-        Generate personalized loan recommendations and follow-up questions.
+        return {} if timeout is None else {'timeout': timeout}
+
+    def _predict(self, prompt: Union[str, PromptParts]) -> str:
+        """
+        Send a prompt to the model, serving repeated prompts from the response cache.
+
+        Identical prompts that arrive while one is already being answered wait
+        for that answer instead of calling the model again. Calls that reach
+        the model go through the admission controller, are retried and hedged
+        according to the resilience policy, and are given the time left before
+        the request's deadline as their timeout. The prefix of a split prompt
+        is sent by handle when the model caches prefixes.
 
         Args:
-            student_details: Student's information and requirements
-            student_message: Current message from student
-            user_id: Unique identifier for the student
+            prompt: Fully formatted prompt, whole or split into prefix and suffix
 
         Returns:
-            Dict: Contains AI response and recommended follow-up questions
+            str: Model response
 
         Raises:
-            Returns error message if recommendation generation fails
+            AdmissionRejected: If too many calls are already waiting for the model
+            DeadlineExceeded: If the request's deadline passes while waiting
         """
-        try:
-            user_memory = self.get_user_memory(user_id)
-            conversation_history = self._get_conversation_history(user_id)
+        model = getattr(self.llm, 'model', None)
+        temperature = getattr(self.llm, 'temperature', None)
+        if self.response_cache is not None:
+            response = self.response_cache.get(prompt_text(prompt), model, temperature)
+            self._record_cache_lookup("response", response is not None)
+            if response is not None:
+                return response
 
-            inputs = self._prepare_recommendation_inputs(
-                student_details,
-                student_message,
-                conversation_history
-            )
+        return self.single_flight.do(
+            make_cache_key(prompt_text(prompt), model, temperature),
+            lambda: self._call_model(prompt, model, temperature)
+        )
 
-            # Generate response and query recommendation in parallel
-            response_future = self.executor.submit(
-                self.llm.predict,
-                self.prompt_template.format(**inputs)
-            )
-            query_rec_future = self.executor.submit(
-                self.get_query_recommendation,
-                student_message,
-                user_id
-            )
+    def _call_model(self, prompt: Union[str, PromptParts], model: Any, temperature: Any) -> str:
+        """
+        Call the model with retries and hedging, and cache the response.
 
-            response = response_future.result()
-            
-            # Save context and store recommendation in parallel
-            self.executor.submit(
-                user_memory.save_context,
-                {"input": student_message},
-                {"output": response}
-            )
-            # self.executor.submit(
-            #     self.recommendation_store.store_recommendation,
-            #     student_details=student_details,
-            #     recommendation=response,
-            #     metadata={'user_id': user_id}
-            # )
+        Every attempt, hedged ones included, takes its own admission slot, so
+        a call backing off before a retry holds no slot and a hedged call
+        counts against the limit like any other; an attempt waits for a slot
+        no longer than its own time limit. A call the provider turns away
+        because of its cached prefix handle is resent at once as the prepare
+        step decides (the whole prompt), since retrying it unchanged would
+        fail the same way.
 
-            return {
-                'response': response,
-                'query_recommendation': query_rec_future.result()
-            }
+        Args:
+            prompt: Fully formatted prompt, whole or split into prefix and suffix
+            model: Model name, for the cache key
+            temperature: Sampling temperature, for the cache key
 
-        except Exception as e:
-            return {'error': f"An error occurred while generating a recommendation: {str(e)}"}
+        Returns:
+            str: Model response
+        """
+        started = time.perf_counter()
+        text, options = self.prompt_adapter.prepare(prompt)
 
-    @traceable(project_name="loan-counselor-agent")
-    def get_query_recommendation(self, query: str, user_id: str) -> str:
+        def send(timeout: Optional[float]) -> str:
+            nonlocal text, options
+            with request_deadline(timeout), self.admission.slot():
+                # What is left of the attempt's time once it has a slot
+                timeout = remaining_time()
+                try:
+                    return self.llm.predict(text, **options, **self._call_options(timeout))
+                except Exception as error:
+                    resend = self.prompt_adapter.recover(prompt, options, error)
+                    if resend is None:
+                        raise
+                    text, options = resend
+                    return self.llm.predict(text, **options, **self._call_options(timeout))
+
+        response = self.resilience.call(send)
+        self._record_llm_call("sync", text, response, started)
+        if self.response_cache is not None:
+            self.response_cache.set(prompt_text(prompt), model, temperature, response)
+        return response
+
+    async def _apredict(self, prompt: Union[str, PromptParts]) -> str:
         """
-        Generate relevant follow-up questions based on conversation context.
+        Asynchronously send a prompt to the model, serving repeated prompts from
+        the response cache.
+
+        Identical prompts in flight on the same event loop share one model
+        call. Calls that reach the model go through the admission controller,
+        are retried and hedged according to the resilience policy, and are
+        cancelled when the request's deadline passes. The prefix of a split
+        prompt is sent by handle when the model caches prefixes.
 
         Args:
-            query: Current question or message from student
-            user_id: Unique identifier for the student
+            prompt: Fully formatted prompt, whole or split into prefix and suffix
 
         Returns:
-            str: Recommended follow-up questions or error message
+            str: Model response
+
+        Raises:
+            AdmissionRejected: If too many calls are already waiting for the model
+            DeadlineExceeded: If the request's deadline passes first
         """
-        try:
-            conversation_history = self._get_conversation_history(user_id)
-            prompt = QUERY_RECOMMENDATION_PROMPT.format(
-                conversation_history=str(conversation_history),
-                query=query
-            )
-            return self.llm.predict(prompt)
+        model = getattr(self.llm, 'model', None)
+        temperature = getattr(self.llm, 'temperature', None)
+        if self.response_cache is not None:
+            response = await self._arun(self.response_cache.get, prompt_text(prompt), model, temperature)
+            self._record_cache_lookup("response", response is not None)
+            if response is not None:
+                return response
 
-        except Exception as e:
-            return f"An error occurred while generating question recommendations: {str(e)}"
-    
-    def get_user_report(self, user_id: str) -> Dict[str, Any]:
+        return await self.single_flight.ado(
+            make_cache_key(prompt_text(prompt), model, temperature),
+            lambda: self._acall_model(prompt, model, temperature)
+        )
+
+    async def _acall_model(self, prompt: Union[str, PromptParts], model: Any, temperature: Any) -> str:
         """
-        Generate a report for a user based on their conversation history.
+        Asynchronously call the model with retries and hedging, and cache the
+        response.
+
+        Every attempt, hedged ones included, takes its own admission slot, as
+        in `_call_model`. Registering a new prefix with the provider blocks,
+        so it runs on the executor rather than on the event loop. A call
+        turned away because of its cached prefix handle is resent with the
+        whole prompt.
 
         Args:
-            user_id: Unique identifier for the student
+            prompt: Fully formatted prompt, whole or split into prefix and suffix
+            model: Model name, for the cache key
+            temperature: Sampling temperature, for the cache key
 
         Returns:
-            Dict: Contains sentiment analysis and other metrics
+            str: Model response
         """
-        try:
-            conversation_history = self._get_conversation_history(user_id)
-            sentiment_scores = self.analyze_sentiment(conversation_history)
-            user_summary = self.generate_user_summary(conversation_history)
-            
-            return {
-                'user_id': user_id,
-                'conversation_length': len(conversation_history),
-                'sentiment_analysis': sentiment_scores,
-                'user_summary': user_summary
-            }
-        except Exception as e:
-            return {'error': f"An error occurred while generating the user report: {str(e)}"}
+        started = time.perf_counter()
+        if isinstance(prompt, PromptParts):
+            # Run in the request's context, so registering stops at its deadline
+            text, options = await asyncio.get_running_loop().run_in_executor(
+                self.executor, contextvars.copy_context().run, self.prompt_adapter.prepare, prompt
+            )
+        else:
+            text, options = self.prompt_adapter.prepare(prompt)
+
+        async def send(timeout: Optional[float]) -> str:
+            nonlocal text, options
+            with request_deadline(timeout):
+                async with self.admission.aslot():
+                    # What is left of the attempt's time once it has a slot
+                    timeout = remaining_time()
+                    try:
+                        return await self.llm.apredict(text, **options, **self._call_options(timeout))
+                    except Exception as error:
+                        resend = self.prompt_adapter.recover(prompt, options, error)
+                        if resend is None:
+                            raise
+                        text, options = resend
+                        return await self.llm.apredict(text, **options, **self._call_options(timeout))
 
-    def analyze_sentiment(self, conversation_history: List[Any]) -> Dict[str, float]:
+        response = await self.resilience.acall(send)
+        self._record_llm_call("async", text, response, started)
+        if self.response_cache is not None:
+            await self._arun(self.response_cache.set, prompt_text(prompt), model, temperature, response)
+        return response
+
+    def _stream_predict(self, prompt: Union[str, PromptParts]) -> Iterator[str]:
         """
-        Analyze the sentiment of the conversation history using ChatOpenAI.
+        Stream a model response as it is generated.
+
+        A cached response is yielded in one piece; a freshly generated one is
+        cached once the stream completes. The stream holds an admission slot
+        while it is generated. Streams are not retried or hedged, since tokens
+        already sent to the client cannot be taken back; a stream turned away
+        because of its cached prefix handle before sending anything is
+        restarted with the whole prompt.
 
         Args:
-            conversation_history: List of conversation messages
+            prompt: Fully formatted prompt, whole or split into prefix and suffix
 
-        Returns:
-            Dict: Sentiment scores for the conversation
+        Yields:
+            str: Response text chunks
         """
-        try:
-            # Combine conversation history into a single text block
-            # Format conversation into human/AI turns
-            conversation_text = ""
-            for msg in conversation_history:
-                if hasattr(msg, 'type') and msg.type == 'human':
-                    conversation_text += f"Human: {msg.content}\n"
-                elif hasattr(msg, 'type') and msg.type == 'ai':
-                    conversation_text += f"AI: {msg.content}\n"
-                else:
-                    conversation_text += f"{str(msg)}\n"
+        model = getattr(self.llm, 'model', None)
+        temperature = getattr(self.llm, 'temperature', None)
+        if self.response_cache is not None:
+            cached = self.response_cache.get(prompt_text(prompt), model, temperature)
+            self._record_cache_lookup("response", cached is not None)
+            if cached is not None:
+                yield cached
+                return
 
-            # Use ChatOpenAI to analyze sentiment with structured prompt
-            prompt = "Analyze the sentiment of the following conversation between a human student " + \
-                     "and an AI loan counselor. Return the analysis as a JSON object with scores " + \
-                     "for: positivity (0-1), engagement (0-1), and concern_level (0-1).\n\n" + \
-                     conversation_text + \
-                     "Output should be in JSON format. Example output: `{'positivity': 0.9, 'engagement': 0.8, 'concern_level': 0.2}`"
-            sentiment_analysis = self.llm.predict(prompt)
+        with self.admission.slot():
+            started = time.perf_counter()
+            text, options = self.prompt_adapter.prepare(prompt)
+            chunks = []
+            try:
+                for piece in self._stream_pieces(text, options):
+                    chunks.append(piece)
+                    yield piece
+            except Exception as error:
+                resend = None if chunks else self.prompt_adapter.recover(prompt, options, error)
+                if resend is None:
+                    raise
+                text, options = resend
+                for piece in self._stream_pieces(text, options):
+                    chunks.append(piece)
+                    yield piece
+        response = "".join(chunks)
+        self._record_llm_call("stream", text, response, started)
+        if self.response_cache is not None:
+            self.response_cache.set(prompt_text(prompt), model, temperature, response)
 
-            # Parse the response into a dictionary
-            return sentiment_analysis
-        except Exception as e:
-            return {'error': f"An error occurred while analyzing sentiment: {str(e)}"}
+    def _stream_pieces(self, text: str, options: Dict[str, Any]) -> Iterator[str]:
+        """
+        Stream the text of a model call, stopping at the request's deadline.
+
+        Args:
+            text: Text to send
+            options: Extra keyword arguments for the call
+
+        Yields:
+            str: Non-empty response text chunks
+
+        Raises:
+            DeadlineExceeded: If the request's deadline passes mid-stream
+        """
+        for chunk in self.llm.stream(text, **options, **self._call_options(remaining_time())):
+            # A stream that trickles past the deadline gives up its slot
+            check_deadline()
+            piece = chunk.content if hasattr(chunk, 'content') else str(chunk)
+            if piece:
+                yield piece
 
-    def generate_user_summary(self, conversation_history: List[Any]) -> str:
+    def _create_memory(self, user_id: str) -> ConversationBufferMemory:
         """
-        Generate a summary of the user's conversation history using ChatOpenAI.
+        Create the conversation memory for a user.
+
+        With a conversation store the memory reads and writes the user's
+        stored history, which may already hold turns served by other workers.
 
         Args:
-            conversation_history: List of conversation messages
+            user_id: Unique identifier for the user
 
         Returns:
-            str: A summary of the conversation
+            ConversationBufferMemory: The user's conversation memory
         """
-        try:
-            # Combine conversation history into a single text block
-            conversation_text = "\n".join(
-                msg.content if hasattr(msg, 'content') else str(msg)
-                for msg in conversation_history
+        if self.conversation_store is not None:
+            return ConversationBufferMemory(
+                chat_memory=StoredChatMessageHistory(
+                    self.conversation_store, user_id, self.conversation_writer
+                ),
+                memory_key=f"conversation_history_{user_id}",
+                return_messages=True
             )
-            
-            # Use ChatOpenAI to generate a summary
-            prompt = f"Summarize the following conversation:\n{conversation_text}"
-            summary = self.llm.predict(prompt)
-            
-            return summary
+        return ConversationBufferMemory(
+            memory_key=f"conversation_history_{user_id}",
+            return_messages=True
+        )
+
+    def get_user_memory(self, user_id: str) -> ConversationBufferMemory:
+        """
+        Get or create conversation memory for a specific user.
+
+        With a conversation store, a newly created memory already holds the
+        turns the user had with any worker.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            ConversationBufferMemory: User's conversation memory
+        """
+        return self.memory.get_or_create(user_id)
+
+    @staticmethod
+    def _initialize_prompt_templates() -> Tuple[PromptTemplate, PromptTemplate, PromptTemplate]:
+        """
+        Initialize the templates for generating AI responses.
+
+        The prompt is split into a head holding the instructions and the
+        lender block, which is the same for every student offered the same
+        lenders, and a tail holding everything specific to the turn. The
+        structured tail asks for the follow-up questions in the same reply.
+
+        Returns:
+            Tuple[PromptTemplate, PromptTemplate, PromptTemplate]: Templates of
+                the prompt's prefix, suffix and structured suffix
+        """
+        turn_variables = ["student_details", "conversation_history", "student_message"]
+        return (
+            PromptTemplate(input_variables=["lenders_data"], template=INITIAL_PROMPT_PREFIX),
+            PromptTemplate(input_variables=turn_variables, template=INITIAL_PROMPT_SUFFIX),
+            PromptTemplate(input_variables=turn_variables, template=STRUCTURED_RESPONSE_SUFFIX)
+        )
+
+    def load_lenders(self) -> List[Lender]:
+        """
+        Return the lenders of the current catalog version.
+
+        Returns:
+            List[Lender]: Lenders from the configured catalog
+        """
+        return self.catalog.current().lenders
+
+    def _get_conversation_history(self, user_id: str) -> List[Any]:
+        """
+        Retrieve conversation history for a user.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            List: Previous conversation messages
+        """
+        # Copy the messages so that turns saved in the background do not
+        # change the history a request is working with
+        return list(self.get_user_memory(user_id).load_memory_variables({}).get(
+            f'conversation_history_{user_id}', []
+        ))
+
+    @staticmethod
+    def _format_history_lines(conversation_history: List[Any]) -> List[str]:
+        """
+        Format conversation messages as "type: content" lines.
+
+        Args:
+            conversation_history: Previous conversation messages
+
+        Returns:
+            List[str]: One line per message, oldest first
+        """
+        return [
+            f"{msg.type}: {msg.content}" if hasattr(msg, 'content')
+            else f"{msg.get('type', 'Unknown')}: {msg.get('content', '')}" if isinstance(msg, dict)
+            else str(msg)
+            for msg in conversation_history
+        ]
+
+    def _summarize_lines(self, summary: str, new_lines: str) -> str:
+        """
+        Fold new conversation lines into a running summary.
+
+        Args:
+            summary: Current running summary (may be empty)
+            new_lines: Conversation lines to add to the summary
+
+        Returns:
+            str: Updated summary
+        """
+        prompt = CONVERSATION_SUMMARY_PROMPT.format(summary=summary, new_lines=new_lines)
+        return self._predict(prompt)
+
+    def _fold_history(self, user_id: str) -> None:
+        """
+        Fold old turns into the running summary.
+
+        Args:
+            user_id: Unique identifier for the student
+        """
+        with self.metrics.timed("history_fold"):
+            self.history_window.fold(
+                user_id,
+                self._format_history_lines(self._get_conversation_history(user_id))
+            )
+
+    def _prepare_recommendation_inputs(
+        self,
+        student_details: Dict[str, Any],
+        student_message: str,
+        conversation_history: List[Any],
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Prepare all necessary inputs for generating recommendations.
+
+        Args:
+            student_details: Student's information and requirements
+            student_message: Current message from student
+            conversation_history: Previous conversation context
+            user_id: Unique identifier for the student, used to look up the
+                     running summary in "summary" history mode
+
+        Returns:
+            Dict: Prepared inputs for recommendation generation
+        """
+        # Only the lenders relevant to this student are sent to the model. The
+        # block for a given selection only changes with the catalog, so it is
+        # served from the per-version cache instead of being re-rendered.
+        # The state is read once, so a catalog reload cannot mix versions.
+        # similar_recs = self.recommendation_store.find_similar_recommendations(student_details)
+        shared = self.catalog.current()
+        matching_lenders = shared.lender_matcher.match(student_details, self.lender_match_top_n)
+        selection = ",".join(lender.name for lender in matching_lenders)
+        lenders_data = shared.lender_context.get(
+            matching_lenders,
+            f"{shared.lenders_version}:{selection}"
+        )
+
+        conversation_lines = self._format_history_lines(conversation_history)
+        if self.history_window is not None and user_id is not None:
+            conversation_text = self.history_window.render(user_id, conversation_lines)
+        else:
+            conversation_text = "\n".join(conversation_lines)
+
+        # The user id means nothing to the model and would stop students with
+        # identical profiles from sharing cached responses
+        return {
+            'lenders_data': lenders_data,
+            'student_details': json.dumps(
+                {key: value for key, value in student_details.items() if key != 'userId'},
+                indent=2
+            ),
+            # 'similar_cases': str(similar_recs),
+            'student_message': student_message,
+            'conversation_history': conversation_text
+        }
+
+    def _format_recommendation_prompt(self, inputs: Dict[str, Any], structured: bool = False) -> PromptParts:
+        """
+        Format the recommendation prompt as a cacheable prefix and a per-turn suffix.
+
+        Args:
+            inputs: Inputs from `_prepare_recommendation_inputs`
+            structured: Ask for the response and follow-up questions as one JSON object
+
+        Returns:
+            PromptParts: The prompt's prefix (instructions and lender block) and suffix
+        """
+        shared = self.catalog.current()
+        suffix = shared.structured_suffix if structured else shared.prompt_suffix
+        return PromptParts(
+            shared.prompt_prefix.format(lenders_data=inputs['lenders_data']),
+            suffix.format(
+                student_details=inputs['student_details'],
+                conversation_history=inputs['conversation_history'],
+                student_message=inputs['student_message']
+            )
+        )
+
+    def _find_similar_response(
+        self,
+        student_details: Dict[str, Any],
+        student_message: str,
+        conversation_history: List[Any],
+        catalog_version: int
+    ) -> Optional[str]:
+        """
+        Look up a stored answer from a similar student for a first-turn question.
+
+        Later turns depend on the conversation, so only first turns are looked up.
+        Stored answers quote the rates of the catalog they were given with, so
+        only answers given with the same catalog version are served.
+
+        Args:
+            student_details: Student's information and requirements
+            student_message: Current message from student
+            conversation_history: Previous conversation context
+            catalog_version: Version of the lender catalog the turn started with
+
+        Returns:
+            Optional[str]: Stored answer, or None if there is no close match
+        """
+        if self.recommendation_store is None or conversation_history:
+            return None
+        similar_response = self.recommendation_store.find_similar_recommendations(
+            student_details,
+            student_message,
+            version=catalog_version
+        )
+        self._record_cache_lookup("semantic", similar_response is not None)
+        return similar_response
+
+    def _finish_turn(
+        self,
+        user_memory: ConversationBufferMemory,
+        user_id: str,
+        student_details: Dict[str, Any],
+        student_message: str,
+        response: str,
+        store_recommendation: bool,
+        catalog_version: int = 0
+    ) -> None:
+        """
+        Save the turn, then fold the history and store the recommendation in
+        the background.
+
+        The turn is saved before the response is returned, so the user's next
+        turn always sees it. This is cheap: messages are appended in memory,
+        or queued for the next batched write to the conversation store.
+
+        Args:
+            user_memory: The user's conversation memory
+            user_id: Unique identifier for the student
+            student_details: Student's information and requirements
+            student_message: Current message from student
+            response: Counselor's response
+            store_recommendation: Whether to add the response to the semantic cache
+            catalog_version: Version of the lender catalog the response was generated with
+        """
+        with self.metrics.timed("save_context"):
+            user_memory.save_context({"input": student_message}, {"output": response})
+        # Submitted without the request's context: background work must not
+        # be cut short by the deadline of the request that produced the turn
+        if self.history_window is not None:
+            self.executor.submit(self._fold_history, user_id)
+        if store_recommendation and self.recommendation_store is not None:
+            self.executor.submit(
+                self.recommendation_store.store_recommendation,
+                student_details=student_details,
+                recommendation=response,
+                metadata={'user_id': user_id},
+                message=student_message,
+                version=catalog_version
+            )
+
+    def _resolve_response_mode(self, response_mode: Optional[str]) -> str:
+        """
+        Pick the response mode of a request.
+
+        Args:
+            response_mode: Mode asked for by the request, if any
+
+        Returns:
+            str: "separate" or "structured"
+
+        Raises:
+            ValueError: If the response mode is unknown
+        """
+        response_mode = response_mode or self.response_mode
+        if response_mode not in RESPONSE_MODES:
+            raise ValueError(f"Response mode must be one of: {', '.join(RESPONSE_MODES)}")
+        return response_mode
+
+    def _structured_reply(self, text: str) -> Optional[StructuredReply]:
+        """
+        Parse a structured model reply and count whether it was usable.
+
+        Args:
+            text: Model reply to the structured prompt
+
+        Returns:
+            Optional[StructuredReply]: The response and follow-up questions, or
+                                       None if the turn must fall back to two calls
+        """
+        reply = parse_structured_reply(text)
+        self._structured_replies.inc(result="parsed" if reply is not None else "fallback")
+        return reply
+
+    @traceable(project_name="loan-counselor-agent")
+    def get_loan_recommendation(
+        self,
+        student_details: Dict[str, Any],
+        student_message: str,
+        user_id: str,
+        response_mode: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate personalized loan recommendations and follow-up questions.
+
+        In the "structured" response mode one model call returns both the
+        response and the follow-up questions; if its reply cannot be parsed,
+        the turn falls back to the two calls of the "separate" mode.
+
+        Args:
+            student_details: Student's information and requirements
+            student_message: Current message from student
+            user_id: Unique identifier for the student
+            response_mode: "separate" or "structured" (defaults to the agent's response mode)
+
+        Returns:
+            Dict: Contains AI response and recommended follow-up questions
+
+        Raises:
+            AdmissionRejected: If the model is saturated
+            DeadlineExceeded: If the request's deadline passes
+            Returns error message if recommendation generation fails for any other reason
+        """
+        query_rec_future = None
+        user_memory = None
+        try:
+            structured = self._resolve_response_mode(response_mode) == RESPONSE_MODE_STRUCTURED
+            with self.metrics.timed("memory_load"):
+                # Pinned, so the turn is saved into the memory the store keeps
+                user_memory = self.memory.pin(user_id)
+                conversation_history = self._get_conversation_history(user_id)
+            # Taken before the lookup, so a response generated across a catalog
+            # reload is stored under the older version and never served
+            catalog_version = self.catalog.current().version
+            similar_response = self._find_similar_response(
+                student_details,
+                student_message,
+                conversation_history,
+                catalog_version
+            )
+
+            reply = None
+            if similar_response is None:
+                with self.metrics.timed("prompt_assembly"):
+                    inputs = self._prepare_recommendation_inputs(
+                        student_details,
+                        student_message,
+                        conversation_history,
+                        user_id
+                    )
+                    prompt = self._format_recommendation_prompt(inputs, structured)
+                if structured:
+                    reply = self._structured_reply(self._timed_call("llm_predict", self._predict, prompt))
+                    if reply is None:
+                        prompt = self._format_recommendation_prompt(inputs)
+
+            if reply is not None:
+                response = reply.response
+                self._store_similar_questions(student_message, conversation_history, reply.questions_text())
+            else:
+                # The response itself is generated on the calling thread, so a
+                # saturated model turns the request away instead of queueing it
+                # behind the thread pool.
+                query_rec_future = self._start_followups(
+                    student_message,
+                    user_id,
+                    student_details,
+                    conversation_history
+                )
+                if similar_response is None:
+                    response = self._timed_call("llm_predict", self._predict, prompt)
+                else:
+                    response = similar_response
+
+            # Save context and store recommendation in parallel
+            self._finish_turn(
+                user_memory,
+                user_id,
+                student_details,
+                student_message,
+                response,
+                store_recommendation=similar_response is None and not conversation_history,
+                catalog_version=catalog_version
+            )
+
+            return {
+                'response': response,
+                'query_recommendation': (
+                    reply.questions_text() if reply is not None
+                    else self._followup_result(query_rec_future)
+                )
+            }
+
+        except OverloadError:
+            # Do not spend a model call on follow-ups for a rejected request
+            if query_rec_future is not None:
+                query_rec_future.cancel()
+            raise
+        except Exception as e:
+            return {'error': f"An error occurred while generating a recommendation: {str(e)}"}
+        finally:
+            if user_memory is not None:
+                self.memory.unpin(user_id)
+
+    @traceable(project_name="loan-counselor-agent")
+    async def aget_loan_recommendation(
+        self,
+        student_details: Dict[str, Any],
+        student_message: str,
+        user_id: str,
+        response_mode: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Asynchronously generate personalized loan recommendations and follow-up questions.
+
+        Both model calls run concurrently on the event loop, so no worker thread
+        is held while waiting for the model; reads and writes of the
+        conversation store and caches run on the thread pool, so they do not
+        hold up the event loop either. In the "structured" response mode
+        a single call returns both, falling back to two calls if its reply
+        cannot be parsed.
+
+        Args:
+            student_details: Student's information and requirements
+            student_message: Current message from student
+            user_id: Unique identifier for the student
+            response_mode: "separate" or "structured" (defaults to the agent's response mode)
+
+        Returns:
+            Dict: Contains AI response and recommended follow-up questions
+
+        Raises:
+            AdmissionRejected: If the model is saturated
+            DeadlineExceeded: If the request's deadline passes
+            Returns error message if recommendation generation fails for any other reason
+        """
+        user_memory = None
+        try:
+            structured = self._resolve_response_mode(response_mode) == RESPONSE_MODE_STRUCTURED
+            with self.metrics.timed("memory_load"):
+                # Pinned, so the turn is saved into the memory the store keeps
+                user_memory = await self._apin(user_id)
+                conversation_history = await self._arun(self._get_conversation_history, user_id)
+            # Taken before the lookup, so a response generated across a catalog
+            # reload is stored under the older version and never served
+            catalog_version = self.catalog.current().version
+            similar_response = await self._arun(
+                self._find_similar_response,
+                student_details,
+                student_message,
+                conversation_history,
+                catalog_version
+            )
+
+            reply = None
+            if similar_response is None:
+                with self.metrics.timed("prompt_assembly"):
+                    inputs = self._prepare_recommendation_inputs(
+                        student_details,
+                        student_message,
+                        conversation_history,
+                        user_id
+                    )
+                    prompt = self._format_recommendation_prompt(inputs, structured)
+                if structured:
+                    reply = self._structured_reply(await self._atimed("llm_predict", self._apredict(prompt)))
+                    if reply is None:
+                        prompt = self._format_recommendation_prompt(inputs)
+
+            if reply is not None:
+                response, query_recommendation = reply.response, reply.questions_text()
+                await self._arun(
+                    self._store_similar_questions, student_message, conversation_history, query_recommendation
+                )
+            else:
+                query_rec_task = asyncio.ensure_future(
+                    self._atimed("followup", self.aget_query_recommendation(
+                        student_message, user_id, student_details
+                    ))
+                )
+                if similar_response is None:
+                    response, query_recommendation = await asyncio.gather(
+                        self._atimed("llm_predict", self._apredict(prompt)),
+                        query_rec_task
+                    )
+                else:
+                    response, query_recommendation = similar_response, await query_rec_task
+
+            await self._arun(
+                self._finish_turn,
+                user_memory,
+                user_id,
+                student_details,
+                student_message,
+                response,
+                similar_response is None and not conversation_history,
+                catalog_version
+            )
+
+            return {
+                'response': response,
+                'query_recommendation': query_recommendation
+            }
+
+        except OverloadError:
+            raise
+        except Exception as e:
+            return {'error': f"An error occurred while generating a recommendation: {str(e)}"}
+        finally:
+            if user_memory is not None:
+                # Not awaited, so a cancelled request still releases its pin
+                self._submit(self.memory.unpin, user_id)
+
+    def stream_loan_recommendation(
+        self,
+        student_details: Dict[str, Any],
+        student_message: str,
+        user_id: str
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a loan recommendation token by token.
+
+        Follow-up questions are generated concurrently and arrive in the final
+        event. The turn is saved to memory once the stream has finished; a
+        stream abandoned by the client is not saved.
+
+        Args:
+            student_details: Student's information and requirements
+            student_message: Current message from student
+            user_id: Unique identifier for the student
+
+        Yields:
+            Dict: Events of the form {'event': 'token', 'data': text}, then
+                  {'event': 'done', 'data': {'response', 'query_recommendation'}},
+                  or {'event': 'error', 'data': message} if generation fails
+        """
+        user_memory = None
+        try:
+            with self.metrics.timed("memory_load"):
+                # Pinned, so the turn is saved into the memory the store keeps
+                user_memory = self.memory.pin(user_id)
+                conversation_history = self._get_conversation_history(user_id)
+            query_rec_future = self._start_followups(
+                student_message,
+                user_id,
+                student_details,
+                conversation_history
+            )
+            # Taken before the lookup, so a response generated across a catalog
+            # reload is stored under the older version and never served
+            catalog_version = self.catalog.current().version
+            similar_response = self._find_similar_response(
+                student_details,
+                student_message,
+                conversation_history,
+                catalog_version
+            )
+
+            if similar_response is not None:
+                chunks = [similar_response]
+                yield {'event': 'token', 'data': similar_response}
+            else:
+                with self.metrics.timed("prompt_assembly"):
+                    inputs = self._prepare_recommendation_inputs(
+                        student_details,
+                        student_message,
+                        conversation_history,
+                        user_id
+                    )
+                    prompt = self._format_recommendation_prompt(inputs)
+                chunks = []
+                for chunk in self._stream_predict(prompt):
+                    chunks.append(chunk)
+                    yield {'event': 'token', 'data': chunk}
+
+            response = "".join(chunks)
+            self._finish_turn(
+                user_memory,
+                user_id,
+                student_details,
+                student_message,
+                response,
+                store_recommendation=similar_response is None and not conversation_history,
+                catalog_version=catalog_version
+            )
+
+            yield {
+                'event': 'done',
+                'data': {
+                    'response': response,
+                    'query_recommendation': self._followup_result(query_rec_future)
+                }
+            }
+
+        except Exception as e:
+            yield {
+                'event': 'error',
+                'data': f"An error occurred while generating a recommendation: {str(e)}"
+            }
+        finally:
+            if user_memory is not None:
+                self.memory.unpin(user_id)
+
+    @staticmethod
+    def _batch_key(student_details: Dict[str, Any], student_message: str, response_mode: str) -> str:
+        """
+        Identify the first turns of a batch that are sent the same prompt.
+
+        Args:
+            student_details: Student's information and requirements
+            student_message: Current message from student
+            response_mode: Resolved response mode of the item
+
+        Returns:
+            str: Key shared by items with identical details (apart from the
+                 user id), message and response mode
+        """
+        details = {key: value for key, value in student_details.items() if key != 'userId'}
+        return json.dumps([details, student_message, response_mode], sort_keys=True, default=str)
+
+    def _batch_recommendation(
+        self,
+        student_details: Dict[str, Any],
+        student_message: str,
+        user_id: str,
+        response_mode: str,
+        item_timeout: Optional[float]
+    ) -> Dict[str, Any]:
+        """
+        Generate the recommendation for one batch item.
+
+        Batch work is not in a hurry, so an item turned away by a saturated
+        model waits for the suggested time and tries again until its own
+        deadline passes, instead of failing.
+
+        Args:
+            student_details: Student's information and requirements
+            student_message: Current message from student
+            user_id: Unique identifier for the student
+            response_mode: "separate" or "structured"
+            item_timeout: Time budget for the item in seconds, or None for no deadline
+
+        Returns:
+            Dict: Contains AI response and recommended follow-up questions, or
+                  an error message (with a `retry_after` hint in seconds if
+                  the model was saturated or the deadline passed)
+        """
+        with request_deadline(item_timeout):
+            while True:
+                try:
+                    return self.get_loan_recommendation(
+                        student_details, student_message, user_id, response_mode=response_mode
+                    )
+                except AdmissionRejected as e:
+                    left = remaining_time()
+                    if left is None or left > e.retry_after:
+                        time.sleep(e.retry_after)
+                        continue
+                    overload = e
+                except OverloadError as e:
+                    overload = e
+                return {
+                    'error': f"An error occurred while generating a recommendation: {str(overload)}",
+                    'retry_after': overload.retry_after
+                }
+
+    def _share_recommendation(
+        self,
+        result: Dict[str, Any],
+        student_details: Dict[str, Any],
+        student_message: str,
+        user_id: str
+    ) -> Dict[str, Any]:
+        """
+        Give a batch item the recommendation generated for an identical item.
+
+        The turn is saved to the student's own conversation, as if the
+        recommendation had been generated for them.
+
+        Args:
+            result: Recommendation generated for the identical item
+            student_details: Student's information and requirements
+            student_message: Current message from student
+            user_id: Unique identifier for the student
+
+        Returns:
+            Dict: The shared recommendation, or the identical item's error
+        """
+        if 'error' in result:
+            return result
+        user_memory = None
+        try:
+            user_memory = self.memory.pin(user_id)
+            self._finish_turn(
+                user_memory,
+                user_id,
+                student_details,
+                student_message,
+                result['response'],
+                store_recommendation=False
+            )
+        except Exception as e:
+            return {'error': f"An error occurred while generating a recommendation: {str(e)}"}
+        finally:
+            if user_memory is not None:
+                self.memory.unpin(user_id)
+        return dict(result)
+
+    def _batch_group(
+        self,
+        items: List[Tuple[int, Dict[str, Any], str, str]],
+        response_mode: str,
+        item_timeout: Optional[float]
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Generate the recommendation for a group of batch items sharing one prompt.
+
+        Args:
+            items: (index, student_details, student_message, user_id) per item,
+                   the first of which is generated and the others share its result
+            response_mode: "separate" or "structured"
+            item_timeout: Time budget for the generated item in seconds
+
+        Returns:
+            List[Tuple[int, Dict]]: Index and result of every item in the group
+        """
+        index, student_details, student_message, user_id = items[0]
+        result = self._batch_recommendation(
+            student_details, student_message, user_id, response_mode, item_timeout
+        )
+        results = [(index, result)]
+        self._batch_items.inc(result="error" if 'error' in result else "generated")
+        for index, student_details, student_message, user_id in items[1:]:
+            shared = self._share_recommendation(result, student_details, student_message, user_id)
+            results.append((index, shared))
+            self._batch_items.inc(result="error" if 'error' in shared else "deduplicated")
+        return results
+
+    def get_loan_recommendations_batch(
+        self,
+        items: Iterable[Tuple[Dict[str, Any], str, str]],
+        max_concurrency: Optional[int] = None,
+        item_timeout: Optional[float] = None,
+        response_mode: Optional[str] = None
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Generate recommendations for many students, yielding each as it completes.
+
+        Meant for precomputing the first turns of a cohort. Items whose
+        students have no conversation yet and share the same details (apart
+        from the user id), message and response mode are sent to the model
+        once; the others in the group get the same recommendation, saved to
+        their own conversations. Groups run on a pool of `max_concurrency`
+        threads, which by default matches the admission limit so the batch
+        keeps the model busy without queueing beyond it. Each item has its
+        own deadline, and an item turned away by a saturated model is retried
+        until that deadline passes.
+
+        A user id may appear only once per batch, since the turns of one
+        conversation cannot run concurrently; later items with the same user
+        id get an error.
+
+        Args:
+            items: (student_details, student_message, user_id) per student
+            max_concurrency: Items generated at once (defaults to the
+                             admission controller's concurrency limit)
+            item_timeout: Time budget for each item in seconds, or None for no deadline
+            response_mode: "separate" or "structured" (defaults to the agent's response mode)
+
+        Yields:
+            Tuple[int, Dict]: Position of the item in `items` and its result,
+                              in completion order; the result has the same
+                              shape as `get_loan_recommendation`'s
+
+        Raises:
+            ValueError: If the response mode is unknown
+        """
+        response_mode = self._resolve_response_mode(response_mode)
+        groups: Dict[str, List[Tuple[int, Dict[str, Any], str, str]]] = {}
+        seen_users = set()
+        for index, (student_details, student_message, user_id) in enumerate(items):
+            if user_id in seen_users:
+                self._batch_items.inc(result="error")
+                yield index, {'error': f"User {user_id} appears more than once in the batch"}
+                continue
+            seen_users.add(user_id)
+            key = (
+                self._batch_key(student_details, student_message, response_mode)
+                if not self._get_conversation_history(user_id) else f"user:{user_id}"
+            )
+            groups.setdefault(key, []).append((index, student_details, student_message, user_id))
+
+        # A pool of its own: groups wait on follow-up tasks run by the
+        # agent's executor, which must not be filled with the groups themselves
+        pool = ThreadPoolExecutor(
+            max_workers=max(1, min(max_concurrency or self.admission.max_concurrency, len(groups) or 1)),
+            thread_name_prefix="recommendation-batch"
+        )
+        try:
+            futures = [
+                pool.submit(self._batch_group, group, response_mode, item_timeout)
+                for group in groups.values()
+            ]
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            # A consumer that stops early (a client that went away) cancels
+            # the groups not started yet
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _start_followups(
+        self,
+        query: str,
+        user_id: str,
+        student_details: Dict[str, Any],
+        conversation_history: List[Any]
+    ) -> "Future[str]":
+        """
+        Start generating the follow-up questions for a turn.
+
+        Template questions are ready immediately; questions written by the
+        model are generated on the thread pool, in parallel with the response.
+
+        Args:
+            query: Current question or message from student
+            user_id: Unique identifier for the student
+            student_details: Student's information and requirements
+            conversation_history: Previous conversation context
+
+        Returns:
+            Future[str]: Recommended follow-up questions or error message
+        """
+        if self.followup_mode == FOLLOWUP_MODE_TEMPLATE:
+            future: "Future[str]" = Future()
+            future.set_result(self._timed_call(
+                "followup", self._template_followups, query, conversation_history, student_details
+            ))
+            return future
+        return self._submit(
+            self._timed_call,
+            "followup",
+            self.get_query_recommendation,
+            query,
+            user_id,
+            student_details
+        )
+
+    def _template_followups(
+        self,
+        query: str,
+        conversation_history: List[Any],
+        student_details: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Suggest follow-up questions from the template bank.
+
+        Args:
+            query: Current question or message from student
+            conversation_history: Previous conversation context
+            student_details: Student's information, used to fill in questions
+
+        Returns:
+            str: JSON array of questions, as the model returns them
+        """
+        return json.dumps(self.catalog.current().followups.generate(query, conversation_history, student_details))
+
+    @staticmethod
+    def _followup_result(query_rec_future: "Future[str]") -> str:
+        """
+        Wait for the follow-up questions within the request's deadline.
+
+        The response has already been given and saved by then, so running out
+        of time only costs the follow-up questions, not the whole request.
+
+        Args:
+            query_rec_future: Pending follow-up questions
+
+        Returns:
+            str: Recommended follow-up questions or error message
+        """
+        try:
+            return result_within_deadline(query_rec_future)
+        except DeadlineExceeded as e:
+            return f"An error occurred while generating question recommendations: {str(e)}"
+
+    def _find_similar_questions(self, query: str, conversation_history: List[Any]) -> Optional[str]:
+        """
+        Look up stored follow-up questions for a similar first-turn question.
+
+        Args:
+            query: Current question or message from student
+            conversation_history: Previous conversation context
+
+        Returns:
+            Optional[str]: Stored follow-up questions, or None if there is no close match
+        """
+        if self.recommendation_store is None or conversation_history:
+            return None
+        similar_questions = self.recommendation_store.find_similar_recommendations(
+            {}, query, kind="query_recommendation"
+        )
+        self._record_cache_lookup("semantic", similar_questions is not None)
+        return similar_questions
+
+    def _store_similar_questions(self, query: str, conversation_history: List[Any], questions: str) -> None:
+        """
+        Store follow-up questions generated for a first-turn question.
+
+        Args:
+            query: Current question or message from student
+            conversation_history: Previous conversation context
+            questions: Generated follow-up questions
+        """
+        if self.recommendation_store is not None and not conversation_history:
+            self.recommendation_store.store_recommendation(
+                {}, questions, message=query, kind="query_recommendation"
+            )
+
+    @traceable(project_name="loan-counselor-agent")
+    def get_query_recommendation(
+        self,
+        query: str,
+        user_id: str,
+        student_details: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Generate relevant follow-up questions based on conversation context.
+
+        In the "template" follow-up mode the questions come from the local
+        template bank; in the "llm" mode the model writes them.
+
+        Args:
+            query: Current question or message from student
+            user_id: Unique identifier for the student
+            student_details: Student's information, used to fill in template questions
+
+        Returns:
+            str: Recommended follow-up questions or error message
+        """
+        try:
+            conversation_history = self._get_conversation_history(user_id)
+            if self.followup_mode == FOLLOWUP_MODE_TEMPLATE:
+                return self._template_followups(query, conversation_history, student_details)
+            similar_questions = self._find_similar_questions(query, conversation_history)
+            if similar_questions is not None:
+                return similar_questions
+
+            prompt = QUERY_RECOMMENDATION_PROMPT.format(
+                conversation_history=str(conversation_history),
+                query=query
+            )
+            questions = self._predict(prompt)
+            self._store_similar_questions(query, conversation_history, questions)
+            return questions
+
+        except Exception as e:
+            return f"An error occurred while generating question recommendations: {str(e)}"
+
+    @traceable(project_name="loan-counselor-agent")
+    async def aget_query_recommendation(
+        self,
+        query: str,
+        user_id: str,
+        student_details: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Asynchronously generate relevant follow-up questions based on conversation context.
+
+        In the "template" follow-up mode the questions come from the local
+        template bank; in the "llm" mode the model writes them.
+
+        Args:
+            query: Current question or message from student
+            user_id: Unique identifier for the student
+            student_details: Student's information, used to fill in template questions
+
+        Returns:
+            str: Recommended follow-up questions or error message
+        """
+        try:
+            conversation_history = await self._arun(self._get_conversation_history, user_id)
+            if self.followup_mode == FOLLOWUP_MODE_TEMPLATE:
+                return self._template_followups(query, conversation_history, student_details)
+            similar_questions = await self._arun(self._find_similar_questions, query, conversation_history)
+            if similar_questions is not None:
+                return similar_questions
+
+            prompt = QUERY_RECOMMENDATION_PROMPT.format(
+                conversation_history=str(conversation_history),
+                query=query
+            )
+            questions = await self._apredict(prompt)
+            await self._arun(self._store_similar_questions, query, conversation_history, questions)
+            return questions
+
+        except Exception as e:
+            return f"An error occurred while generating question recommendations: {str(e)}"
+    
+    def register_report_section(
+        self,
+        name: str,
+        run: Callable[[str, List[Any], str], Any],
+        arun: Optional[Callable[[str, List[Any], str], Awaitable[Any]]] = None,
+        update: Optional[Callable[[Any, str, List[Any], str], Any]] = None,
+        aupdate: Optional[Callable[[Any, str, List[Any], str], Awaitable[Any]]] = None
+    ) -> None:
+        """
+        Add an analysis to user reports.
+
+        Sections run concurrently, so adding one does not add to the report's
+        latency unless it is the slowest. Each section is called with the
+        formatted conversation text, the raw history and the user id.
+
+        Args:
+            name: Key under which the section's result appears in the report
+            run: Computes the section
+            arun: Asynchronous version of `run` used by `aget_user_report`;
+                  `run` is executed in the thread pool when it is not given
+            update: Updates the section's previous result from the new turns;
+                    without it the section is recomputed whenever the
+                    conversation grows
+            aupdate: Asynchronous version of `update`
+        """
+        self.report_sections[name] = ReportSection(run, arun, update, aupdate)
+        # Cached reports do not include the new section yet
+        self.report_cache.clear()
+
+    @staticmethod
+    def _format_conversation_text(conversation_history: List[Any]) -> str:
+        """
+        Format conversation messages as "Human:" / "AI:" turns for report prompts.
+
+        Args:
+            conversation_history: List of conversation messages
+
+        Returns:
+            str: One line per message
+        """
+        conversation_text = ""
+        for msg in conversation_history:
+            if hasattr(msg, 'type') and msg.type == 'human':
+                conversation_text += f"Human: {msg.content}\n"
+            elif hasattr(msg, 'type') and msg.type == 'ai':
+                conversation_text += f"AI: {msg.content}\n"
+            else:
+                conversation_text += f"{str(msg)}\n"
+        return conversation_text
+
+    def _plan_report(self, user_id: str) -> Tuple[List[Any], str, Optional[CachedReport]]:
+        """
+        Load the conversation and find a cached report that still applies to it.
+
+        A cached report applies when the conversation has not been reset or
+        rewritten since, i.e. it covers an unchanged prefix of the current text.
+
+        Args:
+            user_id: Unique identifier for the student
+
+        Returns:
+            Tuple: (conversation history, formatted conversation text, applicable
+                   cached report or None)
+        """
+        conversation_history = self._get_conversation_history(user_id)
+        conversation_text = self._format_conversation_text(conversation_history)
+        cached = self.report_cache.get(user_id)
+        if cached is not None and (
+            cached.conversation_length > len(conversation_history)
+            or text_digest(conversation_text[:cached.text_length]) != cached.digest
+        ):
+            cached = None
+        return conversation_history, conversation_text, cached
+
+    @staticmethod
+    def _report_job(
+        name: str,
+        section: ReportSection,
+        conversation_history: List[Any],
+        conversation_text: str,
+        user_id: str,
+        cached: Optional[CachedReport],
+        use_async: bool
+    ) -> Tuple[Optional[Callable[..., Any]], Tuple[Any, ...]]:
+        """
+        Choose between updating a section incrementally and recomputing it.
+
+        Args:
+            name: Name of the report section
+            section: The report section
+            conversation_history: List of conversation messages
+            conversation_text: Conversation formatted as human/AI turns
+            user_id: Unique identifier for the student
+            cached: Cached report covering a prefix of the conversation, if any
+            use_async: Whether to pick the asynchronous implementation
+
+        Returns:
+            Tuple: (callable or None if the chosen variant does not exist, arguments)
+        """
+        if cached is not None and name in cached.report and section.update is not None:
+            new_turns = conversation_history[cached.conversation_length:]
+            new_text = conversation_text[cached.text_length:]
+            return (
+                section.aupdate if use_async else section.update,
+                (cached.report[name], new_text, new_turns, user_id)
+            )
+        return (
+            section.arun if use_async else section.run,
+            (conversation_text, conversation_history, user_id)
+        )
+
+    def _complete_report(
+        self,
+        user_id: str,
+        conversation_history: List[Any],
+        conversation_text: str,
+        cached: Optional[CachedReport],
+        results: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Assemble a report from its section results and cache it.
+
+        Reports with a failed section are not cached, so the next request retries.
+
+        Args:
+            user_id: Unique identifier for the student
+            conversation_history: List of conversation messages
+            conversation_text: Conversation formatted as human/AI turns
+            cached: Cached report the sections were updated from, if any
+            results: Section results by section name
+
+        Returns:
+            Dict: The report
+        """
+        report = {
+            'user_id': user_id,
+            'conversation_length': len(conversation_history)
+        }
+        report.update(results)
+        self.report_cache.count("incremental" if cached is not None else "full")
+        if not any(self._is_error_result(result) for result in results.values()):
+            self.report_cache.set(user_id, len(conversation_history), conversation_text, report)
+        return report
+
+    @staticmethod
+    def _is_error_result(result: Any) -> bool:
+        """
+        Check whether a report section returned an error instead of a result.
+
+        Args:
+            result: Section result
+
+        Returns:
+            bool: True if the section failed
+        """
+        if isinstance(result, dict):
+            return 'error' in result
+        return isinstance(result, str) and result.startswith("An error occurred")
+
+    def get_user_report(self, user_id: str) -> Dict[str, Any]:
+        """
+        Generate a report for a user based on their conversation history.
+
+        The conversation is formatted once and every report section runs
+        concurrently, so report latency is that of the slowest section.
+        Reports are cached per user: an unchanged conversation is answered
+        from the cache, and when new turns have arrived sections that support
+        it are updated from their previous result and the new turns only.
+
+        Args:
+            user_id: Unique identifier for the student
+
+        Returns:
+            Dict: Contains sentiment analysis and other metrics
+
+        Raises:
+            DeadlineExceeded: If the request's deadline passes before the report is ready
+        """
+        try:
+            conversation_history, conversation_text, cached = self._plan_report(user_id)
+            hit = cached is not None and cached.conversation_length == len(conversation_history)
+            self._record_cache_lookup("report", hit)
+            if hit:
+                self.report_cache.count("hit")
+                return dict(cached.report)
+
+            futures = {}
+            for name, section in self.report_sections.items():
+                job, args = self._report_job(
+                    name, section, conversation_history, conversation_text, user_id, cached, use_async=False
+                )
+                futures[name] = self._submit(job, *args)
+
+            results = {name: result_within_deadline(future) for name, future in futures.items()}
+            return self._complete_report(user_id, conversation_history, conversation_text, cached, results)
+        except OverloadError:
+            raise
+        except Exception as e:
+            return {'error': f"An error occurred while generating the user report: {str(e)}"}
+
+    async def aget_user_report(self, user_id: str) -> Dict[str, Any]:
+        """
+        Asynchronously generate a report for a user based on their conversation history.
+
+        Every report section runs concurrently, with the same per-user caching
+        and incremental updates as `get_user_report`.
+
+        Args:
+            user_id: Unique identifier for the student
+
+        Returns:
+            Dict: Contains sentiment analysis and other metrics
+
+        Raises:
+            DeadlineExceeded: If the request's deadline passes before the report is ready
+        """
+        try:
+            conversation_history, conversation_text, cached = await self._arun(self._plan_report, user_id)
+            hit = cached is not None and cached.conversation_length == len(conversation_history)
+            self._record_cache_lookup("report", hit)
+            if hit:
+                self.report_cache.count("hit")
+                return dict(cached.report)
+
+            loop = asyncio.get_running_loop()
+            awaitables = []
+            for name, section in self.report_sections.items():
+                job, args = self._report_job(
+                    name, section, conversation_history, conversation_text, user_id, cached, use_async=True
+                )
+                if job is None:
+                    sync_job, args = self._report_job(
+                        name, section, conversation_history, conversation_text, user_id, cached, use_async=False
+                    )
+                    awaitables.append(loop.run_in_executor(
+                        self.executor, contextvars.copy_context().run, sync_job, *args
+                    ))
+                else:
+                    awaitables.append(job(*args))
+
+            results = dict(zip(self.report_sections, await asyncio.gather(*awaitables)))
+            return self._complete_report(user_id, conversation_history, conversation_text, cached, results)
+        except OverloadError:
+            raise
+        except Exception as e:
+            return {'error': f"An error occurred while generating the user report: {str(e)}"}
+
+    @staticmethod
+    def _sentiment_prompt(conversation_text: str) -> str:
+        """
+        Build the prompt that asks the model for sentiment scores.
+
+        Args:
+            conversation_text: Conversation formatted as human/AI turns
+
+        Returns:
+            str: Sentiment analysis prompt
+        """
+        return "Analyze the sentiment of the following conversation between a human student " + \
+               "and an AI loan counselor. Return the analysis as a JSON object with scores " + \
+               "for: positivity (0-1), engagement (0-1), and concern_level (0-1).\n\n" + \
+               conversation_text + \
+               "Output should be in JSON format. Example output: `{'positivity': 0.9, 'engagement': 0.8, 'concern_level': 0.2}`"
+
+    def analyze_sentiment(self, conversation_history: List[Any],
+                          conversation_text: Optional[str] = None) -> Dict[str, float]:
+        """
+        Analyze the sentiment of the conversation history using ChatOpenAI.
+
+        Args:
+            conversation_history: List of conversation messages
+            conversation_text: Conversation already formatted as human/AI turns
+
+        Returns:
+            Dict: Sentiment scores for the conversation
+        """
+        try:
+            if conversation_text is None:
+                conversation_text = self._format_conversation_text(conversation_history)
+
+            # Use ChatOpenAI to analyze sentiment with structured prompt
+            sentiment_analysis = self._predict(self._sentiment_prompt(conversation_text))
+
+            # Parse the response into a dictionary
+            return sentiment_analysis
+        except Exception as e:
+            return {'error': f"An error occurred while analyzing sentiment: {str(e)}"}
+
+    async def aanalyze_sentiment(self, conversation_history: List[Any],
+                                 conversation_text: Optional[str] = None) -> Dict[str, float]:
+        """
+        Asynchronously analyze the sentiment of the conversation history.
+
+        Args:
+            conversation_history: List of conversation messages
+            conversation_text: Conversation already formatted as human/AI turns
+
+        Returns:
+            Dict: Sentiment scores for the conversation
+        """
+        try:
+            if conversation_text is None:
+                conversation_text = self._format_conversation_text(conversation_history)
+            return await self._apredict(self._sentiment_prompt(conversation_text))
+        except Exception as e:
+            return {'error': f"An error occurred while analyzing sentiment: {str(e)}"}
+
+    def _user_summary_prompt(self, conversation_history: List[Any], user_id: Optional[str] = None,
+                             conversation_text: Optional[str] = None) -> str:
+        """
+        Build the prompt that asks the model to summarize a conversation.
+
+        In "summary" history mode the running summary is reused, so only the
+        turns that have not been folded into it yet are included.
+
+        Args:
+            conversation_history: List of conversation messages
+            user_id: Unique identifier for the student, if known
+            conversation_text: Conversation already formatted as human/AI turns
+
+        Returns:
+            str: Summarization prompt
+        """
+        running_summary = ""
+        if self.history_window is not None and user_id is not None:
+            running_summary, recent_lines = self.history_window.context(
+                user_id, self._format_history_lines(conversation_history)
+            )
+            if running_summary:
+                recent_history = conversation_history[-len(recent_lines):] if recent_lines else []
+                conversation_text = (
+                    f"Summary of earlier conversation:\n{running_summary}\n\n"
+                    f"Recent conversation:\n{self._format_conversation_text(recent_history)}"
+                )
+
+        if conversation_text is None:
+            conversation_text = self._format_conversation_text(conversation_history)
+        return f"Summarize the following conversation:\n{conversation_text}"
+
+    def generate_user_summary(self, conversation_history: List[Any], user_id: Optional[str] = None,
+                              conversation_text: Optional[str] = None) -> str:
+        """
+        Generate a summary of the user's conversation history using ChatOpenAI.
+
+        Args:
+            conversation_history: List of conversation messages
+            user_id: Unique identifier for the student, if known
+            conversation_text: Conversation already formatted as human/AI turns
+
+        Returns:
+            str: A summary of the conversation
+        """
+        try:
+            # Use ChatOpenAI to generate a summary
+            summary = self._predict(
+                self._user_summary_prompt(conversation_history, user_id, conversation_text)
+            )
+            
+            return summary
+        except Exception as e:
+            return f"An error occurred while generating the summary: {str(e)}"
+
+    async def agenerate_user_summary(self, conversation_history: List[Any], user_id: Optional[str] = None,
+                                     conversation_text: Optional[str] = None) -> str:
+        """
+        Asynchronously generate a summary of the user's conversation history.
+
+        Args:
+            conversation_history: List of conversation messages
+            user_id: Unique identifier for the student, if known
+            conversation_text: Conversation already formatted as human/AI turns
+
+        Returns:
+            str: A summary of the conversation
+        """
+        try:
+            return await self._apredict(
+                self._user_summary_prompt(conversation_history, user_id, conversation_text)
+            )
+        except Exception as e:
+            return f"An error occurred while generating the summary: {str(e)}"
+
+    def update_sentiment(self, previous_scores: Any, new_turns_text: str) -> Dict[str, float]:
+        """
+        Update earlier sentiment scores with the turns that followed them.
+
+        Args:
+            previous_scores: Sentiment scores for the earlier conversation
+            new_turns_text: New turns formatted as human/AI turns
+
+        Returns:
+            Dict: Sentiment scores for the whole conversation
+        """
+        try:
+            return self._predict(SENTIMENT_UPDATE_PROMPT.format(
+                previous_scores=previous_scores,
+                new_turns=new_turns_text
+            ))
+        except Exception as e:
+            return {'error': f"An error occurred while analyzing sentiment: {str(e)}"}
+
+    async def aupdate_sentiment(self, previous_scores: Any, new_turns_text: str) -> Dict[str, float]:
+        """
+        Asynchronously update earlier sentiment scores with the turns that followed them.
+
+        Args:
+            previous_scores: Sentiment scores for the earlier conversation
+            new_turns_text: New turns formatted as human/AI turns
+
+        Returns:
+            Dict: Sentiment scores for the whole conversation
+        """
+        try:
+            return await self._apredict(SENTIMENT_UPDATE_PROMPT.format(
+                previous_scores=previous_scores,
+                new_turns=new_turns_text
+            ))
+        except Exception as e:
+            return {'error': f"An error occurred while analyzing sentiment: {str(e)}"}
+
+    def update_user_summary(self, previous_summary: str, new_turns_text: str) -> str:
+        """
+        Extend an earlier conversation summary with the turns that followed it.
+
+        Args:
+            previous_summary: Summary of the earlier conversation
+            new_turns_text: New turns formatted as human/AI turns
+
+        Returns:
+            str: Summary of the whole conversation
+        """
+        try:
+            return self._predict(CONVERSATION_SUMMARY_PROMPT.format(
+                summary=previous_summary,
+                new_lines=new_turns_text
+            ))
+        except Exception as e:
+            return f"An error occurred while generating the summary: {str(e)}"
+
+    async def aupdate_user_summary(self, previous_summary: str, new_turns_text: str) -> str:
+        """
+        Asynchronously extend an earlier conversation summary with the turns that followed it.
+
+        Args:
+            previous_summary: Summary of the earlier conversation
+            new_turns_text: New turns formatted as human/AI turns
+
+        Returns:
+            str: Summary of the whole conversation
+        """
+        try:
+            return await self._apredict(CONVERSATION_SUMMARY_PROMPT.format(
+                summary=previous_summary,
+                new_lines=new_turns_text
+            ))
         except Exception as e:
             return f"An error occurred while generating the summary: {str(e)}"
 
@@ -380,4 +2407,11 @@ class LoanCounselorAgent:
         Args:
             user_id: Unique identifier for the student
         """
-        self.memory.pop(user_id, None)
\ No newline at end of file
+        self.memory.pop(user_id, None)
+        if self.conversation_store is not None:
+            # The history may have been written by another worker
+            self.conversation_writer.discard(user_id)
+            self.conversation_store.delete(user_id)
+        self.report_cache.pop(user_id)
+        if self.history_window is not None:
+            self.history_window.reset(user_id)
\ No newline at end of file
@@ -2,7 +2,10 @@
 This module contains prompt templates used in the application.
 """
 
-INITIAL_PROMPT = """
+# The recommendation prompt is split into a prefix that only changes with the
+# lender catalog and a suffix that changes with every turn. Keeping all the
+# per-turn parts at the end lets providers cache the prefix.
+INITIAL_PROMPT_PREFIX = """
 You are Sarah, a friendly and experienced education loan counselor from Lorien Finance. Talk to students in a warm, conversational way like you're having a friendly chat. Imagine you're sitting across from them having coffee.
 
 Remember to:
@@ -41,7 +44,9 @@ Remember to protect private information and include necessary disclaimers, but k
 Lenders information:
 {lenders_data}
 
-Student details:
+"""
+
+INITIAL_PROMPT_SUFFIX = """Student details:
 {student_details}
 
 Previous conversation:
@@ -52,6 +57,25 @@ Their last message:
 
 Your friendly response:"""
 
+INITIAL_PROMPT = INITIAL_PROMPT_PREFIX + INITIAL_PROMPT_SUFFIX
+
+# Used instead of INITIAL_PROMPT_SUFFIX in the "structured" response mode, where
+# one call returns both the response and the follow-up questions
+STRUCTURED_RESPONSE_SUFFIX = """Student details:
+{student_details}
+
+Previous conversation:
+{conversation_history}
+
+Their last message:
+{student_message}
+
+Reply with a JSON object and nothing else, in the following format:
+{{"response": "Your friendly response", "follow_up_questions": ["Question 1", "Question 2", "Question 3"]}}
+
+"response" is your friendly response to their last message.
+"follow_up_questions" are 3 natural follow-up questions the student could ask you next, to learn more about loan terms and conditions, the application process, eligibility requirements, interest rates and repayment options, or required documents. Each question should be small, simple, conversational and about one topic, without technical jargon."""
+
 QUERY_RECOMMENDATION_PROMPT = """Based on this conversation history:
 {conversation_history}
 
@@ -77,4 +101,25 @@ Make the questions conversational and easy to understand.
 
 Output should be a simple array of strings, in the following format:
 ["Question 1", "Question 2", "Question 3"]
-"""
\ No newline at end of file
+"""
+
+CONVERSATION_SUMMARY_PROMPT = """Progressively summarize the lines of a conversation between a student and an education loan counselor, adding onto the previous summary and returning a new summary.
+
+Keep every detail that matters for loan counseling: the student's study plans, destination, course, funding needs, co-signer and collateral situation, lenders discussed, and open questions or concerns.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:"""
+
+SENTIMENT_UPDATE_PROMPT = """These are the sentiment scores for the earlier part of a conversation between a human student and an AI loan counselor:
+{previous_scores}
+
+The conversation has continued with these new turns:
+{new_turns}
+Update the scores so that they describe the whole conversation so far. Return the analysis as a JSON object with scores for: positivity (0-1), engagement (0-1), and concern_level (0-1).
+
+Output should be in JSON format. Example output: `{{'positivity': 0.9, 'engagement': 0.8, 'concern_level': 0.2}}`"""
@@ -10,12 +10,26 @@ st.set_page_config(
 
 import streamlit as st
 import base64
+import json
 
 # Function to convert a local image file to a Base64 string
 def get_base64_image(file_path):
     with open(file_path, "rb") as f:
         return base64.b64encode(f.read()).decode()
 
+# Function to parse a server-sent event stream into (event, data) pairs
+def iter_sse_events(response):
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
 # Load your background image
 background_image = get_base64_image("C:/Users/NITISH/Downloads/loan_bot-main/images.jpg")  # Update with your correct path
 
@@ -89,33 +103,66 @@ with col1:
 with col2:
     st.markdown("## 💬 Chat Interface")
     message = st.text_area("Your Message", placeholder="Type your message here...", height=150)
+    stream_response = st.checkbox("⚡ Stream response", value=True)
 
     if st.button("📤 Send Message"):
         if user_id and message:
-            with st.spinner('Processing your message...'):
+            payload = {
+                "userId": user_id,
+                "message": message,
+                "student_details": student_details
+            }
+            if stream_response:
                 try:
                     response = requests.post(
-                        "http://localhost:8000/chat",
-                        json={
-                            "userId": user_id,
-                            "message": message,
-                            "student_details": student_details
-                        }
+                        "http://localhost:8000/chat/stream",
+                        json=payload,
+                        stream=True
                     )
-                    response.raise_for_status()
-
-                    data = response.json()
-                    if 'response' in data:
-                        st.markdown("### 🤖 AI Response:")
-                        # Create the big box for the response
-                        st.markdown(
-                            f"<div class='response-box'>{data['response']['response']}</div>",
-                            unsafe_allow_html=True
-                        )
+                    # Resets, invalid requests and overload come back as plain JSON
+                    if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                        data = response.json()
+                        if 'error' in data:
+                            st.error(data['error'])
+                        else:
+                            st.success("✅ " + data.get('response', 'Done'))
                     else:
-                        st.error(data.get('error', 'An unknown error occurred'))
+                        st.markdown("### 🤖 AI Response:")
+                        # Render the response box as tokens arrive
+                        placeholder = st.empty()
+                        streamed_text = ""
+                        for event, data in iter_sse_events(response):
+                            if event == "token":
+                                streamed_text += data
+                                placeholder.markdown(
+                                    f"<div class='response-box'>{streamed_text}</div>",
+                                    unsafe_allow_html=True
+                                )
+                            elif event == "error":
+                                st.error(data)
                 except requests.RequestException as e:
                     st.error(f"🚫 Connection error: {str(e)}")
+            else:
+                with st.spinner('Processing your message...'):
+                    try:
+                        response = requests.post(
+                            "http://localhost:8000/chat",
+                            json=payload
+                        )
+                        response.raise_for_status()
+
+                        data = response.json()
+                        if 'response' in data:
+                            st.markdown("### 🤖 AI Response:")
+                            # Create the big box for the response
+                            st.markdown(
+                                f"<div class='response-box'>{data['response']['response']}</div>",
+                                unsafe_allow_html=True
+                            )
+                        else:
+                            st.error(data.get('error', 'An unknown error occurred'))
+                    except requests.RequestException as e:
+                        st.error(f"🚫 Connection error: {str(e)}")
         else:
             st.warning("⚠️ Please provide both User ID and Message.")
 
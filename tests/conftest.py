@@ -0,0 +1,67 @@
+"""
+Shared fixtures: counselors backed by the offline fake model.
+"""
+
+import os
+
+import pytest
+
+from benchmarks.fake_llm import FakeLLM
+
+def fast_llm(**overrides):
+    """Build a fake model that answers almost at once, with some settings overridden."""
+    settings = {'latency_ms': 1.0, 'latency_distribution': "constant"}
+    settings.update(overrides)
+    return FakeLLM(**settings)
+
+@pytest.fixture
+def make_counselor(monkeypatch):
+    """
+    Build LoanCounselorAgents that talk to a fake model.
+
+    The factory takes the fake model to use (a fast one by default) and the
+    agent's keyword arguments. Exact-match response caching is off, so every
+    prompt reaches the model unless a test passes a cache.
+    """
+    monkeypatch.setenv("RESPONSE_CACHE_BACKEND", "none")
+    monkeypatch.setenv("LANGCHAIN_TRACING_V2", "false")
+    from langsmith import utils as langsmith_utils
+    langsmith_utils.get_env_var.cache_clear()
+    from loan_counselor_agent import LoanCounselorAgent
+    counselors = []
+
+    def make(llm=None, **kwargs):
+        llm = llm if llm is not None else fast_llm()
+        monkeypatch.setattr(LoanCounselorAgent, "_initialize_llm",
+                            staticmethod(lambda model, api_key, temperature: llm))
+        counselor = LoanCounselorAgent(**kwargs)
+        counselors.append(counselor)
+        return counselor
+
+    yield make
+    for counselor in counselors:
+        counselor.memory.stop()
+        if counselor.conversation_writer is not None:
+            counselor.conversation_writer.close()
+        counselor.executor.shutdown(wait=False)
+
+@pytest.fixture
+def client_for(monkeypatch):
+    """
+    Build Flask test clients of the app, serving a given counselor.
+
+    The factory takes a counselor (usually from `make_counselor`) and
+    returns a test client whose requests it answers.
+    """
+    import app
+    from langsmith import utils as langsmith_utils
+    # app.py switches LangSmith tracing on; keep the tests offline
+    monkeypatch.setenv("LANGCHAIN_TRACING_V2", "false")
+    langsmith_utils.get_env_var.cache_clear()
+
+    def client(counselor):
+        monkeypatch.setattr(app, "_counselor", counselor)
+        monkeypatch.setattr(app, "_counselor_pid", os.getpid())
+        return app.app.test_client()
+
+    return client
@@ -0,0 +1,109 @@
+"""
+Tests for the admission controller and per-request deadlines.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.admission import (AdmissionController, AdmissionRejected, DeadlineExceeded,
+                             remaining_time, request_deadline)
+
+def wait_until(condition, timeout=2.0):
+    """Poll until a condition holds, failing the test if it never does."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.001)
+
+def test_released_slots_go_to_waiters_in_arrival_order():
+    controller = AdmissionController(max_concurrency=1, max_queue=8)
+    controller.acquire()
+    order = []
+
+    def worker(number):
+        with controller.slot():
+            order.append(number)
+
+    threads = []
+    for number in range(4):
+        thread = threading.Thread(target=worker, args=(number,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: controller.waiting == number + 1)
+    controller.release()
+    for thread in threads:
+        thread.join()
+
+    assert order == [0, 1, 2, 3]
+    assert controller.stats() == {'active': 0, 'waiting': 0, 'admitted': 5, 'rejected': 0, 'timed_out': 0}
+
+def test_full_queue_is_rejected_at_once_and_checked_before_streaming():
+    controller = AdmissionController(max_concurrency=1, max_queue=0, retry_after=3)
+    controller.check_capacity()
+    controller.acquire()
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire()
+    assert rejected.value.retry_after == 3
+    with pytest.raises(AdmissionRejected):
+        controller.check_capacity()
+    controller.release()
+    controller.check_capacity()
+    assert controller.rejected == 2
+
+def test_waiter_gives_up_at_its_deadline():
+    controller = AdmissionController(max_concurrency=1, max_queue=8)
+    controller.acquire()
+    started = time.monotonic()
+    with request_deadline(0.05), pytest.raises(DeadlineExceeded):
+        controller.acquire()
+    assert time.monotonic() - started < 1.0
+    assert controller.waiting == 0
+    assert controller.timed_out == 1
+    controller.release()
+    assert controller.active == 0
+
+def test_nested_deadlines_only_shorten():
+    assert remaining_time() is None
+    with request_deadline(0.5):
+        with request_deadline(10):
+            assert remaining_time() <= 0.5
+        with request_deadline(None):
+            assert remaining_time() <= 0.5
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    controller = AdmissionController(max_concurrency=1, max_queue=8)
+
+    async def scenario():
+        await controller.aacquire()
+        waiter = asyncio.ensure_future(controller.aacquire())
+        while controller.waiting == 0:
+            await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.waiting == 0
+        controller.release()
+
+    asyncio.run(scenario())
+    assert controller.active == 0
+
+def test_async_waiter_cancelled_after_its_grant_passes_the_slot_on():
+    controller = AdmissionController(max_concurrency=1, max_queue=8)
+
+    async def scenario():
+        await controller.aacquire()
+        waiter = asyncio.ensure_future(controller.aacquire())
+        while controller.waiting == 0:
+            await asyncio.sleep(0)
+        # The slot is handed over, but the waiter is cancelled before it wakes
+        controller.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(scenario())
+    assert controller.active == 0
+    assert controller.waiting == 0
@@ -0,0 +1,101 @@
+"""
+Tests for the streaming and batch chat endpoints.
+"""
+
+import json
+
+from conftest import fast_llm
+from utils.admission import AdmissionController
+from utils.resilience import ResilientCaller
+
+DETAILS = {
+    'name': "Asha",
+    'origin_country': "India",
+    'destination_country': "USA",
+    'loan_amount_needed': 40000,
+    'course_of_study': "MS Computer Science"
+}
+
+def chat_item(user_id, message="Which lenders fit me?", **extra):
+    """Build a /chat request body."""
+    return {'userId': user_id, 'message': message, 'student_details': dict(DETAILS), **extra}
+
+def batch_lines(response):
+    """Decode an NDJSON batch response, ordered by item index."""
+    return sorted((json.loads(line) for line in response.get_data(as_text=True).splitlines()),
+                  key=lambda line: line['index'])
+
+def sse_events(response):
+    """Decode a text/event-stream response into (event, data) pairs."""
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+def test_batch_items_are_validated_one_by_one(make_counselor, client_for):
+    llm = fast_llm()
+    client = client_for(make_counselor(llm, followup_mode="template"))
+    response = client.post("/chat/batch", json={'items': [
+        chat_item("a"),
+        chat_item(42),
+        chat_item(" "),
+        chat_item("a"),
+        chat_item("b", "reset"),
+        chat_item("c", response_mode="structured"),
+        "not an object"
+    ]})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = batch_lines(response)
+    assert [line['status'] for line in lines] == [200, 400, 400, 400, 400, 400, 400]
+    assert lines[0]['userId'] == "a" and lines[0]['response']['response']
+    assert "more than once" in lines[3]['error']
+    assert "reset" in lines[4]['error']
+    assert "whole batch" in lines[5]['error']
+    assert llm.calls == 1
+
+def test_batch_is_refused_when_it_is_not_a_list_of_items(make_counselor, client_for):
+    client = client_for(make_counselor(followup_mode="template"))
+    assert client.post("/chat/batch", json={'items': []}).status_code == 400
+    assert client.post("/chat/batch", json={'items': [chat_item("a")], 'response_mode': "fast"}).status_code == 400
+
+def test_batch_reports_failed_and_turned_away_items(make_counselor, client_for, monkeypatch):
+    llm = fast_llm(failure_rate=1.0)
+    counselor = make_counselor(llm, followup_mode="template", resilience=ResilientCaller(max_retries=0))
+    lines = batch_lines(client_for(counselor).post("/chat/batch", json=[chat_item("a"), chat_item("b")]))
+    assert [line['status'] for line in lines] == [500, 500]
+    assert set(lines[0]) == {'index', 'userId', 'status', 'error'}
+
+    # A turned-away item is retried until its deadline passes
+    import app
+    monkeypatch.setattr(app, "REQUEST_TIMEOUT_SECONDS", 0.2)
+    admission = AdmissionController(max_concurrency=1, max_queue=0, retry_after=2)
+    counselor = make_counselor(fast_llm(), followup_mode="template", admission=admission)
+    with admission.slot():
+        lines = batch_lines(client_for(counselor).post("/chat/batch", json=[chat_item("a")]))
+    assert lines[0]['status'] == 503
+    assert lines[0]['retryAfter'] == 2
+
+def test_stream_sends_tokens_then_the_whole_response(make_counselor, client_for):
+    client = client_for(make_counselor(followup_mode="template"))
+    response = client.post("/chat/stream", json=chat_item("a"))
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = sse_events(response)
+    assert events[-1][0] == "done"
+    assert {event for event, data in events[:-1]} == {"token"}
+    assert "".join(data for event, data in events[:-1]) == events[-1][1]['response']
+    assert len(json.loads(events[-1][1]['query_recommendation'])) == 3
+
+def test_stream_answers_resets_and_saturation_before_streaming(make_counselor, client_for):
+    admission = AdmissionController(max_concurrency=1, max_queue=0, retry_after=2)
+    client = client_for(make_counselor(followup_mode="template", admission=admission))
+    response = client.post("/chat/stream", json=chat_item("a", "reset"))
+    assert response.get_json() == {'response': "Conversation reset successfully"}
+
+    with admission.slot():
+        response = client.post("/chat/stream", json=chat_item("a"))
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == "2"
+    assert client.post("/chat/stream", json=chat_item(" ")).status_code == 400
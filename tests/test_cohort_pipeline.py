@@ -0,0 +1,106 @@
+"""
+Tests for the offline cohort pipeline: checkpoints, resuming and retrying failed rows.
+"""
+
+import json
+
+import pytest
+
+from benchmarks.run_benchmarks import student_profile
+from cohort_pipeline import parse_args, run
+from conftest import fast_llm
+from utils.resilience import ResilientCaller
+
+def write_cohort(path, rows):
+    """Write a JSONL cohort file, one row per line (strings are written as they are)."""
+    with open(path, "w", encoding="utf-8") as cohort:
+        for row in rows:
+            cohort.write((row if isinstance(row, str) else json.dumps(row)) + "\n")
+
+def output_lines(path):
+    """Read the result lines of a run."""
+    with open(path, encoding="utf-8") as output:
+        return [json.loads(line) for line in output]
+
+def checkpoint(output_path):
+    """Read the checkpoint written next to an output file."""
+    with open(f"{output_path}.checkpoint", encoding="utf-8") as saved:
+        return json.load(saved)
+
+def test_each_row_gets_one_line_and_invalid_rows_are_reported(tmp_path, make_counselor):
+    cohort = tmp_path / "cohort.jsonl"
+    output = tmp_path / "results.jsonl"
+    write_cohort(cohort, [
+        student_profile(0),
+        "not json",
+        {'name': "No details"},
+        {'userId': "row-0", **student_profile(3)},
+        {'userId': "s4", 'message': "Do I need collateral?", 'student_details': student_profile(4)}
+    ])
+    counts = run(parse_args([str(cohort), "--output", str(output), "--chunk-size", "2"]),
+                 make_counselor(followup_mode="template"))
+    assert counts == {'ok': 2, 'invalid': 3, 'error': 0}
+
+    lines = sorted(output_lines(output), key=lambda line: line['index'])
+    assert [(line['index'], line['userId'], line['status']) for line in lines] == [
+        (0, "row-0", 200), (1, None, 400), (2, "row-2", 400), (3, "row-0", 400), (4, "s4", 200)
+    ]
+    assert checkpoint(output)['position'] == 5
+
+    # Without its checkpoint, existing output is only overwritten when asked to
+    (tmp_path / "results.jsonl.checkpoint").unlink()
+    with pytest.raises(ValueError):
+        run(parse_args([str(cohort), "--output", str(output)]), make_counselor(followup_mode="template"))
+
+def test_interrupted_run_resumes_from_its_checkpoint(tmp_path, make_counselor):
+    cohort = tmp_path / "cohort.jsonl"
+    output = tmp_path / "results.jsonl"
+    write_cohort(cohort, [student_profile(i) for i in range(6)])
+    args = parse_args([str(cohort), "--output", str(output), "--chunk-size", "2"])
+    llm = fast_llm()
+    counselor = make_counselor(llm, followup_mode="template")
+    generate = counselor.get_loan_recommendations_batch
+    chunks = []
+
+    def crash_in_second_chunk(items, **kwargs):
+        chunks.append(items)
+        results = generate(items, **kwargs)
+        if len(chunks) < 2:
+            yield from results
+            return
+        yield next(results)
+        raise KeyboardInterrupt
+
+    counselor.get_loan_recommendations_batch = crash_in_second_chunk
+    with pytest.raises(KeyboardInterrupt):
+        run(args, counselor)
+    assert checkpoint(output)['position'] == 2
+    assert len(output_lines(output)) == 3
+
+    counselor.get_loan_recommendations_batch = generate
+    calls = llm.calls
+    assert run(args, counselor) == {'ok': 6, 'invalid': 0, 'error': 0}
+    assert sorted(line['index'] for line in output_lines(output)) == list(range(6))
+    # The interrupted chunk is redone, the finished one is not
+    assert llm.calls - calls == 4
+
+def test_failed_rows_are_kept_and_retried_with_retry_errors(tmp_path, make_counselor):
+    cohort = tmp_path / "cohort.jsonl"
+    output = tmp_path / "results.jsonl"
+    write_cohort(cohort, [student_profile(i) for i in range(4)])
+    llm = fast_llm(failure_rate=1.0)
+    counselor = make_counselor(llm, followup_mode="template", resilience=ResilientCaller(max_retries=0))
+    args = parse_args([str(cohort), "--output", str(output), "--chunk-size", "3"])
+    assert run(args, counselor) == {'ok': 0, 'invalid': 0, 'error': 4}
+    assert checkpoint(output)['failed'] == [0, 1, 2, 3]
+
+    llm.failure_rate = 0.0
+    # Without --retry-errors a finished run has nothing left to do
+    assert run(args, counselor) == {'ok': 0, 'invalid': 0, 'error': 4}
+    retry = parse_args([str(cohort), "--output", str(output), "--chunk-size", "3", "--retry-errors"])
+    assert run(retry, counselor) == {'ok': 4, 'invalid': 0, 'error': 0}
+    assert checkpoint(output)['failed'] == []
+
+    latest = {line['index']: line for line in output_lines(output)}
+    assert [latest[index]['status'] for index in range(4)] == [200] * 4
+    assert len(output_lines(output)) == 8
@@ -0,0 +1,64 @@
+"""
+Tests for the conversation store shared across workers.
+"""
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from vector_store.conversation_store import SQLiteConversationStore
+
+DETAILS = {
+    'name': "Asha",
+    'origin_country': "India",
+    'destination_country': "USA",
+    'loan_amount_needed': 40000,
+    'course_of_study': "MS Computer Science"
+}
+
+def turn(question):
+    """Build the messages of one turn."""
+    return [HumanMessage(content=question), AIMessage(content=f"Answer to {question}")]
+
+def contents(messages):
+    """Return the texts of messages."""
+    return [message.content for message in messages]
+
+def test_appends_are_read_back_in_order(tmp_path):
+    store = SQLiteConversationStore(str(tmp_path / "conversations.sqlite3"))
+    store.append("a", turn("first"))
+    store.append_many([("a", turn("second")), ("b", turn("other"))])
+    assert contents(store.load("a")) == ["first", "Answer to first", "second", "Answer to second"]
+    assert contents(store.load("b")) == ["other", "Answer to other"]
+    assert store.load("unknown") == []
+
+def test_cache_picks_up_writes_and_deletes_of_other_workers(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    worker, other_worker = SQLiteConversationStore(path), SQLiteConversationStore(path)
+    worker.append("a", turn("first"))
+    worker.load("a")
+    worker.load("a")
+    assert (worker.hits, worker.misses) == (1, 1)
+
+    other_worker.append("a", turn("second"))
+    assert contents(worker.load("a"))[-1] == "Answer to second"
+
+    other_worker.delete("a")
+    other_worker.append("a", turn("again"))
+    assert contents(worker.load("a")) == ["again", "Answer to again"]
+
+def test_turns_are_shared_by_counselors_of_different_workers(tmp_path, make_counselor):
+    path = str(tmp_path / "conversations.sqlite3")
+    worker = make_counselor(conversation_store=SQLiteConversationStore(path), followup_mode="template")
+    other_worker = make_counselor(conversation_store=SQLiteConversationStore(path), followup_mode="template")
+
+    worker.get_loan_recommendation(dict(DETAILS), "Which lenders fit me?", "a")
+    # Until flushed, the turn is read from the write-behind queue
+    assert len(worker.get_user_memory("a").chat_memory.messages) == 2
+    worker.conversation_writer.flush()
+    other_worker.get_loan_recommendation(dict(DETAILS), "What about rates?", "a")
+    other_worker.conversation_writer.flush()
+
+    messages = worker.conversation_store.load("a")
+    assert contents(messages)[::2] == ["Which lenders fit me?", "What about rates?"]
+
+    other_worker.reset_conversation("a")
+    assert worker.get_user_memory("a").chat_memory.messages == []
@@ -0,0 +1,65 @@
+"""
+Tests for the token-budgeted conversation window with a running summary.
+"""
+
+from utils.conversation_window import RollingSummaryWindow, estimate_tokens
+
+def conversation(turns):
+    """Build the formatted lines of a number of turns."""
+    lines = []
+    for turn in range(turns):
+        lines += [f"Student: question {turn}", f"Counselor: answer {turn}"]
+    return lines
+
+def joining_window(**kwargs):
+    """Build a window whose summary is every folded line, recording each summarizer call."""
+    calls = []
+
+    def summarize(summary, new_lines):
+        calls.append(new_lines)
+        return "\n".join(part for part in (summary, new_lines) if part)
+
+    return RollingSummaryWindow(summarize, **kwargs), calls
+
+def test_turns_are_folded_a_whole_window_at_a_time():
+    window, calls = joining_window(window_turns=2)
+    for turns in range(1, 8):
+        window.fold("a", conversation(turns))
+    # Folding starts once two windows of turns are unfolded and keeps one window verbatim
+    assert len(calls) == 2
+    assert window.summary("a") == "\n".join(conversation(4))
+    _, unfolded = window.context("a", conversation(7))
+    assert unfolded == conversation(7)[8:]
+
+    rendered = window.render("a", conversation(7))
+    assert rendered.startswith("Summary of earlier conversation:\nStudent: question 0")
+    assert rendered.endswith("Recent conversation:\n" + "\n".join(conversation(7)[8:]))
+
+def test_rendered_history_keeps_the_newest_lines_within_the_budget():
+    window, calls = joining_window(token_budget=20)
+    lines = conversation(10)
+    rendered = window.render("a", lines)
+    assert rendered.endswith(lines[-1])
+    assert "question 0" not in rendered
+    assert estimate_tokens(rendered) <= 20
+    assert calls == []
+
+    # The newest line is kept even if it alone is over budget
+    assert window.render("a", ["Student: " + "long " * 100]) == "Student: " + "long " * 100
+
+def test_summary_is_dropped_when_the_conversation_is_reset_or_replaced():
+    window, calls = joining_window(window_turns=1)
+    window.fold("a", conversation(2))
+    assert window.summary("a") == "\n".join(conversation(1))
+
+    # Another worker reset the conversation and it started again
+    assert window.context("a", ["Student: hello"]) == ("", ["Student: hello"])
+    assert window.summary("a") is None
+
+    window.fold("a", conversation(2))
+    replaced = ["Student: something else", "Counselor: sure"] + conversation(2)[2:]
+    assert window.context("a", replaced) == ("", replaced)
+
+    window.fold("a", conversation(2))
+    window.reset("a")
+    assert window.render("a", conversation(1)) == "\n".join(conversation(1))
@@ -0,0 +1,55 @@
+"""
+Tests for the template follow-up question generator.
+"""
+
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from conftest import fast_llm
+from utils.followups import FOLLOWUP_MODE_LLM, FOLLOWUP_MODE_TEMPLATE, FollowUpGenerator, _format_amount
+
+LENDERS = ("Prodigy", "HDFC Credila", "SBI")
+
+def test_amounts_are_shown_in_the_students_currency():
+    assert _format_amount(30000) == "$30,000"
+    assert _format_amount(2500000, "inr") == "2,500,000 INR"
+    assert _format_amount("INR 2,500,000") == "2,500,000 INR"
+    assert _format_amount("about a lakh") == "about a lakh"
+    assert _format_amount(None) is None
+
+def test_topic_just_asked_about_comes_first_then_new_topics():
+    generator = FollowUpGenerator(LENDERS)
+    assert generator.generate("What interest rate does prodigy offer?") == [
+        "What interest rate could I get from Prodigy?",
+        "Am I eligible for a loan from Prodigy?",
+        "How do I apply for a loan with Prodigy?"
+    ]
+
+def test_questions_use_the_lender_of_the_latest_message_and_the_profile():
+    generator = FollowUpGenerator(LENDERS)
+    history = [HumanMessage(content="Is Prodigy good?"), AIMessage(content="SBI would suit you better.")]
+    questions = generator.generate("Do I need collateral?", history, {
+        'loan_amount_needed': 2500000, 'loan_currency': "INR"
+    })
+    assert questions[0] == "Do I need collateral for 2,500,000 INR?"
+    assert questions[1:] == ["Am I eligible for a loan from SBI?", "What interest rate could I get from SBI?"]
+
+def test_questions_already_asked_are_skipped():
+    generator = FollowUpGenerator(LENDERS, count=2)
+    history = [HumanMessage(content="What interest rate could I get from Prodigy?")]
+    assert generator.generate("And the interest rate?", history) == [
+        "Is the interest rate fixed or variable?",
+        "Am I eligible for a loan from Prodigy?"
+    ]
+
+def test_template_mode_makes_no_model_call(make_counselor):
+    llm = fast_llm()
+    counselor = make_counselor(llm, followup_mode=FOLLOWUP_MODE_TEMPLATE)
+    questions = json.loads(counselor.get_query_recommendation("What are the interest rates?", "a"))
+    assert len(questions) == 3
+    assert llm.calls == 0
+
+    counselor.followup_mode = FOLLOWUP_MODE_LLM
+    assert len(json.loads(counselor.get_query_recommendation("What are the interest rates?", "a"))) == 3
+    assert llm.calls == 1
@@ -0,0 +1,115 @@
+"""
+Tests for loading the lender catalog and reloading it while serving.
+"""
+
+import csv
+import json
+import os
+
+import pytest
+
+from loan_counselor_agent import _build_shared_state
+from utils import lender_catalog
+from utils.constant import LENDER_DATA
+from utils.lender_catalog import CatalogWatcher, load_catalog
+
+STUDENT = {
+    'name': "Asha",
+    'origin_country': "India",
+    'destination_country': "USA",
+    'loan_amount_needed': 40000,
+    'course_of_study': "MS Computer Science"
+}
+
+def write_json(path, records, mtime=None):
+    """Write a JSON catalog, optionally with a given modification time."""
+    with open(path, "w", encoding="utf-8") as catalog:
+        json.dump(records, catalog)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+def test_json_and_csv_catalogs_load_alike(tmp_path):
+    json_path = tmp_path / "lenders.json"
+    write_json(json_path, LENDER_DATA)
+    csv_path = tmp_path / "lenders.csv"
+    with open(csv_path, "w", encoding="utf-8", newline="") as catalog:
+        writer = csv.DictWriter(catalog, fieldnames=list(LENDER_DATA[0]))
+        writer.writeheader()
+        for record in LENDER_DATA:
+            writer.writerow({**record, 'key_points': ";".join(record['key_points'])})
+
+    from_json = load_catalog(str(json_path))
+    from_csv = load_catalog(str(csv_path))
+    assert [lender.to_dict() for lender in from_json] == [lender.to_dict() for lender in from_csv]
+    assert len(from_json) == len(LENDER_DATA)
+
+def test_parsed_catalog_is_reused_until_the_file_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "lenders.json")
+    write_json(path, LENDER_DATA, mtime=1_000_000)
+    load_catalog(path)
+    assert os.path.exists(f"{path}.cache")
+
+    def unreadable(path):
+        raise AssertionError("the cache should have been used")
+
+    monkeypatch.setattr(lender_catalog, "read_catalog_file", unreadable)
+    assert len(load_catalog(path)) == len(LENDER_DATA)
+
+    monkeypatch.undo()
+    write_json(path, LENDER_DATA[:2], mtime=2_000_000)
+    assert len(load_catalog(path)) == 2
+
+def test_unsupported_or_malformed_catalogs_are_refused(tmp_path):
+    path = tmp_path / "lenders.json"
+    write_json(path, {'name': "Not a list"})
+    with pytest.raises(ValueError):
+        load_catalog(str(path))
+    xml_path = tmp_path / "lenders.xml"
+    xml_path.write_text("<lenders/>")
+    with pytest.raises(ValueError):
+        load_catalog(str(xml_path))
+
+def test_watcher_swaps_in_a_new_snapshot_and_keeps_it_on_errors(tmp_path):
+    path = str(tmp_path / "lenders.json")
+    write_json(path, LENDER_DATA, mtime=1_000_000)
+    builds = []
+
+    def build(lenders, version, previous):
+        builds.append((len(lenders), version, previous))
+        return f"snapshot {version}"
+
+    watcher = CatalogWatcher(build, path=path, poll_interval=0)
+    seen = []
+    watcher.subscribe(seen.append)
+    assert not watcher.check()
+
+    write_json(path, LENDER_DATA[:3], mtime=2_000_000)
+    assert watcher.check()
+    assert watcher.current() == "snapshot 2"
+    assert builds == [(len(LENDER_DATA), 1, None), (3, 2, "snapshot 1")]
+    assert seen == ["snapshot 2"]
+
+    with open(path, "w", encoding="utf-8") as catalog:
+        catalog.write("{broken")
+    os.utime(path, (3_000_000, 3_000_000))
+    assert not watcher.check()
+    assert watcher.current() == "snapshot 2"
+    assert (watcher.version, watcher.reloads, watcher.errors) == (2, 1, 1)
+
+def test_reloaded_catalog_has_recent_students_lender_blocks_ready(tmp_path, make_counselor):
+    path = str(tmp_path / "lenders.json")
+    write_json(path, LENDER_DATA, mtime=1_000_000)
+    counselor = make_counselor(followup_mode="template")
+    counselor.catalog = CatalogWatcher(_build_shared_state, path=path, poll_interval=0)
+    counselor.get_loan_recommendation(dict(STUDENT), "Which lenders fit me?", "a")
+
+    cheaper = [dict(record) for record in LENDER_DATA]
+    cheaper[0]['interest_rate'] = "8.0% - 9.0%"
+    write_json(path, cheaper, mtime=2_000_000)
+    assert counselor.catalog.check()
+    context = counselor.catalog.current().lender_context
+    rendered = context.misses
+
+    counselor.get_loan_recommendation(dict(STUDENT), "Which lenders fit me?", "b")
+    assert context.misses == rendered
+    assert context.hits
@@ -0,0 +1,93 @@
+"""
+Tests for matching students with the lenders that can serve them.
+"""
+
+import pickle
+
+from utils.lender_matching import (Lender, LenderMatcher, parse_amount, parse_flag,
+                                   parse_interest_rate, to_usd)
+
+def lender(name, **overrides):
+    """Build a catalog record, with some fields overridden."""
+    record = {
+        'name': name,
+        'interest_rate': "10.0% - 12.0%",
+        'maximum_amount': "USD 100,000",
+        'currency': "USD",
+        'country': "India",
+        'university_country': "Any"
+    }
+    record.update(overrides)
+    return record
+
+def student(**overrides):
+    """Build a student profile, with some fields overridden."""
+    details = {'origin_country': "India", 'destination_country': "USA", 'loan_amount_needed': 40000}
+    details.update(overrides)
+    return details
+
+def names(lenders):
+    """Return the names of lenders."""
+    return [lender.name for lender in lenders]
+
+def test_terms_are_parsed_from_catalog_text():
+    assert parse_interest_rate("10.15% - 12.0%") == (10.15, 12.0)
+    assert parse_interest_rate("unknown") == (None, None)
+    assert parse_amount("INR 10,000,000") == (10000000.0, "INR")
+    assert parse_amount("100% of school-certified expenses (USD)") == (None, "USD")
+    assert parse_amount(40000, default_currency="EUR") == (40000.0, "EUR")
+    assert to_usd(100.0, "XYZ") is None
+    assert (parse_flag("Yes"), parse_flag("0"), parse_flag("maybe")) == (True, False, None)
+
+def test_records_keep_their_text_and_survive_pickling():
+    record = lender("Prodigy", collateral_required="false", key_points=["No cosigner"])
+    parsed = Lender.from_dict(record)
+    assert parsed.collateral_required is False
+    assert parsed.to_dict()['interest_rate'] == "10.0% - 12.0%"
+    assert parsed.to_dict()['key_points'] == ["No cosigner"]
+    copy = pickle.loads(pickle.dumps(parsed))
+    assert (copy.name, copy.min_rate, copy.max_amount_usd, copy.countries) == (
+        "Prodigy", 10.0, 100000.0, frozenset({"india"})
+    )
+
+def test_only_lenders_serving_both_countries_are_candidates():
+    matcher = LenderMatcher([
+        lender("Indian bank"),
+        lender("UK only", university_country="UK"),
+        lender("Nigerian bank", country="Nigeria"),
+        lender("US lender", country="United States", university_country="USA")
+    ])
+    assert sorted(names(matcher.match(student()))) == ["Indian bank", "US lender"]
+    assert names(matcher.match(student(destination_country="United Kingdom"))) == ["Indian bank", "UK only"]
+
+def test_requirements_the_student_cannot_meet_rule_lenders_out():
+    matcher = LenderMatcher([
+        lender("Needs cosigner", us_cosigner_required=True, interest_rate="3%"),
+        lender("Needs collateral", collateral_required=True, interest_rate="4%"),
+        lender("Unsecured", interest_rate="9%")
+    ])
+    assert names(matcher.match(student(has_us_cosigner="no", has_collateral=False))) == ["Unsecured"]
+    assert names(matcher.match(student(has_us_cosigner=True, has_collateral=True)))[0] == "Needs cosigner"
+
+def test_lenders_covering_the_amount_rank_first():
+    matcher = LenderMatcher([
+        lender("Small", maximum_amount="USD 10,000", interest_rate="5%"),
+        lender("Large", maximum_amount="INR 10,000,000", currency="INR", interest_rate="6%")
+    ])
+    assert names(matcher.match(student(loan_amount_needed=50000))) == ["Large", "Small"]
+    assert names(matcher.match(student(loan_amount_needed=50000), top_n=1)) == ["Large"]
+
+def test_cheapest_lenders_are_offered_when_nothing_matches():
+    matcher = LenderMatcher([
+        lender("Unknown rate", interest_rate="ask us"),
+        lender("Dear", interest_rate="12%"),
+        lender("Cheap", interest_rate="4% - 20%")
+    ])
+    assert names(matcher.match(student(origin_country="Brazil"))) == ["Cheap", "Dear", "Unknown rate"]
+
+def test_recent_distinct_inputs_are_remembered():
+    matcher = LenderMatcher([lender("Indian bank")], recent_size=2)
+    for amount in (10000, 20000, 10000, 30000):
+        matcher.match(student(loan_amount_needed=amount))
+    assert [inputs[2] for inputs in matcher.recent_inputs()] == [10000.0, 30000.0]
+    assert matcher.recent_inputs()[-1] == LenderMatcher.match_inputs(student(loan_amount_needed=30000))
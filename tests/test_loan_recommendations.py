@@ -0,0 +1,68 @@
+"""
+Tests for the semantic cache of first-turn recommendations.
+"""
+
+from vector_store.loan_recommendations import LoanRecommendationStore
+
+MESSAGE = "Which education loans can I get for my masters?"
+
+def profile(**overrides):
+    """Build a student profile, with some fields overridden."""
+    details = {
+        'name': "Asha",
+        'origin_country': "India",
+        'destination_country': "USA",
+        'loan_amount_needed': 40000,
+        'course_of_study': "MS Computer Science"
+    }
+    details.update(overrides)
+    return details
+
+def store_with_answer(answer="Asha, Prodigy Finance suits study in the USA."):
+    """Build a store holding one answer for the default profile."""
+    store = LoanRecommendationStore(threshold=0.92)
+    store.store_recommendation(profile(), answer, message=MESSAGE)
+    return store
+
+def test_same_situation_hits_and_is_personalized():
+    store = store_with_answer()
+    answer = store.find_similar_recommendations(profile(name="Bo"), MESSAGE)
+    assert answer == "Bo, Prodigy Finance suits study in the USA."
+
+def test_different_destination_never_hits():
+    store = store_with_answer()
+    for destination in ("UK", "Canada", "Germany", "Australia", "United Kingdom"):
+        assert store.find_similar_recommendations(profile(destination_country=destination), MESSAGE) is None
+
+def test_different_origin_currency_or_amount_never_hits():
+    store = store_with_answer()
+    assert store.find_similar_recommendations(profile(origin_country="Nigeria"), MESSAGE) is None
+    assert store.find_similar_recommendations(profile(loan_amount_needed=90000), MESSAGE) is None
+    assert store.find_similar_recommendations(profile(loan_currency="INR"), MESSAGE) is None
+
+def test_different_course_or_university_never_hits():
+    store = store_with_answer()
+    assert store.find_similar_recommendations(profile(course_of_study="MS Data Science"), MESSAGE) is None
+    assert store.find_similar_recommendations(profile(university="MIT"), MESSAGE) is None
+    assert store.find_similar_recommendations(profile(course_of_study="ms  computer-science"), MESSAGE) is not None
+
+def test_name_is_replaced_as_a_whole_word_only():
+    store = LoanRecommendationStore(threshold=0.92)
+    store.store_recommendation(profile(name="Al"), "Hi Al! Also, Alternatively ask Al.", message=MESSAGE)
+    answer = store.find_similar_recommendations(profile(name="Bo"), MESSAGE)
+    assert answer == "Hi Bo! Also, Alternatively ask Bo."
+
+def test_answers_are_only_served_for_their_catalog_version():
+    store = LoanRecommendationStore(threshold=0.92)
+    store.store_recommendation(profile(), "Rates of version 1.", message=MESSAGE, version=1)
+    assert store.find_similar_recommendations(profile(), MESSAGE, version=1) == "Rates of version 1."
+    assert store.find_similar_recommendations(profile(), MESSAGE, version=2) is None
+
+def test_newer_catalog_version_drops_older_answers_and_refuses_late_ones():
+    store = LoanRecommendationStore(threshold=0.92)
+    store.store_recommendation(profile(), "Rates of version 1.", message=MESSAGE, version=1)
+    store.store_recommendation(profile(), "Rates of version 2.", message=MESSAGE, version=2)
+    # Generated under version 1 but only stored after the reload
+    store.store_recommendation(profile(), "Late rates of version 1.", message=MESSAGE, version=1)
+    assert store.stats()['entries'] == 1
+    assert store.find_similar_recommendations(profile(), MESSAGE, version=2) == "Rates of version 2."
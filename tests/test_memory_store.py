@@ -0,0 +1,88 @@
+"""
+Tests for the bounded per-user conversation memory store.
+"""
+
+import time
+
+import pytest
+from langchain.memory import ConversationBufferMemory
+
+from utils.memory_store import SessionMemoryStore, SQLiteSpillStore
+
+def new_memory(user_id):
+    """Create an empty conversation memory, as the counselor does without a store."""
+    return ConversationBufferMemory(memory_key=f"conversation_history_{user_id}", return_messages=True)
+
+def say(memory, text):
+    """Add a turn to a conversation memory."""
+    memory.save_context({'input': text}, {'output': f"Answer to {text}"})
+
+def test_least_recently_used_sessions_are_evicted():
+    store = SessionMemoryStore(new_memory, max_sessions=2)
+    for user_id in ("a", "b"):
+        store.get_or_create(user_id)
+    store.get_or_create("a")
+    store.get_or_create("c")
+    assert sorted(store) == ["a", "c"]
+    assert "b" not in store
+    assert store.evictions == 1
+
+def test_byte_limit_evicts_the_oldest_sessions():
+    store = SessionMemoryStore(new_memory, max_bytes=2000)
+    for user_id in ("a", "b", "c"):
+        say(store.get_or_create(user_id), "x" * 300)
+        store.get_or_create(user_id)
+    assert store.resident_bytes <= 2000
+    assert "c" in store
+    assert "a" not in store
+
+def test_pinned_sessions_survive_eviction_until_unpinned():
+    store = SessionMemoryStore(new_memory, max_sessions=1)
+    memory = store.pin("a")
+    store.get_or_create("b")
+    store.get_or_create("c")
+    assert "a" in store
+    say(memory, "Which lenders fit me?")
+    store.unpin("a")
+    store.get_or_create("d")
+    assert "a" not in store
+    assert list(store) == ["d"]
+
+def test_evicted_sessions_are_spilled_and_rehydrated(tmp_path):
+    store = SessionMemoryStore(new_memory, max_sessions=1,
+                               spill_store=SQLiteSpillStore(str(tmp_path / "spill.sqlite3")))
+    say(store.get_or_create("a"), "Which lenders fit me?")
+    store.get_or_create("b")
+    assert list(store) == ["b"]
+    assert "a" in store
+
+    memory = store["a"]
+    assert [message.content for message in memory.chat_memory.messages] == [
+        "Which lenders fit me?", "Answer to Which lenders fit me?"
+    ]
+    assert store.rehydrations == 1
+    assert not store.spill_store.contains("a")
+
+    del store["b"]
+    assert "b" not in store
+    with pytest.raises(KeyError):
+        store["unknown"]
+
+def test_idle_sessions_expire():
+    store = SessionMemoryStore(new_memory, ttl_seconds=0.05)
+    store.get_or_create("a")
+    store.pin("b")
+    time.sleep(0.1)
+    store.evict_expired()
+    assert list(store) == ["b"]
+
+def test_every_turn_lands_in_a_store_smaller_than_the_users(make_counselor):
+    store = SessionMemoryStore(new_memory, max_sessions=1)
+    counselor = make_counselor(memory_store=store, followup_mode="template")
+    details = {'name': "Asha", 'origin_country': "India", 'destination_country': "USA",
+               'loan_amount_needed': 40000, 'course_of_study': "MS Computer Science"}
+    for user_id in ("a", "b", "c"):
+        result = counselor.get_loan_recommendation(dict(details), "Which lenders fit me?", user_id)
+        assert 'response' in result
+    assert list(store) == ["c"]
+    assert len(store["c"].chat_memory.messages) == 2
@@ -0,0 +1,103 @@
+"""
+Tests for sending the shared prompt prefix by handle.
+"""
+
+import pytest
+
+from conftest import fast_llm
+from utils.prompt_prefix import ContextCacheAdapter, PromptAdapter, PromptParts
+
+DETAILS = {
+    'name': "Asha",
+    'origin_country': "India",
+    'destination_country': "USA",
+    'loan_amount_needed': 40000,
+    'course_of_study': "MS Computer Science"
+}
+
+PREFIX = "You are a loan counselor. " * 10
+
+def recording_create(handles):
+    """Build a prefix registration that hands out numbered handles and records each call."""
+    def create(prefix, ttl_seconds, timeout=None):
+        handles.append(prefix)
+        return f"cachedContents/{len(handles)}"
+    return create
+
+def test_split_prompts_refer_to_one_handle_per_prefix():
+    handles = []
+    adapter = ContextCacheAdapter(recording_create(handles))
+    assert adapter.prepare(PromptParts(PREFIX, "Question one")) == (
+        "Question one", {'cached_content': "cachedContents/1"}
+    )
+    assert adapter.prepare(PromptParts(PREFIX, "Question two"))[1] == {'cached_content': "cachedContents/1"}
+    assert adapter.prepare("A whole prompt") == ("A whole prompt", {})
+    assert handles == [PREFIX]
+    assert adapter.stats() == {'hits': 2, 'created': 1, 'fallbacks': 0}
+
+    assert PromptAdapter().prepare(PromptParts(PREFIX, "Question")) == (PREFIX + "Question", {})
+
+def test_short_prefixes_are_sent_inline_without_registering():
+    handles = []
+    adapter = ContextCacheAdapter(recording_create(handles), min_prefix_tokens=len(PREFIX))
+    assert adapter.prepare(PromptParts(PREFIX, "Question")) == (PREFIX + "Question", {})
+    assert handles == []
+    assert adapter.fallbacks == 1
+
+def refusing_once(attempts):
+    """Build a prefix registration that refuses the first prefix it is given."""
+    def create(prefix, ttl_seconds, timeout=None):
+        attempts.append(prefix)
+        if len(attempts) == 1:
+            raise ValueError("content too small to cache")
+        return "cachedContents/1"
+    return create
+
+def test_refused_prefixes_are_sent_inline_and_retried_later():
+    attempts = []
+    adapter = ContextCacheAdapter(refusing_once(attempts), retry_seconds=60)
+    assert adapter.prepare(PromptParts(PREFIX, "Question")) == (PREFIX + "Question", {})
+    assert adapter.prepare(PromptParts(PREFIX, "Question")) == (PREFIX + "Question", {})
+    assert len(attempts) == 1
+
+    attempts = []
+    adapter = ContextCacheAdapter(refusing_once(attempts), retry_seconds=0)
+    assert adapter.prepare(PromptParts(PREFIX, "Question")) == (PREFIX + "Question", {})
+    assert adapter.prepare(PromptParts(PREFIX, "Question"))[1] == {'cached_content': "cachedContents/1"}
+    assert adapter.stats() == {'hits': 1, 'created': 1, 'fallbacks': 1}
+
+def test_stale_handle_is_dropped_and_the_call_resent_whole():
+    handles = []
+    adapter = ContextCacheAdapter(recording_create(handles))
+    prompt = PromptParts(PREFIX, "Question")
+    text, options = adapter.prepare(prompt)
+    assert adapter.recover(prompt, options, TimeoutError("timed out")) is None
+
+    error = RuntimeError("request failed")
+    error.__cause__ = ValueError("Unknown cached content: cachedContents/1")
+    assert adapter.recover(prompt, options, error) == (PREFIX + "Question", {})
+    assert adapter.prepare(prompt)[1] == {'cached_content': "cachedContents/2"}
+
+def test_backend_is_chosen_from_the_environment(monkeypatch):
+    assert isinstance(PromptAdapter.from_env(fast_llm()), ContextCacheAdapter)
+    assert type(PromptAdapter.from_env(object())) is PromptAdapter
+    monkeypatch.setenv("PROMPT_CACHE_BACKEND", "none")
+    assert type(PromptAdapter.from_env(fast_llm())) is PromptAdapter
+    monkeypatch.setenv("PROMPT_CACHE_BACKEND", "redis")
+    with pytest.raises(ValueError):
+        PromptAdapter.from_env(fast_llm())
+
+def test_counselor_uploads_the_prefix_once_and_survives_its_loss(make_counselor, monkeypatch):
+    monkeypatch.setenv("PROMPT_CACHE_MIN_TOKENS", "0")
+    llm = fast_llm()
+    counselor = make_counselor(llm, followup_mode="template")
+    for user_id in ("a", "b"):
+        assert 'error' not in counselor.get_loan_recommendation(dict(DETAILS), "Which lenders fit me?", user_id)
+    assert llm.cached_contents == 1
+    assert counselor.prompt_adapter.hits == 2
+
+    # The provider forgets the prefix before its lifetime is up
+    llm._prefixes.clear()
+    assert 'error' not in counselor.get_loan_recommendation(dict(DETAILS), "Which lenders fit me?", "c")
+    counselor.get_loan_recommendation(dict(DETAILS), "Which lenders fit me?", "d")
+    assert llm.cached_contents == 2
@@ -0,0 +1,148 @@
+"""
+Tests for retried and hedged model calls.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.fake_llm import FakeLLMError
+from conftest import fast_llm
+from utils.admission import AdmissionController, AdmissionRejected, DeadlineExceeded, request_deadline
+from utils.resilience import LatencyTracker, ResilientCaller, is_retryable
+
+def warm_tracker(seconds):
+    """Build a latency tracker whose every percentile is `seconds`."""
+    tracker = LatencyTracker(min_samples=1)
+    tracker.observe(seconds)
+    return tracker
+
+class HttpError(Exception):
+    """Client error carrying an HTTP status, like the Google API errors."""
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+def test_transient_errors_are_retried_and_others_raised_at_once():
+    assert is_retryable(FakeLLMError("unavailable"))
+    assert is_retryable(TimeoutError())
+    assert is_retryable(HttpError(429))
+    assert not is_retryable(HttpError(400))
+    assert not is_retryable(ValueError("bad prompt"))
+    try:
+        try:
+            raise FakeLLMError("unavailable")
+        except FakeLLMError as e:
+            raise RuntimeError("wrapped") from e
+    except RuntimeError as wrapped:
+        assert is_retryable(wrapped)
+
+def test_failed_attempts_are_retried_until_one_succeeds():
+    llm = fast_llm(failure_rate=1.0)
+    caller = ResilientCaller(max_retries=3, backoff_base=0.001, seed=0)
+
+    def send(timeout):
+        if llm.calls == 2:
+            llm.failure_rate = 0.0
+        return llm.predict("Which lenders fit me?", timeout=timeout)
+
+    assert caller.call(send)
+    assert llm.calls == 3
+    assert (caller.attempts, caller.retries, caller.failures) == (3, 2, 2)
+
+def test_retries_stop_after_max_retries():
+    llm = fast_llm(failure_rate=1.0)
+    caller = ResilientCaller(max_retries=2, backoff_base=0.001, seed=0)
+    with pytest.raises(FakeLLMError):
+        caller.call(lambda timeout: llm.predict("prompt", timeout=timeout))
+    assert llm.calls == 3
+
+def test_permanent_and_overload_errors_are_not_retried():
+    caller = ResilientCaller(max_retries=3, backoff_base=0.001)
+    calls = []
+
+    def invalid(timeout):
+        calls.append(1)
+        raise HttpError(400)
+
+    def rejected(timeout):
+        calls.append(1)
+        raise AdmissionRejected("busy")
+
+    with pytest.raises(HttpError):
+        caller.call(invalid)
+    with pytest.raises(AdmissionRejected):
+        caller.call(rejected)
+    assert len(calls) == 2
+    assert caller.retries == 0
+
+def test_no_retry_when_the_backoff_would_miss_the_deadline():
+    llm = fast_llm(failure_rate=1.0)
+    caller = ResilientCaller(max_retries=3, backoff_base=0.001, latency=warm_tracker(1.0))
+    with request_deadline(0.2), pytest.raises(DeadlineExceeded):
+        caller.call(lambda timeout: llm.predict("prompt", timeout=timeout))
+    assert llm.calls == 1
+
+def test_slow_attempts_time_out_and_are_retried():
+    llm = fast_llm(latency_ms=300)
+    caller = ResilientCaller(max_retries=1, backoff_base=0.001, attempt_timeout=0.02)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        caller.call(lambda timeout: llm.predict("prompt", timeout=timeout))
+    assert time.monotonic() - started < 0.25
+    assert caller.attempts == 2
+
+def test_slow_call_is_hedged_and_the_faster_request_wins():
+    slow, fast = fast_llm(latency_ms=1000), fast_llm(latency_ms=5)
+    caller = ResilientCaller(hedge=True, hedge_min_delay=0.02, latency=warm_tracker(0.02))
+    models = iter([slow, fast])
+    started = time.monotonic()
+    answer = caller.call(lambda timeout: next(models).predict("prompt", timeout=timeout))
+    assert time.monotonic() - started < 0.5
+    assert answer == fast.predict("prompt")
+    assert (caller.hedges, caller.hedge_wins) == (1, 1)
+
+def test_async_hedge_cancels_the_losing_request():
+    slow, fast = fast_llm(latency_ms=1000), fast_llm(latency_ms=5)
+    caller = ResilientCaller(hedge=True, hedge_min_delay=0.02, latency=warm_tracker(0.02))
+    models = iter([slow, fast])
+    cancelled = []
+
+    async def send(timeout):
+        model = next(models)
+        try:
+            return await model.apredict("prompt", timeout=timeout)
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+
+    async def scenario():
+        answer = await caller.acall(send)
+        await asyncio.sleep(0)
+        return answer
+
+    started = time.monotonic()
+    assert asyncio.run(scenario()) == fast.predict("prompt")
+    assert time.monotonic() - started < 0.5
+    assert cancelled == [slow]
+
+def test_every_attempt_takes_its_own_admission_slot(make_counselor):
+    llm = fast_llm(failure_rate=1.0)
+    admission = AdmissionController(max_concurrency=1, max_queue=0)
+    held_while_deciding = []
+
+    def retryable(error):
+        held_while_deciding.append(admission.active)
+        return is_retryable(error)
+
+    counselor = make_counselor(
+        llm, admission=admission,
+        resilience=ResilientCaller(max_retries=2, backoff_base=0.001, retryable=retryable)
+    )
+    with pytest.raises(FakeLLMError):
+        counselor._predict("Which lenders fit me?")
+    # A call backing off before its retry holds no slot
+    assert held_while_deciding == [0, 0]
+    assert admission.admitted == llm.calls == 3
+    assert admission.rejected == 0
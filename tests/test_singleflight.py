@@ -0,0 +1,143 @@
+"""
+Tests for coalescing identical in-flight calls.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.admission import AdmissionRejected, DeadlineExceeded, request_deadline
+from utils.singleflight import SingleFlight
+
+def run_concurrently(count, target):
+    """Run `target(number)` on `count` threads and wait for all of them."""
+    threads = [threading.Thread(target=target, args=(number,)) for number in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def work():
+        calls.append(1)
+        release.wait(2)
+        return "answer"
+
+    def caller(number):
+        if number:
+            time.sleep(0.02)
+        results.append(flight.do("prompt", work))
+
+    threading.Timer(0.1, release.set).start()
+    run_concurrently(5, caller)
+
+    assert calls == [1]
+    assert results == ["answer"] * 5
+    assert flight.stats() == {'calls': 1, 'coalesced': 4, 'inflight': 0}
+
+def test_errors_are_shared_with_waiters():
+    flight = SingleFlight()
+    errors = []
+
+    def work():
+        time.sleep(0.1)
+        raise ValueError("model said no")
+
+    def caller(number):
+        if number:
+            time.sleep(0.02)
+        try:
+            flight.do("prompt", work)
+        except ValueError as e:
+            errors.append(str(e))
+
+    run_concurrently(3, caller)
+    assert errors == ["model said no"] * 3
+    assert flight.calls == 1
+
+def test_overload_errors_make_waiters_retry_for_themselves():
+    flight = SingleFlight()
+    calls = []
+    outcomes = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.1)
+        if len(calls) == 1:
+            raise AdmissionRejected("busy")
+        return "answer"
+
+    def caller(number):
+        if number:
+            time.sleep(0.02)
+        try:
+            outcomes.append(flight.do("prompt", work))
+        except AdmissionRejected:
+            outcomes.append("rejected")
+
+    run_concurrently(2, caller)
+    assert sorted(outcomes) == ["answer", "rejected"]
+    assert len(calls) == 2
+
+def test_async_call_is_cancelled_only_when_every_caller_left():
+    flight = SingleFlight()
+    started = []
+    cancelled = []
+
+    async def work():
+        started.append(1)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.ado("prompt", work))
+        second = asyncio.ensure_future(flight.ado("prompt", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled
+        second.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert started == [1]
+    assert cancelled == [1]
+    assert flight.stats()['inflight'] == 0
+
+def test_async_callers_share_results():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.ado("prompt", work) for _ in range(4)))
+
+    assert asyncio.run(scenario()) == ["answer"] * 4
+    assert calls == [1]
+    assert flight.coalesced == 3
+
+def test_waiter_stops_waiting_at_its_deadline():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("prompt", lambda: release.wait(2)))
+    leader.start()
+    time.sleep(0.02)
+    with request_deadline(0.05), pytest.raises(DeadlineExceeded):
+        flight.do("prompt", lambda: "never called")
+    release.set()
+    leader.join()
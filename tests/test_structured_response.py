@@ -0,0 +1,66 @@
+"""
+Tests for the single-call structured response mode.
+"""
+
+import json
+
+from conftest import fast_llm
+from utils.structured_response import RESPONSE_MODE_SEPARATE, RESPONSE_MODE_STRUCTURED, parse_structured_reply
+
+DETAILS = {
+    'name': "Asha",
+    'origin_country': "India",
+    'destination_country': "USA",
+    'loan_amount_needed': 40000,
+    'course_of_study': "MS Computer Science"
+}
+
+QUESTIONS = ["What are the rates?", "Do I need a cosigner?", "How do I apply?"]
+
+def test_replies_are_parsed_around_fences_and_extra_questions_dropped():
+    reply = parse_structured_reply(
+        "Here you go:\n```json\n" + json.dumps({
+            'response': " Prodigy suits you. ",
+            'follow_up_questions': QUESTIONS + ["  ", "Is there a fee?"]
+        }) + "\n```"
+    )
+    assert reply.response == "Prodigy suits you."
+    assert reply.follow_up_questions == QUESTIONS
+    assert json.loads(reply.questions_text()) == QUESTIONS
+
+def test_unusable_replies_are_refused():
+    assert parse_structured_reply("Prodigy suits you.") is None
+    assert parse_structured_reply("{not json}") is None
+    assert parse_structured_reply(json.dumps(QUESTIONS)) is None
+    assert parse_structured_reply(json.dumps({'response': " ", 'follow_up_questions': QUESTIONS})) is None
+    assert parse_structured_reply(json.dumps({'response': "Yes", 'follow_up_questions': QUESTIONS[:2] + [""]})) is None
+    assert parse_structured_reply(json.dumps({'response': "Yes", 'follow_up_questions': "What next?"})) is None
+
+def test_structured_turn_takes_one_model_call(make_counselor):
+    llm = fast_llm()
+    counselor = make_counselor(llm, followup_mode="llm")
+    result = counselor.get_loan_recommendation(dict(DETAILS), "Which lenders fit me?", "a",
+                                               response_mode=RESPONSE_MODE_STRUCTURED)
+    assert llm.calls == 1
+    assert len(json.loads(result['query_recommendation'])) == 3
+
+    counselor.get_loan_recommendation(dict(DETAILS), "Which lenders fit me?", "b",
+                                      response_mode=RESPONSE_MODE_SEPARATE)
+    assert llm.calls == 3
+
+def test_unusable_structured_reply_falls_back_to_two_calls(make_counselor):
+    llm = fast_llm()
+    predict = llm.predict
+
+    def prose_only(prompt, **kwargs):
+        if '"follow_up_questions"' in prompt:
+            return "Prodigy suits you."
+        return predict(prompt, **kwargs)
+
+    llm.predict = prose_only
+    counselor = make_counselor(llm, followup_mode="llm", response_mode=RESPONSE_MODE_STRUCTURED)
+    result = counselor.get_loan_recommendation(dict(DETAILS), "Which lenders fit me?", "a")
+    assert 'error' not in result
+    assert result['response'] != "Prodigy suits you."
+    assert len(json.loads(result['query_recommendation'])) == 3
+    assert llm.calls == 2
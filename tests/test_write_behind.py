@@ -0,0 +1,119 @@
+"""
+Tests for the write-behind queue that batches conversation writes.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+from utils.write_behind import WriteBehindQueue
+
+def item(item_id):
+    """Build a queued item with an id, like a message with its id set."""
+    return SimpleNamespace(id=item_id)
+
+def manual_queue(flush_func, **kwargs):
+    """Build a queue that only flushes when told to (or when closed)."""
+    return WriteBehindQueue(flush_func, max_batch=10000, flush_interval=60, **kwargs)
+
+def test_queued_items_are_readable_and_flushed_in_one_batch():
+    batches = []
+    queue = manual_queue(batches.append)
+    queue.put("a", [item(1), item(2)])
+    queue.put("b", [item(3)])
+    queue.put("a", [item(4)])
+    assert [i.id for i in queue.read("a", lambda key: [])] == [1, 2, 4]
+    assert queue.pending_items == 4
+
+    queue.flush()
+    assert [[(key, [i.id for i in items]) for key, items in batch] for batch in batches] == [
+        [("a", [1, 2, 4]), ("b", [3])]
+    ]
+    assert queue.stats() == {'pending': 0, 'batches': 1, 'items_written': 4, 'errors': 0, 'dropped': 0}
+    queue.close()
+
+def test_items_are_flushed_in_the_background():
+    written = threading.Event()
+    queue = WriteBehindQueue(lambda batch: written.set(), flush_interval=0.01)
+    queue.put("a", [item(1)])
+    assert written.wait(2)
+    queue.close()
+
+def test_failed_flushes_are_retried_then_dropped():
+    attempts = []
+
+    def flaky(batch):
+        attempts.append(batch)
+        if len(attempts) == 1:
+            raise OSError("database is locked")
+
+    queue = manual_queue(flaky, max_attempts=3)
+    queue.put("a", [item(1)])
+    queue.flush()
+    assert len(attempts) == 2
+    assert (queue.errors, queue.batches, queue.dropped) == (1, 1, 0)
+
+    def broken(batch):
+        raise OSError("disk full")
+
+    queue = manual_queue(broken, max_attempts=3)
+    queue.put("a", [item(1), item(2)])
+    queue.flush()
+    assert (queue.errors, queue.batches, queue.dropped) == (3, 0, 2)
+    assert queue.read("a", lambda key: []) == []
+
+def test_reads_during_a_flush_do_not_repeat_written_items():
+    store = []
+    release = threading.Event()
+    writing = threading.Event()
+
+    def slow_write(batch):
+        store.extend(batch[0][1])
+        writing.set()
+        release.wait(2)
+
+    queue = manual_queue(slow_write)
+    queue.put("a", [item(1), item(2)])
+    flusher = threading.Thread(target=queue.flush)
+    flusher.start()
+    writing.wait(2)
+    queue.put("a", [item(3)])
+    assert [i.id for i in queue.read("a", lambda key: list(store))] == [1, 2, 3]
+    release.set()
+    flusher.join()
+
+def test_discard_waits_for_the_flush_writing_the_key():
+    release = threading.Event()
+    writing = threading.Event()
+
+    def slow_write(batch):
+        writing.set()
+        release.wait(2)
+
+    queue = manual_queue(slow_write)
+    queue.put("a", [item(1)])
+    flusher = threading.Thread(target=queue.flush)
+    flusher.start()
+    writing.wait(2)
+    queue.put("a", [item(2)])
+
+    discarded = threading.Event()
+    discarder = threading.Thread(target=lambda: (queue.discard("a"), discarded.set()))
+    discarder.start()
+    # The reset must not return while the old turns are still being written,
+    # or its delete could run before they land
+    assert not discarded.wait(0.05)
+    release.set()
+    flusher.join()
+    discarder.join()
+    assert queue.pending_items == 0
+    assert queue.read("a", lambda key: []) == []
+
+def test_close_writes_what_is_still_queued():
+    batches = []
+    queue = manual_queue(batches.append)
+    queue.put("a", [item(1)])
+    started = time.monotonic()
+    queue.close()
+    assert time.monotonic() - started < 1
+    assert len(batches) == 1
@@ -0,0 +1,349 @@
+"""
+This module contains the admission controller placed around language model
+calls, together with per-request deadlines.
+
+At most `max_concurrency` model calls run at once and at most `max_queue`
+more wait for a slot, in arrival order. A call that finds the queue full is
+rejected immediately with `AdmissionRejected`, and a call still waiting when
+its request's deadline passes fails with `DeadlineExceeded`; both carry a
+Retry-After hint. Under overload callers therefore get a fast, explicit
+answer instead of piling up behind the model until their clients give up.
+
+Deadlines live in a context variable, so they follow a request into
+coroutines and, through `contextvars.copy_context().run`, into worker threads.
+"""
+
+import os
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+class OverloadError(Exception):
+    """
+    Raised when a request cannot be served because the service is saturated.
+
+    Attributes:
+        retry_after (float): Suggested number of seconds before retrying
+    """
+    def __init__(self, message: str, retry_after: float = 1.0):
+        """
+        Initialize the error.
+
+        Args:
+            message: Error message
+            retry_after: Suggested number of seconds before retrying
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class AdmissionRejected(OverloadError):
+    """Raised when every model slot is busy and the wait queue is full."""
+
+class DeadlineExceeded(OverloadError):
+    """Raised when a request's deadline passes before its work is done."""
+
+@contextmanager
+def request_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Set a deadline for the work done inside the block.
+
+    A nested block can only shorten the current deadline, never extend it.
+
+    Args:
+        seconds: Time budget from now, or None for no deadline
+    """
+    current = _deadline.get()
+    deadline = current
+    if seconds is not None:
+        deadline = time.monotonic() + seconds
+        if current is not None:
+            deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining_time() -> Optional[float]:
+    """
+    Return the time left before the current request's deadline.
+
+    Returns:
+        Optional[float]: Seconds left (never negative), or None without a deadline
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+def check_deadline() -> None:
+    """
+    Fail if the current request's deadline has passed.
+
+    Raises:
+        DeadlineExceeded: If no time is left
+    """
+    if remaining_time() == 0.0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+def result_within_deadline(future: "Future[Any]") -> Any:
+    """
+    Wait for a future no longer than the current request's deadline allows.
+
+    Args:
+        future: Future to wait for
+
+    Returns:
+        Any: The future's result
+
+    Raises:
+        DeadlineExceeded: If the deadline passes first
+    """
+    try:
+        return future.result(timeout=remaining_time())
+    except FuturesTimeoutError:
+        raise DeadlineExceeded("Request deadline exceeded") from None
+
+class _Waiter:
+    """A caller waiting for a slot, woken through an event or an asyncio future."""
+    __slots__ = ("granted", "event", "loop", "future")
+
+    def __init__(self, event: Optional[threading.Event] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None,
+                 future: Optional["asyncio.Future[None]"] = None):
+        self.granted = False
+        self.event = event
+        self.loop = loop
+        self.future = future
+
+def _wake(future: "asyncio.Future[None]") -> None:
+    """Resolve an asyncio waiter's future unless it was cancelled."""
+    if not future.done():
+        future.set_result(None)
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded FIFO wait queue, shared by threads and
+    event loops.
+
+    A released slot is handed directly to the oldest waiter, so late arrivals
+    cannot overtake callers that are already queued.
+
+    Attributes:
+        max_concurrency (int): Maximum number of calls running at once
+        max_queue (int): Maximum number of calls waiting for a slot
+        retry_after (float): Retry-After hint given to rejected callers
+        admitted (int): Calls that got a slot
+        rejected (int): Calls turned away because the queue was full
+        timed_out (int): Calls whose deadline passed while waiting
+    """
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32, retry_after: float = 1.0):
+        """
+        Initialize the controller.
+
+        Args:
+            max_concurrency: Maximum number of calls running at once
+            max_queue: Maximum number of calls waiting for a slot
+            retry_after: Retry-After hint given to rejected callers
+
+        Raises:
+            ValueError: If the concurrency limit is not positive
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._active = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """
+        Build a controller configured from environment variables.
+
+        Reads LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE and LLM_RETRY_AFTER.
+
+        Returns:
+            AdmissionController: Configured controller
+        """
+        return cls(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            max_queue=int(os.getenv("LLM_MAX_QUEUE", "32")),
+            retry_after=float(os.getenv("LLM_RETRY_AFTER", "1"))
+        )
+
+    @property
+    def active(self) -> int:
+        """Number of calls currently holding a slot."""
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        """Number of calls waiting for a slot."""
+        return len(self._waiters)
+
+    def _try_admit(self, waiter: _Waiter) -> bool:
+        """
+        Take a free slot or join the queue. Caller holds the lock.
+
+        Args:
+            waiter: Waiter to queue if no slot is free
+
+        Returns:
+            bool: True if a slot was taken, False if the waiter was queued
+
+        Raises:
+            DeadlineExceeded: If the request's deadline has already passed
+            AdmissionRejected: If the queue is full
+        """
+        if remaining_time() == 0.0:
+            self.timed_out += 1
+            raise DeadlineExceeded("Request deadline exceeded", self.retry_after)
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("Too many requests waiting for the model", self.retry_after)
+        self._waiters.append(waiter)
+        return False
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """
+        Leave the queue after a timeout or cancellation. Caller holds the lock.
+
+        Args:
+            waiter: Waiter giving up
+
+        Returns:
+            bool: True if the waiter had been granted a slot in the meantime
+        """
+        if waiter.granted:
+            return True
+        self._waiters.remove(waiter)
+        return False
+
+    def check_capacity(self) -> None:
+        """
+        Turn a caller away now if a call made now would be rejected.
+
+        Lets callers that cannot report a rejection later, such as a response
+        stream that has already sent its status, fail before they start. The
+        check takes no slot, so the call itself may still be rejected.
+
+        Raises:
+            AdmissionRejected: If every slot is taken and the queue is full
+        """
+        with self._lock:
+            if self._active >= self.max_concurrency and len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected("Too many requests waiting for the model", self.retry_after)
+
+    def acquire(self) -> None:
+        """
+        Take a slot, waiting in the queue until one is free or the deadline passes.
+
+        Raises:
+            AdmissionRejected: If the queue is full
+            DeadlineExceeded: If the deadline passes while waiting
+        """
+        waiter = _Waiter(event=threading.Event())
+        with self._lock:
+            if self._try_admit(waiter):
+                return
+        if waiter.event.wait(remaining_time()):
+            return
+        with self._lock:
+            if self._abandon(waiter):
+                return
+            self.timed_out += 1
+        raise DeadlineExceeded("Request deadline exceeded while waiting for the model", self.retry_after)
+
+    async def aacquire(self) -> None:
+        """
+        Asynchronously take a slot, waiting until one is free or the deadline passes.
+
+        Raises:
+            AdmissionRejected: If the queue is full
+            DeadlineExceeded: If the deadline passes while waiting
+        """
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop=loop, future=loop.create_future())
+        with self._lock:
+            if self._try_admit(waiter):
+                return
+        try:
+            await asyncio.wait_for(waiter.future, remaining_time())
+            return
+        except asyncio.TimeoutError:
+            with self._lock:
+                if self._abandon(waiter):
+                    return
+                self.timed_out += 1
+            raise DeadlineExceeded("Request deadline exceeded while waiting for the model", self.retry_after)
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = self._abandon(waiter)
+            if granted:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Give up a slot, handing it to the oldest waiter if there is one."""
+        with self._lock:
+            if not self._waiters:
+                self._active -= 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.admitted += 1
+        if waiter.event is not None:
+            waiter.event.set()
+        else:
+            waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a slot for the duration of the block."""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        """Asynchronously hold a slot for the duration of the block."""
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the controller's load and outcomes.
+
+        Returns:
+            Dict: Active and waiting calls, and admitted, rejected and timed-out counts
+        """
+        return {
+            'active': self._active,
+            'waiting': len(self._waiters),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out
+        }
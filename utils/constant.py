@@ -226,4 +226,28 @@ LENDER_DATA = [{
                 "country": "USA",
                 "university_country": "USA"
             }
-        ]
\ No newline at end of file
+        ]
+
+# Approximate conversion rates used to compare loan amounts across currencies
+CURRENCY_TO_USD = {
+    "USD": 1.0,
+    "INR": 0.012,
+    "CAD": 0.73,
+    "GBP": 1.27,
+    "EUR": 1.08,
+    "AUD": 0.66
+}
+
+# Common spellings of country names, mapped to the names used in LENDER_DATA
+COUNTRY_ALIASES = {
+    "us": "usa",
+    "u.s.": "usa",
+    "u.s.a.": "usa",
+    "united states": "usa",
+    "united states of america": "usa",
+    "america": "usa",
+    "united kingdom": "uk",
+    "great britain": "uk",
+    "england": "uk",
+    "bharat": "india"
+}
@@ -0,0 +1,194 @@
+"""
+This module contains the token-budgeted conversation window used to keep prompt
+size roughly constant over long conversations.
+
+The last few turns are kept verbatim and older turns are folded into a running
+summary. Folding happens in batches of turns after a response has been sent,
+so the summary is updated incrementally instead of being regenerated on every
+turn, and the hot path never waits on it.
+
+A summary remembers a digest of the lines it covers and is dropped as soon as
+the conversation no longer starts with them, so a reset made by any worker
+sharing the conversation store is noticed by all of them on the next turn.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+HISTORY_MODE_BUFFER = "buffer"
+HISTORY_MODE_SUMMARY = "summary"
+HISTORY_MODES = (HISTORY_MODE_BUFFER, HISTORY_MODE_SUMMARY)
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the number of model tokens in a piece of text.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        int: Approximate token count (about four characters per token)
+    """
+    return (len(text) + 3) // 4
+
+def _lines_digest(lines: List[str]) -> str:
+    """
+    Hash the conversation lines a summary covers.
+
+    Args:
+        lines: Formatted conversation lines, oldest first
+
+    Returns:
+        str: Hex digest of the lines
+    """
+    return hashlib.sha256("\n".join(lines).encode('utf-8')).hexdigest()
+
+class RollingSummaryWindow:
+    """
+    Keeps the last K turns verbatim and folds older turns into a summary.
+
+    Attributes:
+        summarize (Callable): Takes the current summary and the new lines and
+                              returns the updated summary
+        window_turns (int): Number of recent turns kept verbatim
+        token_budget (int): Approximate token budget for the rendered history
+        max_users (int): Maximum number of user summaries kept
+    """
+    def __init__(self,
+                 summarize: Callable[[str, str], str],
+                 window_turns: int = 4,
+                 token_budget: int = 1500,
+                 max_users: int = 10000):
+        """
+        Initialize an empty summary window.
+
+        Args:
+            summarize: Takes the current summary and the new lines and returns
+                       the updated summary
+            window_turns: Number of recent turns kept verbatim
+            token_budget: Approximate token budget for the rendered history
+            max_users: Maximum number of user summaries kept
+        """
+        self.summarize = summarize
+        self.window_turns = window_turns
+        self.token_budget = token_budget
+        self.max_users = max_users
+        # user_id -> (summary, number of history lines folded into it, digest of those lines)
+        self._state: "OrderedDict[str, Tuple[str, int, str]]" = OrderedDict()
+        self._folding = set()
+        self._lock = threading.Lock()
+
+    @property
+    def window_lines(self) -> int:
+        """Number of history lines kept verbatim (one per message)."""
+        return 2 * self.window_turns
+
+    def context(self, user_id: str, lines: List[str]) -> Tuple[str, List[str]]:
+        """
+        Split a conversation into its running summary and the unfolded lines.
+
+        Args:
+            user_id: Unique identifier for the user
+            lines: Formatted conversation lines, oldest first
+
+        Returns:
+            Tuple: (summary, lines not yet folded into the summary)
+        """
+        with self._lock:
+            summary, folded, digest = self._state.get(user_id, ("", 0, ""))
+            if folded and (folded > len(lines) or _lines_digest(lines[:folded]) != digest):
+                # The conversation was reset or replaced, here or in another worker
+                self._state.pop(user_id, None)
+                summary, folded = "", 0
+            elif user_id in self._state:
+                self._state.move_to_end(user_id)
+        return summary, lines[folded:]
+
+    def render(self, user_id: str, lines: List[str]) -> str:
+        """
+        Render the conversation history for a prompt within the token budget.
+
+        Lines that fall outside the budget are dropped oldest first; they are
+        already in the summary or will be folded into it after this turn.
+
+        Args:
+            user_id: Unique identifier for the user
+            lines: Formatted conversation lines, oldest first
+
+        Returns:
+            str: Summary followed by the most recent lines
+        """
+        summary, unfolded = self.context(user_id, lines)
+        header = f"Summary of earlier conversation:\n{summary}\n" if summary else ""
+
+        budget = self.token_budget - estimate_tokens(header)
+        kept: List[str] = []
+        for line in reversed(unfolded):
+            cost = estimate_tokens(line) + 1
+            if kept and cost > budget:
+                break
+            kept.append(line)
+            budget -= cost
+        kept.reverse()
+
+        if header and kept:
+            return f"{header}\nRecent conversation:\n" + "\n".join(kept)
+        return header or "\n".join(kept)
+
+    def fold(self, user_id: str, lines: List[str]) -> None:
+        """
+        Fold turns that have left the verbatim window into the summary.
+
+        Turns are folded a whole window at a time, so the summarizer runs once
+        every `window_turns` turns rather than on every turn.
+
+        Args:
+            user_id: Unique identifier for the user
+            lines: Formatted conversation lines, oldest first
+        """
+        summary, unfolded = self.context(user_id, lines)
+        overflow = len(unfolded) - self.window_lines
+        if overflow < self.window_lines:
+            return
+
+        with self._lock:
+            if user_id in self._folding:
+                return
+            self._folding.add(user_id)
+        try:
+            folded = len(lines) - len(unfolded) + overflow
+            new_summary = self.summarize(summary, "\n".join(unfolded[:overflow]))
+            with self._lock:
+                self._state[user_id] = (new_summary, folded, _lines_digest(lines[:folded]))
+                self._state.move_to_end(user_id)
+                while len(self._state) > self.max_users:
+                    self._state.popitem(last=False)
+        finally:
+            with self._lock:
+                self._folding.discard(user_id)
+
+    def summary(self, user_id: str) -> Optional[str]:
+        """
+        Return the running summary for a user, if one exists.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            Optional[str]: The running summary, or None
+        """
+        with self._lock:
+            state = self._state.get(user_id)
+        return state[0] if state else None
+
+    def reset(self, user_id: str) -> None:
+        """
+        Forget the running summary for a user.
+
+        Args:
+            user_id: Unique identifier for the user
+        """
+        with self._lock:
+            self._state.pop(user_id, None)
@@ -0,0 +1,307 @@
+"""
+This module suggests follow-up questions without calling the model.
+
+The follow-up questions shown after each answer are formulaic: they steer the
+student towards interest rates, eligibility, the application process,
+required documents, repayment and collateral. `FollowUpGenerator` detects
+which of these topics the student's latest messages are about from keywords
+(the counselor's answers mention every topic, so they are only searched for
+lender names), then picks one question per topic from a template bank,
+starting with the topic the student just asked about and moving on to topics
+not yet discussed. Questions are filled in with the lender last mentioned and
+the student's profile, and questions already asked are skipped. Generating
+them takes well under a millisecond, compared with a full model round-trip.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.lender_matching import parse_amount
+
+FOLLOWUP_MODE_TEMPLATE = "template"
+FOLLOWUP_MODE_LLM = "llm"
+FOLLOWUP_MODES = (FOLLOWUP_MODE_TEMPLATE, FOLLOWUP_MODE_LLM)
+
+# Keywords that signal each topic, matched at the start of words ("%" anywhere,
+# so that "10%" counts)
+TOPIC_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    'rates': ("interest", "rate", "apr", "percent", "%", "cheap", "lowest", "expensive", "cost"),
+    'eligibility': ("eligib", "qualif", "cosigner", "co-signer", "guarantor", "credit score",
+                    "approve", "accept", "criteria", "requirement"),
+    'application': ("apply", "application", "process", "approval", "how long", "sanction",
+                    "disburse", "step"),
+    'documents': ("document", "paper", "proof", "admission letter", "i-20", "statement",
+                  "passport", "visa", "kyc"),
+    'repayment': ("repay", "emi", "instal", "moratorium", "grace", "prepay", "penalty",
+                  "tenure", "monthly"),
+    'collateral': ("collateral", "security", "secured", "unsecured", "property", "mortgage",
+                   "non-collateral"),
+    'terms': ("term", "condition", "fee", "charge", "maximum", "limit", "amount", "borrow",
+              "cover", "living expense")
+}
+
+# Order topics are suggested in when the conversation has not touched them
+TOPIC_ORDER = ("eligibility", "rates", "application", "documents", "repayment", "collateral", "terms")
+
+# Questions per topic; a question whose placeholders cannot be filled is skipped
+QUESTION_BANK: Dict[str, Tuple[str, ...]] = {
+    'rates': (
+        "What interest rate could I get from {lender}?",
+        "Is the interest rate fixed or variable?",
+        "How much interest would I pay over the whole loan?",
+        "Which lender has the lowest interest rate for me?"
+    ),
+    'eligibility': (
+        "Am I eligible for a loan from {lender}?",
+        "Do I need a co-signer to qualify?",
+        "Does my credit history affect my eligibility?",
+        "Can I get a loan for {course} in {destination}?"
+    ),
+    'application': (
+        "How do I apply for a loan with {lender}?",
+        "How long does loan approval take?",
+        "Can I apply before I get my admission letter?",
+        "When is the money sent to my university?"
+    ),
+    'documents': (
+        "What documents do I need to apply?",
+        "What documents does my co-signer need?",
+        "Do I need my admission letter to apply?",
+        "Which documents does {lender} ask for?"
+    ),
+    'repayment': (
+        "When do I have to start repaying?",
+        "Can I repay early without a penalty?",
+        "Is there a grace period while I study?",
+        "What would my monthly payment be for {amount}?"
+    ),
+    'collateral': (
+        "Do I need collateral for {amount}?",
+        "Which lenders don't need collateral?",
+        "Does {lender} need collateral?",
+        "What can I use as collateral?"
+    ),
+    'terms': (
+        "What are the loan terms with {lender}?",
+        "Are there any processing fees?",
+        "Does the loan cover living expenses in {destination}?",
+        "What is the most I can borrow?"
+    )
+}
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+def _keyword_pattern(keywords: Dict[str, Tuple[str, ...]]) -> Tuple["re.Pattern[str]", Dict[str, str]]:
+    """
+    Build the pattern matching every topic keyword in lower-case text.
+
+    Keywords are matched at the start of a word, or anywhere if they do not
+    start with a word character (such as "%"). The start-of-word check is
+    made once for all keywords rather than once per keyword, which makes
+    scanning a message several times faster.
+
+    Args:
+        keywords: Keywords per topic, such as TOPIC_KEYWORDS
+
+    Returns:
+        Tuple: The pattern, with a named group per topic and kind of keyword,
+               and the topic of each group name
+    """
+    word_groups, symbol_groups, topics = [], [], {}
+    for topic, words in keywords.items():
+        for kind, groups, selected in (
+            ("word", word_groups, [word for word in words if re.match(r"\w", word)]),
+            ("symbol", symbol_groups, [word for word in words if not re.match(r"\w", word)])
+        ):
+            if selected:
+                name = f"{topic}_{kind}"
+                groups.append(rf"(?P<{name}>{'|'.join(re.escape(word.lower()) for word in selected)})")
+                topics[name] = topic
+    alternatives = ([r"(?<!\w)(?:" + "|".join(word_groups) + ")"] if word_groups else []) + symbol_groups
+    return re.compile("|".join(alternatives)), topics
+
+def _message_text(message: Any) -> str:
+    """
+    Return the text of a conversation message.
+
+    Args:
+        message: LangChain message, message dict or string
+
+    Returns:
+        str: The message content
+    """
+    if hasattr(message, 'content'):
+        return str(message.content)
+    if isinstance(message, dict):
+        return str(message.get('content', ''))
+    return str(message)
+
+def _is_student_message(message: Any) -> bool:
+    """
+    Tell whether a conversation message was written by the student.
+
+    Args:
+        message: LangChain message, message dict or string
+
+    Returns:
+        bool: False only for messages known to come from the counselor
+    """
+    message_type = message.get('type') if isinstance(message, dict) else getattr(message, 'type', None)
+    return message_type != "ai"
+
+def _format_amount(amount: Any, currency: Any = None) -> Optional[str]:
+    """
+    Format a loan amount for a question, in the student's currency.
+
+    Args:
+        amount: Amount from the student's details, possibly with a currency
+                code ("INR 2,500,000")
+        currency: The student's loan currency, used when the amount has no
+                  code of its own (defaults to USD)
+
+    Returns:
+        Optional[str]: "$30,000" for US dollars, "2,500,000 INR" for other
+                       currencies, the amount as given if it is not a number,
+                       or None if there is none
+    """
+    if amount in (None, ""):
+        return None
+    value, code = parse_amount(amount, default_currency=str(currency or "USD").upper())
+    if value is None:
+        return str(amount)
+    if code == "USD":
+        return f"${value:,.0f}"
+    return f"{value:,.0f} {code}"
+
+class FollowUpGenerator:
+    """
+    Suggests follow-up questions from a template bank, without the model.
+
+    Attributes:
+        count (int): Number of questions suggested
+        recent_messages (int): Number of latest messages looked at for topics
+    """
+    def __init__(self, lender_names: Iterable[str] = (), count: int = 3, recent_messages: int = 4):
+        """
+        Initialize the generator.
+
+        Args:
+            lender_names: Names of the lenders in the catalog, to recognise
+                          the lender being discussed
+            count: Number of questions suggested
+            recent_messages: Number of latest messages looked at for topics
+        """
+        self.count = count
+        self.recent_messages = recent_messages
+        # One pattern for all topics, matched against lower-cased text, which
+        # is faster than a case-insensitive pattern
+        self._keywords, self._keyword_topics = _keyword_pattern(TOPIC_KEYWORDS)
+        names = sorted((name for name in lender_names if name), key=len, reverse=True)
+        self._lenders = (
+            re.compile(r"(?<!\w)(" + "|".join(re.escape(name.lower()) for name in names) + r")(?!\w)")
+            if names else None
+        )
+        self._lender_names = {name.lower(): name for name in names}
+
+    def _topic_scores(self, query: str, recent: Sequence[str]) -> Dict[str, int]:
+        """
+        Score how much the student's latest messages are about each topic.
+
+        Args:
+            query: The student's latest message
+            recent: Texts of the student's latest earlier messages
+
+        Returns:
+            Dict[str, int]: Keyword matches per topic, with the latest message counting double
+        """
+        scores = dict.fromkeys(TOPIC_KEYWORDS, 0)
+        for text, weight in [(query, 2)] + [(text, 1) for text in recent]:
+            for match in self._keywords.finditer(text.lower()):
+                scores[self._keyword_topics[match.lastgroup]] += weight
+        return scores
+
+    def _lender(self, texts: Sequence[str]) -> Optional[str]:
+        """
+        Find the lender discussed most recently.
+
+        Args:
+            texts: Message texts, newest first
+
+        Returns:
+            Optional[str]: Catalog name of the lender, or None if none is mentioned
+        """
+        if self._lenders is None:
+            return None
+        for text in texts:
+            match = self._lenders.search(text.lower())
+            if match:
+                return self._lender_names[match.group(1)]
+        return None
+
+    def generate(self, query: str, conversation_history: Sequence[Any] = (),
+                 student_details: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Suggest follow-up questions for the latest turn.
+
+        Args:
+            query: The student's latest message
+            conversation_history: Previous conversation messages, oldest first
+            student_details: Student's information, used to fill in questions
+
+        Returns:
+            List[str]: Up to `count` questions, each on a different topic
+        """
+        student_details = student_details or {}
+        history = [_message_text(message) for message in conversation_history]
+        recent_messages = list(conversation_history[-self.recent_messages:])
+        recent = history[-self.recent_messages:]
+        values = {
+            'lender': self._lender([query] + recent[::-1]),
+            'destination': student_details.get('destination_country') or None,
+            'course': student_details.get('course_of_study') or None,
+            'amount': _format_amount(
+                student_details.get('loan_amount_needed'),
+                student_details.get('loan_currency')
+            )
+        }
+        asked = {text.strip().lower() for text in history} | {query.strip().lower()}
+
+        # The topic just asked about first, then topics not yet discussed
+        scores = self._topic_scores(query, [
+            text for message, text in zip(recent_messages, recent) if _is_student_message(message)
+        ])
+        current = max(TOPIC_ORDER, key=lambda topic: (scores[topic], -TOPIC_ORDER.index(topic)))
+        topics = ([current] if scores[current] else []) + sorted(
+            (topic for topic in TOPIC_ORDER if topic != current or not scores[current]),
+            key=lambda topic: (scores[topic], TOPIC_ORDER.index(topic))
+        )
+
+        questions = []
+        for topic in topics:
+            question = self._pick(topic, values, asked)
+            if question is not None:
+                questions.append(question)
+                if len(questions) == self.count:
+                    break
+        return questions
+
+    @staticmethod
+    def _pick(topic: str, values: Dict[str, Optional[str]], asked: set) -> Optional[str]:
+        """
+        Pick the first question of a topic that can be filled in and was not asked yet.
+
+        Args:
+            topic: Topic name
+            values: Placeholder values (None when unknown)
+            asked: Lowercased texts of earlier messages
+
+        Returns:
+            Optional[str]: The question, or None if every question is used or unfillable
+        """
+        for template in QUESTION_BANK[topic]:
+            if any(values.get(name) is None for name in _PLACEHOLDER.findall(template)):
+                continue
+            question = template.format(**values)
+            if question.lower() not in asked:
+                return question
+        return None
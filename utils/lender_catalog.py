@@ -0,0 +1,313 @@
+"""
+This module loads the lender catalog.
+
+The catalog is read from the JSON or CSV file named by LENDER_CATALOG_PATH,
+or taken from the built-in LENDER_DATA when no file is configured. Parsing a
+large catalog (rates, amounts, countries) takes time, so the parsed lenders
+are also written to a binary cache next to the source file. The cache is
+reused as long as the source file's size and modification time match, which
+makes reloading even thousands of lenders nearly instant.
+
+The cache is a pickle and is trusted exactly as much as the catalog file
+itself; it is only ever read from the location this module writes it to.
+
+JSON catalogs hold a list of records shaped like the entries of LENDER_DATA.
+CSV catalogs have one column per record field; key points are separated by
+semicolons and yes/no fields accept true/false, yes/no or 1/0.
+
+`CatalogWatcher` reloads the catalog file when it changes, without
+restarting workers. Everything derived from the catalog is rebuilt off the
+request path and swapped in as one versioned snapshot.
+"""
+
+import os
+import csv
+import json
+import logging
+import pickle
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.constant import LENDER_DATA
+from utils.lender_matching import Lender, parse_flag
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of Lender changes, so that older caches are ignored
+CACHE_FORMAT = 2
+
+def read_catalog_file(path: str) -> List[Dict[str, Any]]:
+    """
+    Read the raw records of a JSON or CSV catalog.
+
+    Args:
+        path: Location of the catalog file (.json or .csv)
+
+    Returns:
+        List[Dict]: One record per lender
+
+    Raises:
+        ValueError: If the file type is not supported or the JSON is not a list
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path, encoding="utf-8") as catalog:
+            records = json.load(catalog)
+        if not isinstance(records, list):
+            raise ValueError(f"Lender catalog {path} must contain a list of lenders")
+        return records
+    if extension == ".csv":
+        records = []
+        with open(path, encoding="utf-8", newline="") as catalog:
+            for row in csv.DictReader(catalog):
+                record: Dict[str, Any] = {field: value for field, value in row.items() if value is not None}
+                record['key_points'] = [
+                    point.strip() for point in record.get('key_points', "").split(";") if point.strip()
+                ]
+                for field in Lender.FLAG_FIELDS:
+                    record[field] = bool(parse_flag(record.get(field)))
+                records.append(record)
+        return records
+    raise ValueError(f"Unsupported lender catalog format: {path}")
+
+def _cache_signature(path: str) -> tuple:
+    """
+    Identify the version of a catalog file that a cache was built from.
+
+    Args:
+        path: Location of the catalog file
+
+    Returns:
+        tuple: Cache format, file size and modification time
+    """
+    stat = os.stat(path)
+    return (CACHE_FORMAT, stat.st_size, stat.st_mtime_ns)
+
+def _read_cache(cache_path: str, signature: tuple) -> Optional[List[Lender]]:
+    """
+    Read parsed lenders from the cache if it matches the catalog file.
+
+    Args:
+        cache_path: Location of the cache file
+        signature: Signature of the current catalog file
+
+    Returns:
+        Optional[List[Lender]]: Cached lenders, or None if missing, stale or unreadable
+    """
+    try:
+        with open(cache_path, "rb") as cache:
+            cached_signature, lenders = pickle.load(cache)
+    except (OSError, EOFError, ValueError, TypeError, AttributeError, pickle.UnpicklingError):
+        return None
+    return lenders if cached_signature == signature else None
+
+def _write_cache(cache_path: str, signature: tuple, lenders: List[Lender]) -> None:
+    """
+    Write parsed lenders to the cache, atomically.
+
+    A cache that cannot be written (for example on a read-only file system)
+    is skipped; the catalog is simply parsed again next time.
+
+    Args:
+        cache_path: Location of the cache file
+        signature: Signature of the catalog file the lenders were parsed from
+        lenders: Parsed lenders
+    """
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    try:
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(descriptor, "wb") as cache:
+            pickle.dump((signature, lenders), cache, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        try:
+            os.unlink(temporary_path)
+        except OSError:
+            pass
+
+def load_catalog(path: Optional[str] = None, cache_path: Optional[str] = None) -> List[Lender]:
+    """
+    Load the lender catalog, through the binary cache when it is current.
+
+    Args:
+        path: Catalog file (defaults to LENDER_CATALOG_PATH; the built-in
+              LENDER_DATA is used when neither is set)
+        cache_path: Cache file (defaults to the catalog path plus ".cache")
+
+    Returns:
+        List[Lender]: The lenders, in catalog order
+
+    Raises:
+        OSError: If the catalog file cannot be read
+        ValueError: If the catalog file is malformed
+    """
+    path = path or os.getenv("LENDER_CATALOG_PATH")
+    if not path:
+        return [Lender.from_dict(record) for record in LENDER_DATA]
+
+    cache_path = cache_path or f"{path}.cache"
+    signature = _cache_signature(path)
+    lenders = _read_cache(cache_path, signature)
+    if lenders is None:
+        lenders = [Lender.from_dict(record) for record in read_catalog_file(path)]
+        _write_cache(cache_path, signature, lenders)
+    return lenders
+
+class CatalogWatcher:
+    """
+    Holds the current catalog snapshot and swaps in a new one when the
+    catalog file changes.
+
+    A snapshot is whatever `build` makes of a list of lenders: typically the
+    lenders together with the indexes and formatted blocks derived from
+    them. `build` is also given the snapshot being replaced (None for the
+    first one), so it can prepare what the old snapshot was used for. A new snapshot is built completely, on the watcher's thread,
+    before it replaces the old one in a single assignment. Requests
+    therefore never wait for a reload and never see half of one, and a
+    request that took the old snapshot keeps using it until it finishes.
+    A catalog that fails to load is logged and the current snapshot stays.
+
+    Attributes:
+        path (Optional[str]): Catalog file being watched (None for the built-in catalog)
+        poll_interval (float): Seconds between checks of the file (0 disables watching)
+        version (int): Version of the current snapshot, starting at 1
+        reloads (int): Snapshots swapped in after the first one
+        errors (int): Reloads that failed
+    """
+    def __init__(self, build: Callable[[List[Lender], int, Any], Any], path: Optional[str] = None,
+                 poll_interval: float = 5.0):
+        """
+        Load the catalog and build the first snapshot.
+
+        Args:
+            build: Builds a snapshot from the lenders, its version number and
+                   the snapshot it replaces
+            path: Catalog file to watch (None uses the built-in catalog)
+            poll_interval: Seconds between checks of the file (0 disables watching)
+
+        Raises:
+            OSError: If the catalog file cannot be read
+            ValueError: If the catalog file is malformed
+        """
+        self.build = build
+        self.path = path
+        self.poll_interval = poll_interval
+        self.version = 0
+        self.reloads = 0
+        self.errors = 0
+        self._listeners: List[Callable[[Any], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._signature = _cache_signature(path) if path else None
+        lenders = load_catalog(path) if path else [Lender.from_dict(record) for record in LENDER_DATA]
+        self._snapshot = build(lenders, 1, None)
+        self.version = 1
+
+    @classmethod
+    def from_env(cls, build: Callable[[List[Lender], int, Any], Any]) -> "CatalogWatcher":
+        """
+        Build a watcher configured from environment variables.
+
+        Reads LENDER_CATALOG_PATH and LENDER_CATALOG_POLL_SECONDS.
+
+        Args:
+            build: Builds a snapshot from the lenders, its version number and
+                   the snapshot it replaces
+
+        Returns:
+            CatalogWatcher: Configured watcher
+        """
+        return cls(
+            build,
+            path=os.getenv("LENDER_CATALOG_PATH") or None,
+            poll_interval=float(os.getenv("LENDER_CATALOG_POLL_SECONDS", "5"))
+        )
+
+    def current(self) -> Any:
+        """
+        Return the current snapshot.
+
+        Callers should take the snapshot once per request and use only it,
+        so that a reload in the middle of the request cannot mix versions.
+
+        Returns:
+            Any: The current snapshot
+        """
+        return self._snapshot
+
+    def subscribe(self, listener: Callable[[Any], None]) -> None:
+        """
+        Register a callback run with each new snapshot after it is swapped in.
+
+        Args:
+            listener: Called with the new snapshot
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def check(self) -> bool:
+        """
+        Reload the catalog if its file changed since the current snapshot.
+
+        Returns:
+            bool: True if a new snapshot was swapped in
+        """
+        if not self.path:
+            return False
+        with self._lock:
+            try:
+                # Taken before reading, so a write during the read is seen next time
+                signature = _cache_signature(self.path)
+            except OSError:
+                # The file is being replaced; it is checked again next time
+                return False
+            if signature == self._signature:
+                return False
+            # A broken file is reported once, not on every check until it is fixed
+            self._signature = signature
+            try:
+                lenders = load_catalog(self.path)
+                snapshot = self.build(lenders, self.version + 1, self._snapshot)
+            except Exception:
+                self.errors += 1
+                logger.exception("Reloading the lender catalog from %s failed", self.path)
+                return False
+            self._snapshot = snapshot
+            self.version += 1
+            self.reloads += 1
+            listeners = list(self._listeners)
+        logger.info("Lender catalog reloaded from %s (version %d, %d lenders)",
+                    self.path, self.version, len(lenders))
+        for listener in listeners:
+            try:
+                listener(snapshot)
+            except Exception:
+                logger.exception("Lender catalog listener failed")
+        return True
+
+    def start(self) -> None:
+        """Start watching the file in the background, again in a forked child."""
+        if not self.path or self.poll_interval <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="lender-catalog", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching the file."""
+        self._stop.set()
+
+    def _run(self) -> None:
+        """Check the file every `poll_interval` seconds until stopped."""
+        while not self._stop.wait(self.poll_interval):
+            self.check()
@@ -0,0 +1,447 @@
+"""
+This module contains the lender-matching engine used to pick the lenders that are
+relevant to a student before the counselor prompt is built.
+
+Lender catalogs write their rates and amounts as human-readable strings. Each
+record is parsed once into a `Lender`, which keeps the text shown to students
+next to the numeric terms, and the lenders are indexed by country. Each request
+then only looks at the candidates for the student's origin and destination
+countries and ranks them by fit.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from utils.constant import COUNTRY_ALIASES, CURRENCY_TO_USD
+
+ANY_COUNTRY = "any"
+_NUMBER_PATTERN = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_CURRENCY_PATTERN = re.compile(r"\b([A-Z]{3})\b")
+_TRUE_VALUES = {"true", "yes", "y", "1"}
+_FALSE_VALUES = {"false", "no", "n", "0"}
+
+# Parsed profile fields a match depends on: origin, destination, amount needed
+# in USD, US cosigner and collateral
+MatchInputs = Tuple[str, str, Optional[float], Optional[bool], Optional[bool]]
+
+def normalize_country(country: Any) -> str:
+    """
+    Normalize a country name so that common spellings compare equal.
+
+    Args:
+        country: Country name as given by a student or a lender record
+
+    Returns:
+        str: Lower-case canonical country name
+    """
+    name = str(country or "").strip().lower()
+    return COUNTRY_ALIASES.get(name, name)
+
+def parse_countries(countries: Any) -> Set[str]:
+    """
+    Parse a comma-separated list of countries.
+
+    Args:
+        countries: String such as "USA, Canada, UK" or "Any"
+
+    Returns:
+        Set[str]: Normalized country names
+    """
+    return {normalize_country(part) for part in str(countries or "").split(",") if part.strip()}
+
+def parse_interest_rate(rate: Any) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Parse an interest rate string such as "10.0% - 12.0%" or "10.5%".
+
+    Args:
+        rate: Interest rate as written in the lender record
+
+    Returns:
+        Tuple: (minimum rate, maximum rate) in percent, or (None, None) if unparseable
+    """
+    values = [float(value.replace(",", "")) for value in _NUMBER_PATTERN.findall(str(rate or ""))]
+    if not values:
+        return None, None
+    return min(values), max(values)
+
+def parse_amount(amount: Any, default_currency: str = "USD") -> Tuple[Optional[float], str]:
+    """
+    Parse a currency amount such as "INR 10,000,000" or "USD 100,000".
+
+    Amounts that are not a fixed number (for example "100% of school-certified
+    expenses") are treated as uncapped and returned as None.
+
+    Args:
+        amount: Amount as written in the lender record or student details
+        default_currency: Currency to assume when none is given
+
+    Returns:
+        Tuple: (amount or None, currency code)
+    """
+    if isinstance(amount, (int, float)) and not isinstance(amount, bool):
+        return float(amount), default_currency
+
+    text = str(amount or "")
+    currency_match = _CURRENCY_PATTERN.search(text)
+    currency = currency_match.group(1) if currency_match else default_currency
+    if "%" in text:
+        return None, currency
+
+    number_match = _NUMBER_PATTERN.search(text)
+    if not number_match:
+        return None, currency
+    return float(number_match.group(0).replace(",", "")), currency
+
+def to_usd(amount: Optional[float], currency: str) -> Optional[float]:
+    """
+    Convert an amount to USD using the approximate rates in CURRENCY_TO_USD.
+
+    Args:
+        amount: Amount to convert, or None
+        currency: Currency code of the amount
+
+    Returns:
+        Optional[float]: Converted amount, or None if it cannot be converted
+    """
+    rate = CURRENCY_TO_USD.get(currency.upper())
+    if amount is None or rate is None:
+        return None
+    return amount * rate
+
+def parse_flag(value: Any) -> Optional[bool]:
+    """
+    Parse an optional yes/no flag from student details.
+
+    Args:
+        value: Boolean, string such as "yes"/"no", or None
+
+    Returns:
+        Optional[bool]: Parsed flag, or None when the student did not say
+    """
+    if isinstance(value, bool) or value is None:
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    return None
+
+class Lender:
+    """
+    A lender from the catalog, with its terms parsed once.
+
+    The text fields are kept exactly as written in the catalog, since they
+    are what the counselor shows students; the parsed fields sit alongside
+    them, so a Lender can be scored directly. Slots keep
+    each record compact in large catalogs.
+
+    Attributes:
+        name (str): Lender name
+        interest_rate (str): Interest rate as written, e.g. "10.0% - 12.0%"
+        maximum_amount (str): Maximum amount as written, e.g. "INR 10,000,000"
+        about (str): Short description
+        key_points (Tuple[str, ...]): Notable terms
+        currency (str): Currency the lender lends in
+        collateral_required (bool): Whether the lender asks for collateral
+        non_collateral_option (bool): Whether an unsecured option exists
+        us_cosigner_required (bool): Whether a US cosigner is mandatory
+        country (str): Countries the lender operates in, as written
+        university_country (str): Study destinations the lender funds, as written
+        min_rate (Optional[float]): Lowest advertised interest rate in percent
+        max_rate (Optional[float]): Highest advertised interest rate in percent
+        max_amount (Optional[float]): Maximum amount, or None when the lender covers full cost
+        amount_currency (str): Currency of the maximum amount
+        max_amount_usd (Optional[float]): Maximum amount converted to USD, or None
+        countries (FrozenSet[str]): Normalized countries the lender operates in
+        university_countries (FrozenSet[str]): Normalized study destinations
+    """
+    __slots__ = (
+        "name", "interest_rate", "maximum_amount", "about", "key_points", "currency",
+        "collateral_required", "non_collateral_option", "us_cosigner_required",
+        "country", "university_country",
+        "min_rate", "max_rate", "max_amount", "amount_currency", "max_amount_usd",
+        "countries", "university_countries"
+    )
+
+    # Fields of a catalog record, in catalog order
+    FIELDS = (
+        "name", "interest_rate", "maximum_amount", "about", "key_points", "currency",
+        "collateral_required", "non_collateral_option", "us_cosigner_required",
+        "country", "university_country"
+    )
+
+    # Yes/no fields of a catalog record
+    FLAG_FIELDS = ("collateral_required", "non_collateral_option", "us_cosigner_required")
+
+    def __init__(self, name: str, interest_rate: str = "", maximum_amount: str = "", about: str = "",
+                 key_points: Sequence[str] = (), currency: str = "USD",
+                 collateral_required: bool = False, non_collateral_option: bool = False,
+                 us_cosigner_required: bool = False, country: str = "", university_country: str = ""):
+        """
+        Build a lender and parse its terms.
+
+        Args:
+            name: Lender name
+            interest_rate: Interest rate as written
+            maximum_amount: Maximum amount as written
+            about: Short description
+            key_points: Notable terms
+            currency: Currency the lender lends in
+            collateral_required: Whether the lender asks for collateral
+            non_collateral_option: Whether an unsecured option exists
+            us_cosigner_required: Whether a US cosigner is mandatory
+            country: Countries the lender operates in, comma-separated
+            university_country: Study destinations the lender funds, comma-separated
+        """
+        self.name = name
+        self.interest_rate = interest_rate
+        self.maximum_amount = maximum_amount
+        self.about = about
+        self.key_points = tuple(key_points)
+        self.currency = currency
+        self.collateral_required = bool(collateral_required)
+        self.non_collateral_option = bool(non_collateral_option)
+        self.us_cosigner_required = bool(us_cosigner_required)
+        self.country = country
+        self.university_country = university_country
+        self.min_rate, self.max_rate = parse_interest_rate(interest_rate)
+        self.max_amount, self.amount_currency = parse_amount(maximum_amount, default_currency=currency)
+        self.max_amount_usd = to_usd(self.max_amount, self.amount_currency)
+        self.countries = frozenset(parse_countries(country))
+        self.university_countries = frozenset(parse_countries(university_country))
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> "Lender":
+        """
+        Build a lender from a catalog record such as those in LENDER_DATA.
+
+        Unknown fields are ignored, and yes/no flags written as text (such
+        as "false" in a JSON catalog) are parsed rather than coerced.
+
+        Args:
+            record: Dictionary containing lender information
+
+        Returns:
+            Lender: The parsed lender
+        """
+        fields = {field: record[field] for field in cls.FIELDS if field in record}
+        for field in cls.FLAG_FIELDS:
+            if field in fields:
+                fields[field] = bool(parse_flag(fields[field]))
+        return cls(**fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return the lender as a catalog record.
+
+        Returns:
+            Dict: The catalog fields, with key points as a list
+        """
+        record = {field: getattr(self, field) for field in self.FIELDS}
+        record['key_points'] = list(self.key_points)
+        return record
+
+    def __getstate__(self) -> Tuple[Any, ...]:
+        # A plain tuple keeps pickled catalogs small and quick to load
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state: Tuple[Any, ...]) -> None:
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    def __repr__(self) -> str:
+        return f"Lender(name={self.name!r})"
+
+def as_lender(lender: Union[Lender, Dict[str, Any]]) -> Lender:
+    """
+    Return a lender record as a Lender, parsing it if it is a plain dict.
+
+    Args:
+        lender: Lender or dictionary containing lender information
+
+    Returns:
+        Lender: The lender
+    """
+    return lender if isinstance(lender, Lender) else Lender.from_dict(lender)
+
+class LenderMatcher:
+    """
+    Filters and ranks lenders for a student's profile.
+
+    Lender records are parsed once when the matcher is built and indexed by
+    the countries they operate in and the study destinations they fund, so a
+    lookup only scores the lenders that can actually serve the student.
+
+    Student details may optionally carry `has_us_cosigner`, `has_collateral`
+    and `loan_currency` (defaults to USD) to sharpen the match.
+
+    The matcher remembers the inputs of its most recent distinct matches, so
+    the lenders real students are offered can be prepared again for a new
+    catalog.
+
+    Attributes:
+        lenders (List[Lender]): Lenders the matcher was built from, with their parsed terms
+        recent_size (int): Number of recent distinct match inputs remembered
+    """
+    def __init__(self, lenders: Sequence[Union[Lender, Dict[str, Any]]], recent_size: int = 128):
+        """
+        Index a lender catalog.
+
+        Args:
+            lenders: Lenders, or dictionaries containing lender information
+            recent_size: Number of recent distinct match inputs remembered
+        """
+        self.lenders = [as_lender(lender) for lender in lenders]
+        self.recent_size = recent_size
+        self._recent: "OrderedDict[MatchInputs, None]" = OrderedDict()
+        self._recent_lock = threading.Lock()
+        # Fallback order when nothing matches: cheapest first, unknown rates last
+        self._by_rate = sorted(
+            self.lenders,
+            key=lambda lender: (lender.min_rate is None, lender.min_rate or 0.0)
+        )
+        self._by_country: Dict[str, Set[int]] = {}
+        self._by_university_country: Dict[str, Set[int]] = {}
+        for index, terms in enumerate(self.lenders):
+            for country in terms.countries:
+                self._by_country.setdefault(country, set()).add(index)
+            for country in terms.university_countries:
+                self._by_university_country.setdefault(country, set()).add(index)
+
+    def _candidates(self, origin: str, destination: str) -> Set[int]:
+        """
+        Look up the lenders that operate for the student's countries.
+
+        Args:
+            origin: Normalized origin country
+            destination: Normalized destination country
+
+        Returns:
+            Set[int]: Indices of candidate lenders
+        """
+        funds_destination = (
+            self._by_university_country.get(destination, set())
+            | self._by_university_country.get(ANY_COUNTRY, set())
+        )
+        operates_for_student = (
+            self._by_country.get(origin, set())
+            | self._by_country.get(destination, set())
+        )
+        return funds_destination & operates_for_student
+
+    def _score(self, terms: Lender, origin: str, needed_usd: Optional[float],
+               has_us_cosigner: Optional[bool], has_collateral: Optional[bool]) -> Optional[float]:
+        """
+        Score how well a lender fits the student, or reject it.
+
+        Args:
+            terms: Parsed terms of the lender
+            origin: Normalized origin country of the student
+            needed_usd: Loan amount the student needs in USD, if known
+            has_us_cosigner: Whether the student has a US cosigner, if known
+            has_collateral: Whether the student can offer collateral, if known
+
+        Returns:
+            Optional[float]: Higher is better; None if the lender is ruled out
+        """
+        if terms.us_cosigner_required and has_us_cosigner is False:
+            return None
+        if terms.collateral_required and not terms.non_collateral_option and has_collateral is False:
+            return None
+
+        score = 0.0
+        if origin in terms.countries:
+            score += 2.0
+        if terms.us_cosigner_required and has_us_cosigner is None:
+            score -= 1.0
+        if needed_usd is not None:
+            if terms.max_amount_usd is None or terms.max_amount_usd >= needed_usd:
+                score += 3.0
+            else:
+                score += 3.0 * terms.max_amount_usd / needed_usd
+        if terms.min_rate is not None:
+            # Cheaper lenders rank higher; a point of interest is worth a fifth of a match
+            score -= terms.min_rate / 5.0
+        return score
+
+    @staticmethod
+    def match_inputs(student_details: Dict[str, Any]) -> MatchInputs:
+        """
+        Parse the profile fields a match depends on.
+
+        Args:
+            student_details: Student's information and requirements
+
+        Returns:
+            MatchInputs: Normalized origin and destination, amount needed in
+                         USD and the cosigner and collateral flags
+        """
+        needed, currency = parse_amount(
+            student_details.get('loan_amount_needed'),
+            default_currency=str(student_details.get('loan_currency', 'USD')).upper()
+        )
+        return (
+            normalize_country(student_details.get('origin_country')),
+            normalize_country(student_details.get('destination_country')),
+            to_usd(needed, currency),
+            parse_flag(student_details.get('has_us_cosigner')),
+            parse_flag(student_details.get('has_collateral'))
+        )
+
+    def recent_inputs(self) -> List[MatchInputs]:
+        """
+        Return the inputs of the most recent distinct matches, oldest first.
+
+        Returns:
+            List[MatchInputs]: At most `recent_size` match inputs
+        """
+        with self._recent_lock:
+            return list(self._recent)
+
+    def match(self, student_details: Dict[str, Any], top_n: Optional[int] = None) -> List[Lender]:
+        """
+        Return the lenders best suited to a student, best match first.
+
+        Falls back to the whole catalog, lowest advertised rate first, when
+        nothing matches, so the counselor always has lenders to talk about.
+
+        Args:
+            student_details: Student's information and requirements
+            top_n: Maximum number of lenders to return (all matches if None)
+
+        Returns:
+            List[Lender]: Matching lenders, ranked by fit
+        """
+        return self.match_parsed(self.match_inputs(student_details), top_n)
+
+    def match_parsed(self, inputs: MatchInputs, top_n: Optional[int] = None) -> List[Lender]:
+        """
+        Return the lenders best suited to already parsed match inputs.
+
+        Args:
+            inputs: Match inputs from `match_inputs`
+            top_n: Maximum number of lenders to return (all matches if None)
+
+        Returns:
+            List[Lender]: Matching lenders, ranked by fit
+        """
+        origin, destination, needed_usd, has_us_cosigner, has_collateral = inputs
+        with self._recent_lock:
+            self._recent[inputs] = None
+            self._recent.move_to_end(inputs)
+            while len(self._recent) > self.recent_size:
+                self._recent.popitem(last=False)
+
+        ranked = []
+        for index in self._candidates(origin, destination):
+            score = self._score(self.lenders[index], origin, needed_usd, has_us_cosigner, has_collateral)
+            if score is not None:
+                ranked.append((-score, index))
+        if not ranked:
+            return self._by_rate[:top_n]
+
+        ranked.sort()
+        return [self.lenders[index] for _, index in ranked[:top_n]]
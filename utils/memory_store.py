@@ -0,0 +1,488 @@
+"""
+This module contains the bounded store that holds per-user conversation memory.
+
+The store behaves like the plain dictionary the counselor used before, but it
+keeps at most a configured number of sessions and bytes resident. Sessions are
+evicted least-recently-used first, or once they have been idle for longer than
+the TTL, which a background sweeper enforces even when no other session is
+touched. Sessions pinned by a running request are never evicted, so the turn
+it saves lands in the memory the store keeps. Evicted sessions can be spilled
+to a local SQLite file and are rehydrated transparently the next time the
+user writes in; the file is written outside the store's lock, so a slow disk
+does not hold up requests for other users.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, MutableMapping, Optional, Tuple
+
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+# Rough per-message overhead on top of the message text, used for byte accounting
+MESSAGE_OVERHEAD_BYTES = 256
+
+def estimate_memory_bytes(memory: Any) -> int:
+    """
+    Estimate how many bytes a conversation memory keeps resident.
+
+    Args:
+        memory: Conversation memory holding a `chat_memory.messages` list
+
+    Returns:
+        int: Approximate size of the stored conversation in bytes
+    """
+    history = memory.chat_memory
+    # A history kept in a conversation store holds no messages in process;
+    # reading them to size it would query the store under the session lock
+    if not getattr(history, 'holds_messages', True):
+        return MESSAGE_OVERHEAD_BYTES
+    messages = history.messages
+    return sum(len(str(message.content)) + MESSAGE_OVERHEAD_BYTES for message in messages)
+
+class SQLiteSpillStore:
+    """
+    Local SQLite file that holds sessions evicted from memory.
+
+    Attributes:
+        path (str): Location of the SQLite database file
+    """
+    def __init__(self, path: str):
+        """
+        Open (and create if needed) the spill database.
+
+        Args:
+            path: Location of the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS spilled_sessions ("
+            "user_id TEXT PRIMARY KEY, messages TEXT NOT NULL, spilled_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def save(self, user_id: str, messages: List[Dict[str, Any]]) -> None:
+        """
+        Write a session's messages to disk, replacing any older copy.
+
+        Args:
+            user_id: Unique identifier for the user
+            messages: Serialized conversation messages
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO spilled_sessions (user_id, messages, spilled_at) VALUES (?, ?, ?)",
+                (user_id, json.dumps(messages), time.time())
+            )
+            self._connection.commit()
+
+    def load(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Read a spilled session.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            Optional[List[Dict]]: Serialized messages, or None if nothing was spilled
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT messages FROM spilled_sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def contains(self, user_id: str) -> bool:
+        """
+        Check whether a session has been spilled.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            bool: True if the session is on disk
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM spilled_sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row is not None
+
+    def delete(self, user_id: str) -> None:
+        """
+        Remove a spilled session.
+
+        Args:
+            user_id: Unique identifier for the user
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM spilled_sessions WHERE user_id = ?", (user_id,))
+            self._connection.commit()
+
+class SessionMemoryStore(MutableMapping):
+    """
+    Dictionary-like store of conversation memories with LRU/TTL eviction.
+
+    Membership checks and lookups also consider spilled sessions, so code
+    written against a plain dict (`user_id in store`, `store[user_id]`,
+    `store.pop(user_id, None)`) keeps working unchanged. `len()` and iteration
+    only cover resident sessions. `get_or_create` and `pin` look up or create
+    a session in one step, so an eviction cannot come in between.
+
+    Byte accounting is approximate: a session is re-measured whenever it is
+    looked up or unpinned, so messages appended afterwards are counted on the
+    next access.
+
+    Attributes:
+        max_sessions (int): Maximum number of resident sessions
+        max_bytes (int): Maximum approximate size of all resident sessions
+        ttl_seconds (float): Idle time after which a session is evicted (0 disables)
+        spill_store (SQLiteSpillStore): Where evicted sessions go, if configured
+        evictions (int): Number of sessions evicted so far
+        rehydrations (int): Number of sessions loaded back from the spill store
+    """
+    def __init__(self,
+                 memory_factory: Callable[[str], Any],
+                 max_sessions: int = 10000,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 ttl_seconds: float = 0,
+                 spill_store: Optional[SQLiteSpillStore] = None):
+        """
+        Initialize an empty memory store.
+
+        Args:
+            memory_factory: Creates an empty conversation memory for a user id
+            max_sessions: Maximum number of resident sessions
+            max_bytes: Maximum approximate size of all resident sessions
+            ttl_seconds: Idle time after which a session is evicted (0 disables)
+            spill_store: Where evicted sessions are written, if anywhere
+        """
+        self.memory_factory = memory_factory
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill_store = spill_store
+        self.evictions = 0
+        self.rehydrations = 0
+        self._sessions: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._total_bytes = 0
+        self._pins: Dict[str, int] = {}
+        # Evicted sessions not yet written to the spill store
+        self._spilling: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.RLock()
+        # Keeps spill file writes and deletes in the order they were decided
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, memory_factory: Callable[[str], Any]) -> "SessionMemoryStore":
+        """
+        Build a memory store configured from environment variables.
+
+        Reads MEMORY_MAX_SESSIONS, MEMORY_MAX_BYTES, MEMORY_TTL_SECONDS and
+        MEMORY_SPILL_PATH (spilling is disabled when the path is unset).
+
+        Args:
+            memory_factory: Creates an empty conversation memory for a user id
+
+        Returns:
+            SessionMemoryStore: Configured store
+        """
+        spill_path = os.getenv("MEMORY_SPILL_PATH")
+        return cls(
+            memory_factory=memory_factory,
+            max_sessions=int(os.getenv("MEMORY_MAX_SESSIONS", "10000")),
+            max_bytes=int(os.getenv("MEMORY_MAX_BYTES", str(256 * 1024 * 1024))),
+            ttl_seconds=float(os.getenv("MEMORY_TTL_SECONDS", "0")),
+            spill_store=SQLiteSpillStore(spill_path) if spill_path else None
+        )
+
+    @property
+    def resident_bytes(self) -> int:
+        """Approximate size of all resident sessions in bytes."""
+        return self._total_bytes
+
+    def _store(self, user_id: str, memory: Any) -> None:
+        """
+        Insert or refresh a resident session and enforce the limits. Caller holds the lock.
+
+        Args:
+            user_id: Unique identifier for the user
+            memory: The user's conversation memory
+        """
+        previous = self._sessions.pop(user_id, None)
+        if previous:
+            self._total_bytes -= previous[1]
+        size = estimate_memory_bytes(memory)
+        self._sessions[user_id] = (memory, size, time.monotonic())
+        self._total_bytes += size
+        self._enforce_limits(keep=user_id)
+
+    def _evict(self, user_id: str) -> None:
+        """
+        Drop a resident session, queueing it for the spill store when configured.
+        Caller holds the lock.
+
+        Args:
+            user_id: Unique identifier for the user
+        """
+        memory, size, _ = self._sessions.pop(user_id)
+        self._total_bytes -= size
+        self.evictions += 1
+        if self.spill_store is not None:
+            self._spilling[user_id] = messages_to_dict(memory.chat_memory.messages)
+
+    def _enforce_limits(self, keep: Optional[str] = None) -> None:
+        """
+        Evict idle and least-recently-used sessions until within limits.
+        Caller holds the lock.
+
+        Pinned sessions are skipped, so only as many sessions as there are
+        running requests are looked at beyond the ones evicted.
+
+        Args:
+            keep: Session that must stay resident (the one just accessed)
+        """
+        cutoff = time.monotonic() - self.ttl_seconds if self.ttl_seconds else None
+        skipped = 0
+        while len(self._sessions) > skipped:
+            user_id, (_, _, last_access) = next(islice(self._sessions.items(), skipped, None))
+            over_limit = len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes
+            expired = cutoff is not None and last_access < cutoff
+            if not over_limit and not expired:
+                break
+            if user_id == keep or self._pins.get(user_id):
+                skipped += 1
+                continue
+            self._evict(user_id)
+
+    def _write_spills(self) -> None:
+        """
+        Write evicted sessions to the spill store, outside the store's lock.
+
+        A thread that finds another one writing does not wait: the writer
+        keeps going until nothing is pending, and sessions still pending are
+        served from memory until written.
+        """
+        if self.spill_store is None or not self._spill_lock.acquire(blocking=False):
+            return
+        try:
+            while True:
+                with self._lock:
+                    pending = list(self._spilling.items())
+                if not pending:
+                    return
+                for user_id, messages in pending:
+                    self.spill_store.save(user_id, messages)
+                    with self._lock:
+                        # A session rehydrated or evicted again meanwhile is handled by that access
+                        if self._spilling.get(user_id) is messages:
+                            del self._spilling[user_id]
+        finally:
+            self._spill_lock.release()
+
+    def _drop_spilled(self, user_id: str) -> None:
+        """
+        Delete the spilled copy of a session that is resident again.
+
+        Args:
+            user_id: Unique identifier for the user
+        """
+        with self._spill_lock:
+            with self._lock:
+                # Evicted again meanwhile: the copy about to be written is the newest
+                resident = user_id in self._sessions
+            if resident:
+                self.spill_store.delete(user_id)
+
+    def _take(self, user_id: str, create: bool, pin: bool, disk_read: bool,
+              spilled: Optional[List[Dict[str, Any]]] = None) -> Optional[Tuple[Any, bool]]:
+        """
+        Make a session resident and return it. Caller holds the lock.
+
+        Args:
+            user_id: Unique identifier for the user
+            create: Create an empty session if the user has none
+            pin: Keep the session resident until `unpin`
+            disk_read: Whether the spill file has been read for the user
+            spilled: Messages read from the spill file, if any
+
+        Returns:
+            Optional[Tuple[Any, bool]]: The memory and whether it was rehydrated,
+                                        or None if the spill file must be read first
+
+        Raises:
+            KeyError: If the user has no session and `create` is False
+        """
+        if user_id in self._sessions:
+            memory, rehydrated = self._sessions[user_id][0], False
+        else:
+            # An eviction not yet written is newer than anything in the file
+            pending = self._spilling.pop(user_id, None)
+            if pending is not None:
+                spilled = pending
+            elif self.spill_store is not None and not disk_read:
+                return None
+            if spilled is None and not create:
+                raise KeyError(user_id)
+            memory = self.memory_factory(user_id)
+            rehydrated = spilled is not None
+            if rehydrated:
+                memory.chat_memory.add_messages(messages_from_dict(spilled))
+                self.rehydrations += 1
+        if pin:
+            self._pins[user_id] = self._pins.get(user_id, 0) + 1
+        self._store(user_id, memory)
+        return memory, rehydrated
+
+    def _get(self, user_id: str, create: bool, pin: bool) -> Any:
+        """
+        Look up a session, rehydrating or creating it, and pin it if asked.
+
+        Args:
+            user_id: Unique identifier for the user
+            create: Create an empty session if the user has none
+            pin: Keep the session resident until `unpin`
+
+        Returns:
+            Any: The user's conversation memory
+
+        Raises:
+            KeyError: If the user has no session and `create` is False
+        """
+        with self._lock:
+            found = self._take(user_id, create, pin, disk_read=False)
+        if found is None:
+            # The file cannot change while the spill lock is held, so what is
+            # read is still the newest copy unless the session came back meanwhile
+            with self._spill_lock:
+                spilled = self.spill_store.load(user_id)
+                with self._lock:
+                    found = self._take(user_id, create, pin, disk_read=True, spilled=spilled)
+        memory, rehydrated = found
+        if rehydrated:
+            self._drop_spilled(user_id)
+        self._write_spills()
+        return memory
+
+    def get_or_create(self, user_id: str) -> Any:
+        """
+        Return a user's session, rehydrating it or creating an empty one.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            Any: The user's conversation memory
+        """
+        return self._get(user_id, create=True, pin=False)
+
+    def pin(self, user_id: str) -> Any:
+        """
+        Return a user's session like `get_or_create` and keep it resident until `unpin`.
+
+        Pins are counted, so concurrent requests of the same user each pin
+        and unpin once.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            Any: The user's conversation memory
+        """
+        return self._get(user_id, create=True, pin=True)
+
+    def unpin(self, user_id: str) -> None:
+        """
+        Release a pin taken with `pin`, re-measuring the session.
+
+        Args:
+            user_id: Unique identifier for the user
+        """
+        with self._lock:
+            pins = self._pins.get(user_id, 0) - 1
+            if pins > 0:
+                self._pins[user_id] = pins
+            else:
+                self._pins.pop(user_id, None)
+            if user_id in self._sessions:
+                self._store(user_id, self._sessions[user_id][0])
+            else:
+                self._enforce_limits()
+        self._write_spills()
+
+    def __getitem__(self, user_id: str) -> Any:
+        return self._get(user_id, create=False, pin=False)
+
+    def __setitem__(self, user_id: str, memory: Any) -> None:
+        with self._lock:
+            self._spilling.pop(user_id, None)
+            self._store(user_id, memory)
+        if self.spill_store is not None:
+            self._drop_spilled(user_id)
+        self._write_spills()
+
+    def __delitem__(self, user_id: str) -> None:
+        with self._lock:
+            entry = self._sessions.pop(user_id, None)
+            if entry:
+                self._total_bytes -= entry[1]
+            found = entry is not None or self._spilling.pop(user_id, None) is not None
+        if self.spill_store is not None:
+            with self._spill_lock:
+                found = self.spill_store.contains(user_id) or found
+                self.spill_store.delete(user_id)
+        if not found:
+            raise KeyError(user_id)
+
+    def __contains__(self, user_id: object) -> bool:
+        with self._lock:
+            if user_id in self._sessions or user_id in self._spilling:
+                return True
+        if self.spill_store is None:
+            return False
+        with self._spill_lock:
+            return self.spill_store.contains(str(user_id))
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._sessions))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def evict_expired(self) -> None:
+        """Evict every session that has been idle for longer than the TTL."""
+        with self._lock:
+            self._enforce_limits()
+        self._write_spills()
+
+    def start(self) -> None:
+        """Start evicting idle sessions in the background, again in a forked child."""
+        if not self.ttl_seconds:
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="session-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop evicting idle sessions in the background."""
+        self._stop.set()
+
+    def _run(self) -> None:
+        """Evict idle sessions a few times per TTL until stopped."""
+        interval = min(max(self.ttl_seconds / 4, 1.0), 60.0)
+        while not self._stop.wait(interval):
+            self.evict_expired()
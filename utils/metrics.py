@@ -0,0 +1,419 @@
+"""
+This module contains a small in-process metrics registry with Prometheus text
+output.
+
+It records counters, gauges and latency histograms without any external
+service, so the numbers are available even when LangSmith tracing is not.
+Recording a value takes a lock and a few additions; gauges backed by a
+callback are only evaluated when the metrics are scraped.
+"""
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds, from cache hits up to slow model calls
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Size buckets in bytes, for prompts and responses
+DEFAULT_SIZE_BUCKETS = (256, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _format_value(value: float) -> str:
+    """
+    Format a sample value the way Prometheus expects.
+
+    Args:
+        value: Sample value
+
+    Returns:
+        str: Formatted value
+    """
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """
+    Format a label set as {name="value",...}.
+
+    Args:
+        names: Label names
+        values: Label values
+
+    Returns:
+        str: Formatted label set, or an empty string when there are no labels
+    """
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+class _Metric:
+    """
+    Base class for metrics with an optional fixed set of label names.
+
+    Attributes:
+        name (str): Metric name
+        help (str): Description shown in the exposition output
+        label_names (Tuple[str, ...]): Names of the metric's labels
+    """
+    type_name = "untyped"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        """
+        Initialize the metric.
+
+        Args:
+            name: Metric name
+            help: Description shown in the exposition output
+            label_names: Names of the metric's labels
+        """
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        """
+        Order label values by the metric's label names.
+
+        Args:
+            labels: Label values by name
+
+        Returns:
+            LabelValues: Label values in declaration order
+
+        Raises:
+            ValueError: If the labels do not match the metric's label names
+        """
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels: {', '.join(self.label_names)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """
+        Return the metric's samples as (sample name, formatted labels, value).
+
+        Returns:
+            List[Tuple[str, str, float]]: Current samples
+        """
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """
+        Render the metric in Prometheus text format.
+
+        Returns:
+            str: HELP and TYPE lines followed by one line per sample
+        """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    """
+    A monotonically increasing count, optionally split by labels.
+
+    Like a gauge, a counter can instead read its value from a callback, for
+    counts another component already keeps.
+    """
+    type_name = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        """
+        Initialize a counter at zero.
+
+        Args:
+            name: Metric name
+            help: Description shown in the exposition output
+            label_names: Names of the metric's labels (unused with a callback)
+            callback: Reads the counter's value when the metrics are rendered
+        """
+        super().__init__(name, help, label_names)
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Increase the counter.
+
+        Args:
+            amount: Amount to add (must not be negative)
+            **labels: Label values
+
+        Raises:
+            ValueError: If the amount is negative
+        """
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """
+        Return the counter's current value.
+
+        Args:
+            **labels: Label values
+
+        Returns:
+            float: Current value
+        """
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        if self.callback is not None:
+            try:
+                return [(self.name, "", float(self.callback()))]
+            except Exception:
+                return []
+        with self._lock:
+            return [
+                (self.name, _format_labels(self.label_names, key), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+class Gauge(_Metric):
+    """
+    A value that can go up and down.
+
+    A gauge either holds values set by the application or reads its value
+    from a callback each time the metrics are rendered.
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        """
+        Initialize a gauge.
+
+        Args:
+            name: Metric name
+            help: Description shown in the exposition output
+            label_names: Names of the metric's labels (unused with a callback)
+            callback: Reads the gauge's value when the metrics are rendered
+        """
+        super().__init__(name, help, label_names)
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """
+        Set the gauge.
+
+        Args:
+            value: New value
+            **labels: Label values
+        """
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        if self.callback is not None:
+            try:
+                return [(self.name, "", float(self.callback()))]
+            except Exception:
+                # A failing callback must not break the whole scrape
+                return []
+        with self._lock:
+            return [
+                (self.name, _format_labels(self.label_names, key), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in fixed buckets, optionally split by labels.
+
+    Attributes:
+        buckets (Tuple[float, ...]): Upper bounds of the buckets, ascending
+    """
+    type_name = "histogram"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            name: Metric name
+            help: Description shown in the exposition output
+            label_names: Names of the metric's labels
+            buckets: Upper bounds of the buckets
+        """
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record an observation.
+
+        Args:
+            value: Observed value
+            **labels: Label values
+        """
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, **labels: str) -> int:
+        """
+        Return the number of observations.
+
+        Args:
+            **labels: Label values
+
+        Returns:
+            int: Number of observations
+        """
+        with self._lock:
+            entry = self._values.get(self._label_values(labels))
+            return sum(entry[0]) if entry else 0
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        names = self.label_names + ("le",)
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(bounds, counts):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", _format_labels(names, key + (bound,)), cumulative))
+                labels = _format_labels(self.label_names, key)
+                samples.append((f"{self.name}_sum", labels, total[0]))
+                samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together on a /metrics endpoint.
+
+    Registering a metric name twice returns the existing metric, so callers
+    can look metrics up by name instead of holding on to them.
+    """
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        """
+        Add a metric unless one with the same name already exists.
+
+        Args:
+            metric: Metric to add
+
+        Returns:
+            _Metric: The registered metric
+
+        Raises:
+            ValueError: If a metric of another type has the same name
+        """
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is None:
+                self._metrics[metric.name] = metric
+                return metric
+        if type(existing) is not type(metric):
+            raise ValueError(f"Metric {metric.name} is already registered as a {existing.type_name}")
+        return existing
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = (),
+                callback: Optional[Callable[[], float]] = None) -> Counter:
+        """
+        Register or look up a counter.
+
+        Args:
+            name: Metric name (by convention ending in _total)
+            help: Description shown in the exposition output
+            label_names: Names of the metric's labels
+            callback: Reads the counter's value when the metrics are rendered
+
+        Returns:
+            Counter: The counter
+        """
+        return self._register(Counter(name, help, label_names, callback))
+
+    def gauge(self, name: str, help: str, label_names: Sequence[str] = (),
+              callback: Optional[Callable[[], float]] = None) -> Gauge:
+        """
+        Register or look up a gauge.
+
+        Args:
+            name: Metric name
+            help: Description shown in the exposition output
+            label_names: Names of the metric's labels
+            callback: Reads the gauge's value when the metrics are rendered
+
+        Returns:
+            Gauge: The gauge
+        """
+        return self._register(Gauge(name, help, label_names, callback))
+
+    def histogram(self, name: str, help: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        """
+        Register or look up a histogram.
+
+        Args:
+            name: Metric name
+            help: Description shown in the exposition output
+            label_names: Names of the metric's labels
+            buckets: Upper bounds of the buckets
+
+        Returns:
+            Histogram: The histogram
+        """
+        return self._register(Histogram(name, help, label_names, buckets))
+
+    @contextmanager
+    def timed(self, stage: str, metric: str = "counselor_stage_seconds") -> Iterator[None]:
+        """
+        Time a block of code into a per-stage latency histogram.
+
+        The duration is recorded even if the block raises.
+
+        Args:
+            stage: Stage name, recorded as the "stage" label
+            metric: Name of the histogram to record into
+        """
+        histogram = self.histogram(metric, "Time spent in each request stage in seconds", ("stage",))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - started, stage=stage)
+
+    def render(self) -> str:
+        """
+        Render every registered metric in Prometheus text format.
+
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
@@ -0,0 +1,387 @@
+"""
+This module sends prompts with a long, stable prefix to the model.
+
+The recommendation prompt starts with the counselor instructions and the lender
+block, which only change with the lender catalog, and ends with the student's
+details, the conversation and the latest message. Providers with context
+caching can store the prefix once and be given a handle to it instead of the
+prefix itself, so that each call only uploads (and is billed for) the suffix.
+
+`PromptAdapter` is used with models that cannot cache a prefix and simply
+sends the whole prompt. `ContextCacheAdapter` registers each distinct prefix
+with the provider on first use, reuses the handle until shortly before it
+expires, and falls back to sending the whole prompt when a prefix is too short
+to be worth caching, when the provider refuses to cache it, or when a call is
+turned away because its handle is no longer known to the provider.
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple, Union
+
+from utils.admission import remaining_time
+
+PROMPT_CACHE_BACKENDS = ("auto", "none")
+# Rough size of a token, for comparing prefixes with the provider's minimum
+_CHARS_PER_TOKEN = 4
+# Errors about the handle of a call, such as "CachedContent not found"
+_CACHED_CONTENT_ERROR = re.compile(r"cached[ _]?contents?\b", re.IGNORECASE)
+
+class PromptParts(NamedTuple):
+    """
+    A prompt split into a cacheable prefix and a per-call suffix.
+
+    Attributes:
+        prefix: Part of the prompt shared by many calls
+        suffix: Part of the prompt specific to this call
+    """
+    prefix: str
+    suffix: str
+
+    @property
+    def text(self) -> str:
+        """The whole prompt."""
+        return self.prefix + self.suffix
+
+def prompt_text(prompt: Union[str, PromptParts]) -> str:
+    """
+    Return the whole text of a prompt.
+
+    Args:
+        prompt: Prompt, whole or split
+
+    Returns:
+        str: The whole prompt
+    """
+    return prompt.text if isinstance(prompt, PromptParts) else prompt
+
+class PromptAdapter:
+    """
+    Sends every prompt whole, for models without prefix caching.
+
+    Attributes:
+        hits (int): Calls that referred to a cached prefix
+        created (int): Prefixes registered with the provider
+        fallbacks (int): Split prompts sent whole
+    """
+    def __init__(self):
+        """Initialize the adapter."""
+        self.hits = 0
+        self.created = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_env(cls, llm: Any) -> "PromptAdapter":
+        """
+        Build the adapter suited to a model, configured from environment variables.
+
+        Reads PROMPT_CACHE_BACKEND ("auto" caches prefixes when the model
+        supports it, "none" always sends whole prompts),
+        PROMPT_CACHE_TTL_SECONDS and PROMPT_CACHE_MIN_TOKENS.
+
+        Args:
+            llm: The model prompts are sent to
+
+        Returns:
+            PromptAdapter: Configured adapter
+
+        Raises:
+            ValueError: If the backend name is unknown
+        """
+        backend_name = os.getenv("PROMPT_CACHE_BACKEND", "auto").lower()
+        if backend_name not in PROMPT_CACHE_BACKENDS:
+            raise ValueError(f"Prompt cache backend must be one of: {', '.join(PROMPT_CACHE_BACKENDS)}")
+        create = context_cache_creator(llm) if backend_name == "auto" else None
+        if create is None:
+            return PromptAdapter()
+        return ContextCacheAdapter(
+            create,
+            ttl_seconds=float(os.getenv("PROMPT_CACHE_TTL_SECONDS", "3600")),
+            min_prefix_tokens=int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "4096"))
+        )
+
+    def prepare(self, prompt: Union[str, PromptParts]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Turn a prompt into the text and options of a model call.
+
+        Args:
+            prompt: Prompt, whole or split
+
+        Returns:
+            Tuple[str, Dict]: Text to send and extra keyword arguments for the call
+        """
+        if isinstance(prompt, PromptParts):
+            self.fallbacks += 1
+        return prompt_text(prompt), {}
+
+    def recover(self, prompt: Union[str, PromptParts], options: Dict[str, Any],
+                error: Exception) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Decide how to resend a call that failed because of how it was prepared.
+
+        Args:
+            prompt: Prompt of the failed call
+            options: Extra keyword arguments the call was made with
+            error: Error the call failed with
+
+        Returns:
+            Optional[Tuple[str, Dict]]: Text and options to resend, or None if
+                                        the error has nothing to do with them
+        """
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report how often cached prefixes were used.
+
+        Returns:
+            Dict: Prefix cache hits, prefixes created and prompts sent whole
+        """
+        return {
+            'hits': self.hits,
+            'created': self.created,
+            'fallbacks': self.fallbacks
+        }
+
+class ContextCacheAdapter(PromptAdapter):
+    """
+    Registers prompt prefixes with the provider and refers to them by handle.
+
+    Handles are kept per prefix content, so a prefix that is unchanged
+    across catalog reloads keeps its handle, and every new prefix is
+    uploaded once. Concurrent first calls with the same prefix wait for a
+    single registration. Prefixes shorter than `min_prefix_tokens` (providers
+    refuse to cache short content) are sent inline without asking. A prefix
+    the provider refuses is sent inline, and registering it is only tried
+    again after `retry_seconds`.
+
+    Attributes:
+        create (Callable): Registers a prefix for a number of seconds, within
+                           a timeout, and returns its handle
+        ttl_seconds (float): Lifetime requested for each cached prefix
+        max_entries (int): Maximum number of handles kept
+        retry_seconds (float): Time before retrying a prefix the provider refused
+        min_prefix_tokens (int): Estimated size below which prefixes are sent inline
+    """
+    def __init__(self, create: Callable[..., str], ttl_seconds: float = 3600,
+                 max_entries: int = 256, retry_seconds: float = 60, min_prefix_tokens: int = 0):
+        """
+        Initialize the adapter.
+
+        Args:
+            create: Registers a prefix for a number of seconds, within a timeout
+                    given as the `timeout` keyword argument, and returns its handle
+            ttl_seconds: Lifetime requested for each cached prefix
+            max_entries: Maximum number of handles kept
+            retry_seconds: Time before retrying a prefix the provider refused
+            min_prefix_tokens: Estimated size below which prefixes are sent inline
+        """
+        super().__init__()
+        self.create = create
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.retry_seconds = retry_seconds
+        self.min_prefix_tokens = min_prefix_tokens
+        # Per prefix digest: handle (None if refused) and when to stop using it
+        self._handles: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, threading.Lock] = {}
+
+    @staticmethod
+    def _key(prefix: str) -> str:
+        """
+        Digest a prefix for the handle table.
+
+        Args:
+            prefix: Prompt prefix
+
+        Returns:
+            str: Hex digest of the prefix
+        """
+        return hashlib.sha256(prefix.encode('utf-8')).hexdigest()
+
+    def _cached(self, key: str) -> Optional[Tuple[Optional[str], float]]:
+        """
+        Look up a live handle entry. Caller holds the lock.
+
+        Args:
+            key: Digest of the prefix
+
+        Returns:
+            Optional[Tuple]: (handle or None if refused, expiry), or None if unknown or expired
+        """
+        entry = self._handles.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        self._handles.move_to_end(key)
+        return entry
+
+    def _handle(self, prefix: str) -> Optional[str]:
+        """
+        Return the handle of a prefix, registering it on first use.
+
+        Args:
+            prefix: Prompt prefix
+
+        Returns:
+            Optional[str]: Handle, or None if the provider refused the prefix
+        """
+        key = self._key(prefix)
+        with self._lock:
+            entry = self._cached(key)
+            if entry is not None:
+                return entry[0]
+            registering = self._pending.setdefault(key, threading.Lock())
+
+        with registering:
+            with self._lock:
+                entry = self._cached(key)
+                if entry is not None:
+                    return entry[0]
+            try:
+                handle: Optional[str] = self.create(prefix, self.ttl_seconds, timeout=remaining_time())
+                # Stop using a handle a little before the provider drops it
+                expires = time.monotonic() + 0.9 * self.ttl_seconds
+            except Exception:
+                if remaining_time() == 0.0:
+                    # The request ran out of time; the provider did not refuse
+                    with self._lock:
+                        self._pending.pop(key, None)
+                    return None
+                handle = None
+                expires = time.monotonic() + self.retry_seconds
+            with self._lock:
+                if handle is not None:
+                    self.created += 1
+                self._handles[key] = (handle, expires)
+                self._handles.move_to_end(key)
+                while len(self._handles) > self.max_entries:
+                    self._handles.popitem(last=False)
+                self._pending.pop(key, None)
+            return handle
+
+    def prepare(self, prompt: Union[str, PromptParts]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Turn a prompt into the text and options of a model call.
+
+        Split prompts are sent as their suffix plus a handle to the cached
+        prefix; whole prompts, short prefixes and refused prefixes are sent
+        as they are.
+
+        Args:
+            prompt: Prompt, whole or split
+
+        Returns:
+            Tuple[str, Dict]: Text to send and extra keyword arguments for the call
+        """
+        if not isinstance(prompt, PromptParts):
+            return prompt, {}
+        if len(prompt.prefix) < self.min_prefix_tokens * _CHARS_PER_TOKEN:
+            self.fallbacks += 1
+            return prompt.text, {}
+        handle = self._handle(prompt.prefix)
+        if handle is None:
+            self.fallbacks += 1
+            return prompt.text, {}
+        self.hits += 1
+        return prompt.suffix, {'cached_content': handle}
+
+    def recover(self, prompt: Union[str, PromptParts], options: Dict[str, Any],
+                error: Exception) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Decide how to resend a call that failed because of how it was prepared.
+
+        A call turned away because the provider no longer knows its handle
+        (it expired early or was deleted) would fail the same way if retried,
+        so the handle is dropped, to be registered again by the next call,
+        and this call is resent with the whole prompt.
+
+        Args:
+            prompt: Prompt of the failed call
+            options: Extra keyword arguments the call was made with
+            error: Error the call failed with
+
+        Returns:
+            Optional[Tuple[str, Dict]]: The whole prompt and no options, or
+                                        None if the error is not about the handle
+        """
+        handle = options.get('cached_content')
+        if handle is None or not isinstance(prompt, PromptParts):
+            return None
+        cause: Optional[BaseException] = error
+        while cause is not None and not _CACHED_CONTENT_ERROR.search(str(cause)):
+            cause = cause.__cause__ or cause.__context__
+        if cause is None:
+            return None
+        key = self._key(prompt.prefix)
+        with self._lock:
+            entry = self._handles.get(key)
+            if entry is not None and entry[0] == handle:
+                del self._handles[key]
+            self.fallbacks += 1
+        return prompt.text, {}
+
+    def clear(self) -> None:
+        """Forget every handle, so that prefixes are registered again."""
+        with self._lock:
+            self._handles.clear()
+
+def context_cache_creator(llm: Any) -> Optional[Callable[[str, float], str]]:
+    """
+    Find how to register a prompt prefix with a model's provider.
+
+    Models that implement `create_cached_content(prefix, ttl_seconds, timeout)`
+    themselves (such as the benchmark's fake model) use it; Gemini chat
+    models use the Gemini context cache API.
+
+    Args:
+        llm: The model prompts are sent to
+
+    Returns:
+        Optional[Callable]: Registers a prefix for a number of seconds, within
+                            a timeout, and returns its handle, or None if the
+                            model cannot cache prefixes
+    """
+    create = getattr(llm, 'create_cached_content', None)
+    if callable(create):
+        return create
+    if type(llm).__name__ == "ChatGoogleGenerativeAI":
+        return gemini_context_cache(llm)
+    return None
+
+def gemini_context_cache(llm: Any) -> Callable[..., str]:
+    """
+    Build a function registering prompt prefixes in the Gemini context cache.
+
+    Args:
+        llm: Gemini chat model the prefixes are used with
+
+    Returns:
+        Callable: Registers a prefix for a number of seconds, within a
+                  timeout, and returns the name of the cached content
+    """
+    from google.ai import generativelanguage_v1beta as genai
+
+    api_key = getattr(llm, 'google_api_key', None)
+    if hasattr(api_key, 'get_secret_value'):
+        api_key = api_key.get_secret_value()
+    client = genai.CacheServiceClient(client_options={'api_key': api_key} if api_key else None)
+    model = llm.model if llm.model.startswith("models/") else f"models/{llm.model}"
+
+    def create(prefix: str, ttl_seconds: float, timeout: Optional[float] = None) -> str:
+        cached = client.create_cached_content(
+            cached_content=genai.CachedContent(
+                model=model,
+                contents=[genai.Content(role="user", parts=[genai.Part(text=prefix)])],
+                ttl=timedelta(seconds=ttl_seconds)
+            ),
+            **({} if timeout is None else {'timeout': timeout})
+        )
+        return cached.name
+
+    return create
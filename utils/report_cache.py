@@ -0,0 +1,127 @@
+"""
+This module contains the per-user cache of conversation reports.
+
+A cached report remembers how many messages it covered and a hash of the
+conversation text at that point. Polling a report for an unchanged
+conversation is then answered without calling the model. When new turns have
+arrived the hash shows whether the old report still describes the beginning
+of the conversation, in which case only the new turns need to be analysed.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+
+class CachedReport(NamedTuple):
+    """
+    A report together with the part of the conversation it covers.
+
+    Attributes:
+        conversation_length: Number of messages the report covers
+        text_length: Length of the formatted conversation text it covers
+        digest: Hash of that text
+        report: The report itself
+    """
+    conversation_length: int
+    text_length: int
+    digest: str
+    report: Dict[str, Any]
+
+def text_digest(text: str) -> str:
+    """
+    Hash formatted conversation text.
+
+    Args:
+        text: Formatted conversation text
+
+    Returns:
+        str: Hex digest of the text
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class ReportCache:
+    """
+    Bounded LRU cache of the latest report for each user.
+
+    Attributes:
+        max_users (int): Maximum number of cached reports
+        hits (int): Reports served unchanged from the cache
+        incremental_updates (int): Reports updated from the cached one plus new turns
+        full_rebuilds (int): Reports computed from the whole conversation
+    """
+    def __init__(self, max_users: int = 10000):
+        """
+        Initialize an empty report cache.
+
+        Args:
+            max_users: Maximum number of cached reports
+        """
+        self.max_users = max_users
+        self.hits = 0
+        self.incremental_updates = 0
+        self.full_rebuilds = 0
+        self._reports: "OrderedDict[str, CachedReport]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[CachedReport]:
+        """
+        Return the latest cached report for a user.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            Optional[CachedReport]: Cached report, or None
+        """
+        with self._lock:
+            cached = self._reports.get(user_id)
+            if cached is not None:
+                self._reports.move_to_end(user_id)
+            return cached
+
+    def set(self, user_id: str, conversation_length: int, text: str, report: Dict[str, Any]) -> None:
+        """
+        Cache the latest report for a user.
+
+        Args:
+            user_id: Unique identifier for the user
+            conversation_length: Number of messages the report covers
+            text: Formatted conversation text the report covers
+            report: The report itself
+        """
+        with self._lock:
+            self._reports[user_id] = CachedReport(conversation_length, len(text), text_digest(text), report)
+            self._reports.move_to_end(user_id)
+            while len(self._reports) > self.max_users:
+                self._reports.popitem(last=False)
+
+    def pop(self, user_id: str) -> None:
+        """
+        Forget the cached report for a user.
+
+        Args:
+            user_id: Unique identifier for the user
+        """
+        with self._lock:
+            self._reports.pop(user_id, None)
+
+    def clear(self) -> None:
+        """Forget every cached report."""
+        with self._lock:
+            self._reports.clear()
+
+    def count(self, outcome: str) -> None:
+        """
+        Record how a report was produced.
+
+        Args:
+            outcome: "hit", "incremental" or "full"
+        """
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "incremental":
+                self.incremental_updates += 1
+            else:
+                self.full_rebuilds += 1
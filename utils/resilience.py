@@ -0,0 +1,505 @@
+"""
+This module contains the retry and hedging wrapper used for language model
+calls.
+
+A call is retried on failure with jittered exponential backoff, and each
+attempt can be given its own timeout. Optionally a second, hedged request is
+sent when the first has not answered within the recent p95 latency; whichever
+answers first wins. Backoff is latency-aware: a retry is only attempted when
+the backoff plus the typical (p50) latency still fits in the request's
+deadline, so doomed retries do not add to the tail.
+
+Hedging trades a little extra upstream traffic (roughly the fraction of calls
+slower than the hedging percentile) for a much shorter tail.
+
+Only transient failures are retried: timeouts, connection errors and
+responses with status 408, 429 or 5xx. Invalid requests, authentication
+failures and safety blocks fail the same way every time, so they are raised
+at once.
+"""
+
+import os
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+
+from utils.admission import DeadlineExceeded, OverloadError, remaining_time
+
+# HTTP statuses worth retrying: request timeout, rate limiting and server errors
+RETRYABLE_STATUS_CODES = frozenset({408, 429})
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """
+    Find the HTTP status of a failed model call.
+
+    Google API errors carry it as `code`, other clients as `status_code` or on
+    their `response`.
+
+    Args:
+        error: Error raised by the model client
+
+    Returns:
+        Optional[int]: The HTTP status, or None if the error has none
+    """
+    for status in (
+        getattr(error, 'code', None),
+        getattr(error, 'status_code', None),
+        getattr(getattr(error, 'response', None), 'status_code', None)
+    ):
+        if isinstance(status, int) and not isinstance(status, bool):
+            return status
+    return None
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Tell whether a failed model call is worth retrying.
+
+    The error and the errors it was raised from are checked, since model
+    wrappers often re-raise the client's error as their own.
+
+    Args:
+        error: Error raised by the model call
+
+    Returns:
+        bool: True for timeouts, connection errors and 408, 429 and 5xx responses
+    """
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, (TimeoutError, ConnectionError)):
+            return True
+        status = _status_code(current)
+        if status is not None:
+            return status in RETRYABLE_STATUS_CODES or status >= 500
+        current = current.__cause__ or current.__context__
+    return False
+
+class LatencyTracker:
+    """
+    Rolling window of recent call latencies.
+
+    Attributes:
+        window (int): Number of recent latencies kept
+        min_samples (int): Samples needed before percentiles are reported
+    """
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Initialize an empty tracker.
+
+        Args:
+            window: Number of recent latencies kept
+            min_samples: Samples needed before percentiles are reported
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        """
+        Record the latency of a successful call.
+
+        Args:
+            seconds: Call latency in seconds
+        """
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Return a percentile of the recent latencies.
+
+        Args:
+            fraction: Percentile as a fraction (0.95 for p95)
+
+        Returns:
+            Optional[float]: The percentile in seconds, or None with too few samples
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+class ResilientCaller:
+    """
+    Runs model calls with retries, per-attempt timeouts and optional hedging.
+
+    The wrapped function receives the timeout for the attempt (or None) so
+    it can pass it on to the model client.
+
+    Attributes:
+        max_retries (int): Retries after the first attempt
+        backoff_base (float): Backoff before the first retry in seconds
+        backoff_max (float): Upper bound of the backoff in seconds
+        attempt_timeout (Optional[float]): Time limit for each attempt
+        hedge (bool): Whether to send a hedged request for slow calls
+        hedge_percentile (float): Latency percentile after which to hedge
+        hedge_min_delay (float): Minimum delay before hedging in seconds
+        latency (LatencyTracker): Recent latencies of successful attempts
+        attempts (int): Attempts made, including hedged requests
+        retries (int): Retries made
+        hedges (int): Hedged requests sent
+        hedge_wins (int): Calls answered by the hedged request
+        failures (int): Attempts that failed or timed out
+        retryable (Callable): Tells whether a failed attempt is worth retrying
+    """
+    def __init__(self,
+                 max_retries: int = 2,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0,
+                 attempt_timeout: Optional[float] = None,
+                 hedge: bool = False,
+                 hedge_percentile: float = 0.95,
+                 hedge_min_delay: float = 0.05,
+                 pool_size: int = 16,
+                 latency: Optional[LatencyTracker] = None,
+                 seed: Optional[int] = None,
+                 retryable: Callable[[BaseException], bool] = is_retryable):
+        """
+        Initialize the caller.
+
+        Args:
+            max_retries: Retries after the first attempt
+            backoff_base: Backoff before the first retry in seconds
+            backoff_max: Upper bound of the backoff in seconds
+            attempt_timeout: Time limit for each attempt (None for no limit)
+            hedge: Whether to send a hedged request for slow calls
+            hedge_percentile: Latency percentile after which to hedge
+            hedge_min_delay: Minimum delay before hedging in seconds
+            pool_size: Worker threads for timed and hedged synchronous attempts
+            latency: Tracker of recent latencies (defaults to a new one)
+            seed: Seed for the backoff jitter
+            retryable: Tells whether a failed attempt is worth retrying
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.attempt_timeout = attempt_timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = latency if latency is not None else LatencyTracker()
+        self.attempts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+        self.retryable = retryable
+        self._random = random.Random(seed)
+        self._pool_size = pool_size
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, pool_size: int = 16) -> "ResilientCaller":
+        """
+        Build a caller configured from environment variables.
+
+        Reads LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX,
+        LLM_ATTEMPT_TIMEOUT, LLM_HEDGE and LLM_HEDGE_PERCENTILE.
+
+        Args:
+            pool_size: Worker threads for timed and hedged synchronous attempts
+
+        Returns:
+            ResilientCaller: Configured caller
+        """
+        attempt_timeout = os.getenv("LLM_ATTEMPT_TIMEOUT")
+        return cls(
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+            backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "8")),
+            attempt_timeout=float(attempt_timeout) if attempt_timeout else None,
+            hedge=os.getenv("LLM_HEDGE", "false").lower() == "true",
+            hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+            pool_size=pool_size
+        )
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        """
+        Increase one of the caller's counters.
+
+        Args:
+            counter: Attribute name of the counter
+            amount: Amount to add
+        """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _attempt_timeout(self) -> Optional[float]:
+        """
+        Time limit for the next attempt: the attempt timeout, capped by the deadline.
+
+        Returns:
+            Optional[float]: Seconds, or None for no limit
+
+        Raises:
+            DeadlineExceeded: If the request's deadline has passed
+        """
+        remaining = remaining_time()
+        if remaining == 0.0:
+            raise DeadlineExceeded("Request deadline exceeded before the model answered")
+        if remaining is None:
+            return self.attempt_timeout
+        if self.attempt_timeout is None:
+            return remaining
+        return min(self.attempt_timeout, remaining)
+
+    def _backoff(self, retry: int) -> Optional[float]:
+        """
+        Choose the delay before a retry.
+
+        Uses "full jitter" exponential backoff, so retries from many callers
+        spread out instead of arriving together.
+
+        Args:
+            retry: Retry number, starting at 1
+
+        Returns:
+            Optional[float]: Delay in seconds, or None if the retry could not
+                             finish before the request's deadline
+        """
+        with self._lock:
+            delay = self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (retry - 1)))
+        remaining = remaining_time()
+        if remaining is not None and delay + (self.latency.percentile(0.5) or 0.0) >= remaining:
+            return None
+        return delay
+
+    def _hedge_delay(self) -> Optional[float]:
+        """
+        Time after which a slow attempt is hedged.
+
+        Returns:
+            Optional[float]: Seconds, or None if hedging is off or there are too
+                             few latency samples yet
+        """
+        if not self.hedge:
+            return None
+        delay = self.latency.percentile(self.hedge_percentile)
+        return None if delay is None else max(delay, self.hedge_min_delay)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """Return the thread pool for timed and hedged attempts, creating it on first use."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._pool_size, thread_name_prefix="llm-attempt")
+            return self._pool
+
+    def call(self, func: Callable[[Optional[float]], Any]) -> Any:
+        """
+        Call `func` with retries, per-attempt timeouts and optional hedging.
+
+        Without an attempt timeout or hedging the call runs on the calling
+        thread; otherwise attempts run on a small thread pool, and an attempt
+        that is abandoned keeps its thread until the model client gives up
+        (it is passed the same timeout).
+
+        Args:
+            func: Makes one attempt, given the attempt's timeout
+
+        Returns:
+            Any: The first successful result
+
+        Raises:
+            OverloadError: Immediately, without retrying
+            Exception: Immediately, if `retryable` says the error is not transient
+            DeadlineExceeded: If a retry could not finish before the request's deadline
+            Exception: The last attempt's error once retries are exhausted
+        """
+        retry = 0
+        while True:
+            timeout = self._attempt_timeout()
+            try:
+                return self._attempt(func, timeout)
+            except OverloadError:
+                raise
+            except Exception as e:
+                self._count("failures")
+                retry += 1
+                if retry > self.max_retries or not self.retryable(e):
+                    raise
+                delay = self._backoff(retry)
+                if delay is None:
+                    raise DeadlineExceeded("Not enough time left to retry the model call") from e
+            self._count("retries")
+            time.sleep(delay)
+
+    def _attempt(self, func: Callable[[Optional[float]], Any], timeout: Optional[float]) -> Any:
+        """
+        Make one attempt, hedging it if it is slow.
+
+        Args:
+            func: Makes one attempt, given the attempt's timeout
+            timeout: Time limit for the attempt
+
+        Returns:
+            Any: The first successful result
+
+        Raises:
+            TimeoutError: If no request answered within the timeout
+            Exception: The error of the last request to fail
+        """
+        started = time.perf_counter()
+        hedge_delay = self._hedge_delay()
+        self._count("attempts")
+        if hedge_delay is None and self.attempt_timeout is None:
+            result = func(timeout)
+            self.latency.observe(time.perf_counter() - started)
+            return result
+
+        pool = self._get_pool()
+        primary = pool.submit(contextvars.copy_context().run, func, timeout)
+        starts: Dict[Future, float] = {primary: started}
+        pending: Set[Future] = {primary}
+        expires = None if timeout is None else started + timeout
+        error: Optional[BaseException] = None
+        while pending:
+            now = time.perf_counter()
+            wait_for = None if expires is None else max(expires - now, 0.0)
+            if hedge_delay is not None and len(starts) == 1:
+                until_hedge = max(started + hedge_delay - now, 0.0)
+                wait_for = until_hedge if wait_for is None else min(wait_for, until_hedge)
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    self.latency.observe(time.perf_counter() - starts[future])
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+                error = future.exception()
+            if done:
+                continue
+
+            now = time.perf_counter()
+            if expires is not None and now >= expires:
+                for loser in pending:
+                    loser.cancel()
+                raise TimeoutError(f"Model call timed out after {timeout:.2f}s")
+            if hedge_delay is not None and len(starts) == 1:
+                hedge_timeout = None if expires is None else expires - now
+                hedged = pool.submit(contextvars.copy_context().run, func, hedge_timeout)
+                starts[hedged] = now
+                pending.add(hedged)
+                self._count("hedges")
+                self._count("attempts")
+        raise error
+
+    async def acall(self, func: Callable[[Optional[float]], Awaitable[Any]]) -> Any:
+        """
+        Asynchronously call `func` with retries, per-attempt timeouts and optional hedging.
+
+        Timed-out and losing requests are cancelled.
+
+        Args:
+            func: Starts one attempt, given the attempt's timeout
+
+        Returns:
+            Any: The first successful result
+
+        Raises:
+            OverloadError: Immediately, without retrying
+            Exception: Immediately, if `retryable` says the error is not transient
+            DeadlineExceeded: If a retry could not finish before the request's deadline
+            Exception: The last attempt's error once retries are exhausted
+        """
+        retry = 0
+        while True:
+            timeout = self._attempt_timeout()
+            try:
+                return await self._aattempt(func, timeout)
+            except OverloadError:
+                raise
+            except Exception as e:
+                self._count("failures")
+                retry += 1
+                if retry > self.max_retries or not self.retryable(e):
+                    raise
+                delay = self._backoff(retry)
+                if delay is None:
+                    raise DeadlineExceeded("Not enough time left to retry the model call") from e
+            self._count("retries")
+            await asyncio.sleep(delay)
+
+    async def _aattempt(self, func: Callable[[Optional[float]], Awaitable[Any]],
+                        timeout: Optional[float]) -> Any:
+        """
+        Asynchronously make one attempt, hedging it if it is slow.
+
+        Args:
+            func: Starts one attempt, given the attempt's timeout
+            timeout: Time limit for the attempt
+
+        Returns:
+            Any: The first successful result
+
+        Raises:
+            TimeoutError: If no request answered within the timeout
+            Exception: The error of the last request to fail
+        """
+        started = time.perf_counter()
+        hedge_delay = self._hedge_delay()
+        self._count("attempts")
+        primary = asyncio.ensure_future(func(timeout))
+        starts: Dict[asyncio.Future, float] = {primary: started}
+        pending: Set[asyncio.Future] = {primary}
+        expires = None if timeout is None else started + timeout
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                now = time.perf_counter()
+                wait_for = None if expires is None else max(expires - now, 0.0)
+                if hedge_delay is not None and len(starts) == 1:
+                    until_hedge = max(started + hedge_delay - now, 0.0)
+                    wait_for = until_hedge if wait_for is None else min(wait_for, until_hedge)
+                done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+                for future in done:
+                    if future.exception() is None:
+                        self.latency.observe(time.perf_counter() - starts[future])
+                        if future is not primary:
+                            self._count("hedge_wins")
+                        return future.result()
+                    error = future.exception()
+                if done:
+                    continue
+
+                now = time.perf_counter()
+                if expires is not None and now >= expires:
+                    raise TimeoutError(f"Model call timed out after {timeout:.2f}s")
+                if hedge_delay is not None and len(starts) == 1:
+                    hedged = asyncio.ensure_future(func(None if expires is None else expires - now))
+                    starts[hedged] = now
+                    pending.add(hedged)
+                    self._count("hedges")
+                    self._count("attempts")
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report retry and hedging activity.
+
+        Returns:
+            Dict: Attempt, retry, hedge and failure counts and the current hedge delay
+        """
+        return {
+            'attempts': self.attempts,
+            'retries': self.retries,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'failures': self.failures,
+            'hedge_delay': self._hedge_delay()
+        }
@@ -0,0 +1,299 @@
+"""
+This module contains the exact-match cache placed in front of the language model.
+
+Responses are keyed on a hash of the fully formatted prompt together with the
+model name and temperature, so a cached answer is only reused for exactly the
+same request. Two backends are available: an in-process LRU for a single worker
+and a SQLite file that several gunicorn workers on one host can share.
+"""
+
+import os
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def make_cache_key(prompt: str, model: Any, temperature: Any) -> str:
+    """
+    Build the cache key for a prompt sent to a given model configuration.
+
+    Runs of whitespace are collapsed so that formatting-only differences in
+    the prompt still hit the same entry.
+
+    Args:
+        prompt: Fully formatted prompt
+        model: Model name
+        temperature: Sampling temperature
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    normalized = _WHITESPACE_PATTERN.sub(" ", prompt).strip()
+    payload = f"{model}\x00{temperature}\x00{normalized}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class MemoryCacheBackend:
+    """
+    In-process LRU cache backend with per-entry expiry.
+
+    Attributes:
+        max_entries (int): Maximum number of cached responses
+    """
+    def __init__(self, max_entries: int = 10000):
+        """
+        Initialize an empty in-process cache.
+
+        Args:
+            max_entries: Maximum number of cached responses
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Optional[str]: Cached response, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        """
+        Store a response.
+
+        Args:
+            key: Cache key
+            value: Response to cache
+            ttl_seconds: Lifetime of the entry (0 keeps it until evicted)
+        """
+        expires_at = time.time() + ttl_seconds if ttl_seconds else 0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteCacheBackend:
+    """
+    On-disk cache backend that several worker processes can share.
+
+    The database runs in WAL mode so readers in other workers are not blocked
+    by writes. The size limit is enforced every `prune_interval` writes by
+    dropping expired entries and then the least recently stored ones.
+
+    Attributes:
+        path (str): Location of the SQLite database file
+        max_entries (int): Maximum number of cached responses
+        prune_interval (int): Number of writes between size checks
+    """
+    def __init__(self, path: str, max_entries: int = 100000, prune_interval: int = 100):
+        """
+        Open (and create if needed) the shared cache database.
+
+        Args:
+            path: Location of the SQLite database file
+            max_entries: Maximum number of cached responses
+            prune_interval: Number of writes between size checks
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_interval = prune_interval
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Optional[str]: Cached response, or None if missing or expired
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (row[1] and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        """
+        Store a response.
+
+        Args:
+            key: Cache key
+            value: Response to cache
+            ttl_seconds: Lifetime of the entry (0 keeps it until evicted)
+        """
+        now = time.time()
+        expires_at = now + ttl_seconds if ttl_seconds else 0
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, stored_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            self._writes += 1
+            if self._writes % self.prune_interval == 0:
+                self._prune(now)
+            self._connection.commit()
+
+    def _prune(self, now: float) -> None:
+        """
+        Drop expired entries, then the oldest ones beyond the size limit.
+
+        Args:
+            now: Current time
+        """
+        self._connection.execute(
+            "DELETE FROM responses WHERE expires_at != 0 AND expires_at < ?", (now,)
+        )
+        self._connection.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+class ResponseCache:
+    """
+    Exact-match cache of model responses with hit and miss counters.
+
+    Attributes:
+        backend: Storage backend (in-process or SQLite)
+        ttl_seconds (float): Lifetime of cached responses (0 keeps them until evicted)
+        hits (int): Number of lookups served from the cache
+        misses (int): Number of lookups that missed
+    """
+    def __init__(self, backend: Any, ttl_seconds: float = 3600):
+        """
+        Initialize a response cache.
+
+        Args:
+            backend: Storage backend (in-process or SQLite)
+            ttl_seconds: Lifetime of cached responses (0 keeps them until evicted)
+        """
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """
+        Build a response cache configured from environment variables.
+
+        Reads RESPONSE_CACHE_BACKEND ("memory", "sqlite" or "none"),
+        RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_ENTRIES and RESPONSE_CACHE_TTL.
+
+        Returns:
+            Optional[ResponseCache]: Configured cache, or None if caching is disabled
+
+        Raises:
+            ValueError: If the backend name is unknown
+        """
+        backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+        max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+        ttl_seconds = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+        if backend_name == "none":
+            return None
+        if backend_name == "memory":
+            return cls(MemoryCacheBackend(max_entries), ttl_seconds)
+        if backend_name == "sqlite":
+            path = os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite3")
+            return cls(SQLiteCacheBackend(path, max_entries), ttl_seconds)
+        raise ValueError(f"Unknown response cache backend: {backend_name}")
+
+    def get(self, prompt: str, model: Any, temperature: Any) -> Optional[str]:
+        """
+        Look up the cached response for a prompt.
+
+        Args:
+            prompt: Fully formatted prompt
+            model: Model name
+            temperature: Sampling temperature
+
+        Returns:
+            Optional[str]: Cached response, or None on a miss
+        """
+        value = self.backend.get(make_cache_key(prompt, model, temperature))
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, prompt: str, model: Any, temperature: Any, response: str) -> None:
+        """
+        Cache the response for a prompt.
+
+        Args:
+            prompt: Fully formatted prompt
+            model: Model name
+            temperature: Sampling temperature
+            response: Model response to cache
+        """
+        self.backend.set(make_cache_key(prompt, model, temperature), response, self.ttl_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache effectiveness.
+
+        Returns:
+            Dict: Hits, misses, hit rate and number of stored entries
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.backend)
+        }
@@ -0,0 +1,177 @@
+"""
+This module contains the single-flight layer that coalesces identical
+in-flight model calls.
+
+When several callers ask for the same key while a call for it is already
+running, only the first one (the leader) does the work; the others wait and
+receive its result. Nothing is remembered once the call finishes, so this
+complements the response cache rather than replacing it: the cache answers
+repeats of finished calls, single-flight answers repeats of running ones.
+
+Errors are shared with the waiters, except overload errors, which belong to
+the leader's request (its deadline, its place in the admission queue); a
+waiter that sees one retries on its own behalf. An asynchronous call is
+cancelled only when every caller waiting for it has gone away.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from utils.admission import DeadlineExceeded, OverloadError, remaining_time
+
+class _Call:
+    """A call in progress and the callers waiting for it."""
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class _AsyncCall:
+    """An asynchronous call in progress and the number of callers awaiting it."""
+    __slots__ = ("task", "refs")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.refs = 0
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key, in threads and on event loops.
+
+    Attributes:
+        calls (int): Calls that did the work themselves
+        coalesced (int): Calls answered with another caller's result
+    """
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self.calls = 0
+        self.coalesced = 0
+        self._inflight: Dict[Hashable, _Call] = {}
+        self._async_inflight: Dict[Tuple[int, Hashable], _AsyncCall] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        Run `func`, or wait for the identical call that is already running.
+
+        Args:
+            key: Identifies identical calls
+            func: Does the work when no identical call is running
+
+        Returns:
+            Any: The call's result
+
+        Raises:
+            DeadlineExceeded: If this caller's deadline passes while waiting
+            Exception: Whatever the call raised
+        """
+        while True:
+            with self._lock:
+                call = self._inflight.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._inflight[key] = call
+                    self.calls += 1
+
+            if leader:
+                try:
+                    call.result = func()
+                    return call.result
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        del self._inflight[key]
+                    call.done.set()
+
+            if not call.done.wait(remaining_time()):
+                raise DeadlineExceeded("Request deadline exceeded while waiting for the model")
+            if isinstance(call.error, OverloadError):
+                continue
+            if call.error is not None:
+                raise call.error
+            with self._lock:
+                self.coalesced += 1
+            return call.result
+
+    async def ado(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await `func()`, or the identical call that is already running.
+
+        The call runs as a task shared by its callers. A caller that is
+        cancelled or runs out of time stops waiting; the task itself is
+        cancelled once no caller is left.
+
+        Args:
+            key: Identifies identical calls
+            func: Starts the work when no identical call is running
+
+        Returns:
+            Any: The call's result
+
+        Raises:
+            DeadlineExceeded: If this caller's deadline passes while waiting
+            Exception: Whatever the call raised
+        """
+        # Tasks belong to one event loop, so calls are only shared within a loop
+        loop_key = (id(asyncio.get_running_loop()), key)
+        while True:
+            call = self._async_inflight.get(loop_key)
+            leader = call is None
+            if leader:
+                call = _AsyncCall(asyncio.ensure_future(func()))
+                self._async_inflight[loop_key] = call
+                call.task.add_done_callback(lambda _, call=call: self._forget(loop_key, call))
+                with self._lock:
+                    self.calls += 1
+
+            call.refs += 1
+            try:
+                result = await asyncio.wait_for(asyncio.shield(call.task), remaining_time())
+            except asyncio.TimeoutError:
+                if call.task.done() and not call.task.cancelled():
+                    # The call itself timed out rather than this caller's wait
+                    raise
+                raise DeadlineExceeded("Request deadline exceeded while waiting for the model") from None
+            except OverloadError:
+                if leader:
+                    raise
+                continue
+            finally:
+                call.refs -= 1
+                if call.refs == 0 and not call.task.done():
+                    call.task.cancel()
+
+            if not leader:
+                with self._lock:
+                    self.coalesced += 1
+            return result
+
+    def _forget(self, loop_key: Tuple[int, Hashable], call: _AsyncCall) -> None:
+        """
+        Remove a finished asynchronous call unless a newer one has replaced it.
+
+        Args:
+            loop_key: Event loop and call key
+            call: The finished call
+        """
+        if self._async_inflight.get(loop_key) is call:
+            del self._async_inflight[loop_key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report how many calls were coalesced.
+
+        Returns:
+            Dict: Calls made, calls saved and calls currently in flight
+        """
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'inflight': len(self._inflight) + len(self._async_inflight)
+        }
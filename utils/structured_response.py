@@ -0,0 +1,88 @@
+"""
+This module parses the single-call form of a counselor turn.
+
+By default a turn takes two model calls: one for the counselor's answer and
+one for the follow-up questions suggested to the student. In the
+"structured" response mode one prompt asks for both at once as a JSON
+object, which halves the calls and tokens per turn. Models do not always
+return valid JSON, so the reply is checked here and the caller falls back
+to the two-call path when it is not usable.
+"""
+
+import json
+from typing import Any, List, NamedTuple, Optional
+
+RESPONSE_MODE_SEPARATE = "separate"
+RESPONSE_MODE_STRUCTURED = "structured"
+RESPONSE_MODES = (RESPONSE_MODE_SEPARATE, RESPONSE_MODE_STRUCTURED)
+
+# Number of follow-up questions suggested with each answer
+FOLLOW_UP_QUESTION_COUNT = 3
+
+class StructuredReply(NamedTuple):
+    """
+    Counselor answer and follow-up questions returned by one model call.
+
+    Attributes:
+        response: The counselor's answer to the student
+        follow_up_questions: Questions the student could ask next
+    """
+    response: str
+    follow_up_questions: List[str]
+
+    def questions_text(self) -> str:
+        """
+        Format the follow-up questions as the two-call path returns them.
+
+        Returns:
+            str: JSON array of the questions
+        """
+        return json.dumps(self.follow_up_questions)
+
+def _json_object(text: str) -> Any:
+    """
+    Decode the JSON object in a model reply, ignoring code fences or text around it.
+
+    Args:
+        text: Model reply
+
+    Returns:
+        Any: The decoded object, or None if the reply contains none
+    """
+    start = text.find("{")
+    end = text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        return json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+
+def parse_structured_reply(text: str) -> Optional[StructuredReply]:
+    """
+    Parse and validate a structured model reply.
+
+    The reply must be a JSON object with a non-empty "response" string and a
+    "follow_up_questions" list of at least FOLLOW_UP_QUESTION_COUNT non-empty
+    strings; any extra questions are dropped.
+
+    Args:
+        text: Model reply
+
+    Returns:
+        Optional[StructuredReply]: The answer and questions, or None if the
+                                   reply is not usable
+    """
+    payload = _json_object(text)
+    if not isinstance(payload, dict):
+        return None
+    response = payload.get('response')
+    questions = payload.get('follow_up_questions')
+    if not isinstance(response, str) or not response.strip():
+        return None
+    if not isinstance(questions, list):
+        return None
+    questions = [question.strip() for question in questions if isinstance(question, str) and question.strip()]
+    if len(questions) < FOLLOW_UP_QUESTION_COUNT:
+        return None
+    return StructuredReply(response.strip(), questions[:FOLLOW_UP_QUESTION_COUNT])
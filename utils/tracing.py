@@ -0,0 +1,51 @@
+"""
+This module contains a lazy version of LangSmith's `traceable` decorator.
+
+Importing `langsmith.traceable` pulls in the LangSmith client, which costs
+a noticeable part of startup. Functions decorated here are only wrapped
+with the real decorator, and LangSmith is only imported, the first time
+they are called.
+"""
+
+import functools
+import inspect
+from typing import Any, Callable, Optional
+
+def traceable(func: Optional[Callable[..., Any]] = None, **options: Any) -> Any:
+    """
+    Trace a function with LangSmith, importing LangSmith on its first call.
+
+    Usable bare (`@traceable`) or with the options of `langsmith.traceable`
+    (`@traceable(project_name="...")`).
+
+    Args:
+        func: Function to trace, when used without options
+        **options: Options passed to `langsmith.traceable`
+
+    Returns:
+        The decorated function, or a decorator when called with options only
+    """
+    def decorate(func: Callable[..., Any]) -> Callable[..., Any]:
+        traced: Optional[Callable[..., Any]] = None
+
+        def resolve() -> Callable[..., Any]:
+            nonlocal traced
+            if traced is None:
+                from langsmith import traceable as langsmith_traceable
+                traced = langsmith_traceable(**options)(func)
+            return traced
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                return await resolve()(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return resolve()(*args, **kwargs)
+        return wrapper
+
+    if func is not None:
+        return decorate(func)
+    return decorate
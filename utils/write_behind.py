@@ -0,0 +1,238 @@
+"""
+This module contains the write-behind queue that batches conversation writes.
+
+Saving a turn used to be a write of its own. With a durable conversation
+store that meant one transaction per turn per user. The queue instead
+collects writes from all users and hands them to a single bulk write once
+`max_batch` items are waiting or the oldest has waited `flush_interval`
+seconds.
+
+Until a write is flushed it is visible through `read`, so the next turn of
+the same user sees it even though the store does not have it yet. Reads do
+not wait for a flush in progress: they take a snapshot of the queued items,
+read the store, and drop the queued items the store already returned,
+recognised by their ids. Failed
+flushes are logged and retried a few times before the writes are dropped,
+and whatever is still queued is flushed when the process exits.
+"""
+
+import os
+import atexit
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Batch = List[Tuple[str, List[Any]]]
+
+class WriteBehindQueue:
+    """
+    Buffers appends per key and flushes them together in the background.
+
+    Items queued for the same key keep their order, and a key's items are
+    never split across two concurrent flushes.
+
+    Attributes:
+        flush_func (Callable): Writes a batch of (key, items) pairs in one operation
+        max_batch (int): Number of queued items that triggers a flush
+        flush_interval (float): Longest time an item waits before it is flushed
+        max_attempts (int): Attempts at writing a batch before it is dropped
+        batches (int): Batches written
+        items_written (int): Items written
+        errors (int): Failed flush attempts
+        dropped (int): Items dropped after every attempt failed
+    """
+    def __init__(self, flush_func: Callable[[Batch], None], max_batch: int = 256,
+                 flush_interval: float = 0.05, max_attempts: int = 3):
+        """
+        Initialize an empty queue. The flusher thread starts with the first write.
+
+        Args:
+            flush_func: Writes a batch of (key, items) pairs in one operation
+            max_batch: Number of queued items that triggers a flush
+            flush_interval: Longest time an item waits before it is flushed
+            max_attempts: Attempts at writing a batch before it is dropped
+        """
+        self.flush_func = flush_func
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.batches = 0
+        self.items_written = 0
+        self.errors = 0
+        self.dropped = 0
+        self._pending: Dict[str, List[Any]] = {}
+        self._pending_items = 0
+        self._oldest: Optional[float] = None
+        self._flushing: Dict[str, List[Any]] = {}
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._condition = threading.Condition()
+        # Held while a batch is written, so flushes and discards never overlap
+        self._flush_lock = threading.RLock()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, flush_func: Callable[[Batch], None]) -> "WriteBehindQueue":
+        """
+        Build a queue configured from environment variables.
+
+        Reads WRITE_BEHIND_MAX_BATCH and WRITE_BEHIND_FLUSH_INTERVAL.
+
+        Args:
+            flush_func: Writes a batch of (key, items) pairs in one operation
+
+        Returns:
+            WriteBehindQueue: Configured queue
+        """
+        return cls(
+            flush_func,
+            max_batch=int(os.getenv("WRITE_BEHIND_MAX_BATCH", "256")),
+            flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.05"))
+        )
+
+    @property
+    def pending_items(self) -> int:
+        """Number of items waiting to be flushed."""
+        return self._pending_items
+
+    def _ensure_thread(self) -> None:
+        """Start the flusher thread, again in a forked child. Caller holds the condition."""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def put(self, key: str, items: List[Any]) -> None:
+        """
+        Queue items to be appended under a key.
+
+        Args:
+            key: Key the items belong to (a user id)
+            items: Items to append, oldest first
+
+        Raises:
+            RuntimeError: If the queue has been closed
+        """
+        if not items:
+            return
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            self._pending.setdefault(key, []).extend(items)
+            self._pending_items += len(items)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._ensure_thread()
+            self._condition.notify()
+
+    def read(self, key: str, load: Callable[[str], List[Any]],
+             identity: Callable[[Any], Any] = lambda item: getattr(item, 'id', None)) -> List[Any]:
+        """
+        Read a key's flushed items followed by its queued ones.
+
+        The queued items are taken before the store is read, so a flush that
+        finishes in between may already have written some of them; those are
+        recognised by their identity and not returned twice. Items without an
+        identity cannot be recognised and are always returned.
+
+        Args:
+            key: Key to read
+            load: Reads the items already written for a key
+            identity: Returns an item's unique id, or None if it has none
+
+        Returns:
+            List: Flushed and queued items, oldest first
+        """
+        with self._condition:
+            queued = self._flushing.get(key, []) + self._pending.get(key, [])
+        items = load(key)
+        if not queued:
+            return items
+        written = {identity(item) for item in items}
+        written.discard(None)
+        return items + [item for item in queued if identity(item) not in written]
+
+    def discard(self, key: str) -> None:
+        """
+        Drop a key's queued items, waiting for a flush that is writing them.
+
+        Args:
+            key: Key whose items are dropped
+        """
+        with self._flush_lock:
+            with self._condition:
+                items = self._pending.pop(key, None)
+                if items:
+                    self._pending_items -= len(items)
+
+    def flush(self) -> None:
+        """Write everything queued so far in one batch."""
+        with self._flush_lock:
+            with self._condition:
+                if not self._pending:
+                    return
+                self._flushing, self._pending = self._pending, {}
+                count, self._pending_items, self._oldest = self._pending_items, 0, None
+            batch = list(self._flushing.items())
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    self.flush_func(batch)
+                    self.batches += 1
+                    self.items_written += count
+                    break
+                except Exception:
+                    self.errors += 1
+                    logger.exception("Writing %d queued items failed (attempt %d of %d)",
+                                     count, attempt, self.max_attempts)
+            else:
+                self.dropped += count
+                logger.error("Dropped %d queued items after %d failed attempts", count, self.max_attempts)
+            with self._condition:
+                self._flushing = {}
+
+    def _run(self) -> None:
+        """Flush whenever the batch is full or its oldest item has waited long enough."""
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._oldest is not None:
+                        wait = self._oldest + self.flush_interval - time.monotonic()
+                        if self._pending_items >= self.max_batch or wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    self._condition.wait(wait)
+                if self._closed:
+                    return
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the flusher thread and write whatever is still queued."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the queue's throughput and failures.
+
+        Returns:
+            Dict: Queued items, batches and items written, errors and dropped items
+        """
+        return {
+            'pending': self._pending_items,
+            'batches': self.batches,
+            'items_written': self.items_written,
+            'errors': self.errors,
+            'dropped': self.dropped
+        }
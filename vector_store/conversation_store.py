@@ -0,0 +1,344 @@
+"""
+This module contains the ConversationStore, a durable home for full
+conversation histories that several gunicorn workers can share.
+
+Without a store, a user's conversation lives in the memory of whichever worker
+served it, so a turn routed to another worker starts from scratch. With a
+store, every worker reads and appends the same history. The SQLite backend
+keeps the database in WAL mode, writes all the messages of a turn in one
+transaction and serves repeated reads from an in-process cache that is
+revalidated against the database on every read, so writes made by other
+workers are picked up on the next turn.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+class ConversationStore:
+    """
+    Interface of conversation history backends.
+
+    Histories are append-only lists of messages per user; the only other
+    change is deleting a user's history altogether.
+    """
+    @classmethod
+    def from_env(cls) -> Optional["ConversationStore"]:
+        """
+        Build a conversation store configured from environment variables.
+
+        Reads CONVERSATION_STORE_BACKEND ("memory" or "sqlite"),
+        CONVERSATION_STORE_PATH and CONVERSATION_STORE_CACHE_SIZE.
+
+        Returns:
+            Optional[ConversationStore]: Configured store, or None when
+                                         conversations are kept in process memory
+
+        Raises:
+            ValueError: If the backend name is unknown
+        """
+        backend_name = os.getenv("CONVERSATION_STORE_BACKEND", "memory").lower()
+        if backend_name == "memory":
+            return None
+        if backend_name == "sqlite":
+            return SQLiteConversationStore(
+                os.getenv("CONVERSATION_STORE_PATH", "conversations.sqlite3"),
+                cache_size=int(os.getenv("CONVERSATION_STORE_CACHE_SIZE", "1000"))
+            )
+        raise ValueError(f"Unknown conversation store backend: {backend_name}")
+
+    def load(self, user_id: str) -> List[BaseMessage]:
+        """
+        Read a user's conversation.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            List[BaseMessage]: Messages oldest first (empty for unknown users)
+        """
+        raise NotImplementedError
+
+    def append(self, user_id: str, messages: Sequence[BaseMessage]) -> None:
+        """
+        Add messages to the end of a user's conversation.
+
+        Args:
+            user_id: Unique identifier for the user
+            messages: Messages to add, oldest first
+        """
+        raise NotImplementedError
+
+    def append_many(self, entries: Sequence[Tuple[str, Sequence[BaseMessage]]]) -> None:
+        """
+        Add messages to several conversations.
+
+        Backends that can should write all of them in one operation.
+
+        Args:
+            entries: (user id, messages) pairs, each user's messages oldest first
+        """
+        for user_id, messages in entries:
+            self.append(user_id, messages)
+
+    def delete(self, user_id: str) -> None:
+        """
+        Remove a user's conversation.
+
+        Args:
+            user_id: Unique identifier for the user
+        """
+        raise NotImplementedError
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Conversation store in a local SQLite file shared by the workers on a host.
+
+    Each message is a row, so appending a turn never rewrites the history
+    before it. A cached history is checked against the message count and the
+    newest message id of its user; when only new messages were added they are
+    fetched on their own, and anything else (such as a reset in another
+    worker) reloads the whole conversation.
+
+    The connection is reopened after a fork, so a store created before
+    gunicorn forks its workers is safe to use in each of them.
+
+    Attributes:
+        path (str): Location of the SQLite database file
+        cache_size (int): Maximum number of conversations cached in process
+        hits (int): Reads answered from the cache without fetching messages
+        misses (int): Reads that fetched messages from the database
+    """
+    def __init__(self, path: str, cache_size: int = 1000):
+        """
+        Open (and create if needed) the conversation database.
+
+        Args:
+            path: Location of the SQLite database file
+            cache_size: Maximum number of conversations cached in process
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        # Per user: message count, newest message id and the messages
+        self._cache: "OrderedDict[str, Tuple[int, int, List[BaseMessage]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        with self._lock:
+            self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return this process's connection, opening it on first use. Caller holds the lock.
+
+        Returns:
+            sqlite3.Connection: Open connection
+        """
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+            "message TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS conversation_messages_user "
+            "ON conversation_messages (user_id, id)"
+        )
+        connection.commit()
+        # A connection inherited from the parent process is left alone, since
+        # closing it would also affect the parent
+        self._connection = connection
+        self._pid = os.getpid()
+        self._cache.clear()
+        return connection
+
+    @staticmethod
+    def _decode(rows: List[Tuple[int, str]]) -> List[BaseMessage]:
+        """
+        Turn message rows back into messages.
+
+        Args:
+            rows: (id, serialized message) rows, oldest first
+
+        Returns:
+            List[BaseMessage]: Messages oldest first
+        """
+        return messages_from_dict([json.loads(message) for _, message in rows])
+
+    def load(self, user_id: str) -> List[BaseMessage]:
+        """
+        Read a user's conversation through the in-process cache.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            List[BaseMessage]: Messages oldest first (empty for unknown users)
+        """
+        with self._lock:
+            connection = self._connect()
+            count, newest = connection.execute(
+                "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM conversation_messages WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+            cached = self._cache.get(user_id)
+            if cached is not None and cached[:2] == (count, newest):
+                self.hits += 1
+                self._cache.move_to_end(user_id)
+                return list(cached[2])
+
+            self.misses += 1
+            messages = None
+            if cached is not None:
+                rows = connection.execute(
+                    "SELECT id, message FROM conversation_messages WHERE user_id = ? AND id > ? ORDER BY id",
+                    (user_id, cached[1])
+                ).fetchall()
+                if cached[0] + len(rows) == count:
+                    messages = cached[2] + self._decode(rows)
+            if messages is None:
+                rows = connection.execute(
+                    "SELECT id, message FROM conversation_messages WHERE user_id = ? ORDER BY id",
+                    (user_id,)
+                ).fetchall()
+                messages = self._decode(rows)
+
+            self._cache[user_id] = (count, newest, messages)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return list(messages)
+
+    def append(self, user_id: str, messages: Sequence[BaseMessage]) -> None:
+        """
+        Add messages to the end of a user's conversation in one transaction.
+
+        The cached copy is brought up to date by the next read.
+
+        Args:
+            user_id: Unique identifier for the user
+            messages: Messages to add, oldest first
+        """
+        self.append_many([(user_id, messages)])
+
+    def append_many(self, entries: Sequence[Tuple[str, Sequence[BaseMessage]]]) -> None:
+        """
+        Add messages to several conversations in one transaction.
+
+        Args:
+            entries: (user id, messages) pairs, each user's messages oldest first
+        """
+        now = time.time()
+        rows = [
+            (user_id, json.dumps(message_to_dict(message)), now)
+            for user_id, messages in entries for message in messages
+        ]
+        if not rows:
+            return
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "INSERT INTO conversation_messages (user_id, message, created_at) VALUES (?, ?, ?)",
+                rows
+            )
+            connection.commit()
+
+    def delete(self, user_id: str) -> None:
+        """
+        Remove a user's conversation.
+
+        Args:
+            user_id: Unique identifier for the user
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM conversation_messages WHERE user_id = ?", (user_id,))
+            connection.commit()
+            self._cache.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report how well the in-process cache works.
+
+        Returns:
+            Dict: Cache hits, misses and cached conversations
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'cached': len(self._cache)
+        }
+
+class StoredChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat message history of one user kept in a ConversationStore.
+
+    Plugged into ConversationBufferMemory as its `chat_memory`, it makes
+    `save_context` and `load_memory_variables` read and write the store.
+    With a write-behind queue, new messages are queued and written in batches
+    together with other users' messages; reads include the queued ones.
+
+    Attributes:
+        store (ConversationStore): Where the conversation is kept
+        user_id (str): Unique identifier for the user
+        writer (WriteBehindQueue): Batches writes to the store, if set
+        holds_messages (bool): Always False: messages live in the store, so
+                               the session store does not count their bytes
+    """
+    holds_messages = False
+
+    def __init__(self, store: ConversationStore, user_id: str, writer: Optional[Any] = None):
+        """
+        Initialize the history.
+
+        Args:
+            store: Where the conversation is kept
+            user_id: Unique identifier for the user
+            writer: Write-behind queue flushing into `store.append_many`, if any
+        """
+        self.store = store
+        self.user_id = user_id
+        self.writer = writer
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """The user's messages, oldest first."""
+        if self.writer is not None:
+            return self.writer.read(self.user_id, self.store.load)
+        return self.store.load(self.user_id)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """
+        Append messages to the user's conversation.
+
+        Args:
+            messages: Messages to add, oldest first
+        """
+        if self.writer is not None:
+            # Ids let reads tell queued messages from the same ones once written
+            self.writer.put(self.user_id, [
+                message if message.id else message.model_copy(update={'id': uuid.uuid4().hex})
+                for message in messages
+            ])
+        else:
+            self.store.append(self.user_id, messages)
+
+    def clear(self) -> None:
+        """Remove the user's conversation."""
+        if self.writer is not None:
+            self.writer.discard(self.user_id)
+        self.store.delete(self.user_id)
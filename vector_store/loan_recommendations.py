@@ -0,0 +1,430 @@
+"""
+This module contains the LoanRecommendationStore, a semantic cache of past
+recommendations for first-turn questions.
+
+Many students open with nearly the same question and nearly the same profile.
+The store embeds the message together with a canonicalized student profile
+using a local hashing vectorizer (no model download, CPU only), finds close
+neighbours through random-hyperplane locality-sensitive hashing, and returns
+the stored answer when the cosine similarity clears a configurable threshold.
+
+The profile fields that decide which lenders a student is offered (origin
+and destination country, loan currency, a bucket of the amount needed in USD
+and the cosigner and collateral flags), and the free-text fields the answer
+quotes back (the course of study and university), are not left to the
+similarity: they form a scope that is part of every bucket key, so an answer is only ever
+compared against, and served to, students with exactly the same scope. The
+version of the lender catalog an answer quotes is part of the scope too: an
+answer generated before a catalog reload is never served after it, even if it
+is only stored once the reload has happened.
+"""
+
+import os
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.lender_matching import normalize_country, parse_amount, parse_flag, to_usd
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Profile fields that identify the student rather than describe their situation
+_PERSONAL_FIELDS = {'name', 'userId'}
+# Free-text profile fields the answer quotes back, so they are matched exactly
+_QUOTED_FIELDS = ('course_of_study', 'university')
+_NAME_PLACEHOLDER = "\x00student_name\x00"
+# Loan amounts within a factor of about 1.4 of each other share a bucket
+_AMOUNT_BUCKETS_PER_DOUBLING = 2
+
+SparseVector = Dict[int, float]
+Scope = Tuple[Any, ...]
+
+class HashingVectorizer:
+    """
+    Stateless text vectorizer based on the hashing trick.
+
+    Words and word bigrams are hashed into a fixed number of buckets with a
+    sign bit to reduce collisions, weighted by sublinear term frequency and
+    L2-normalized, so cosine similarity is a plain dot product.
+
+    Attributes:
+        n_features (int): Number of hash buckets
+    """
+    def __init__(self, n_features: int = 2 ** 16):
+        """
+        Initialize the vectorizer.
+
+        Args:
+            n_features: Number of hash buckets
+        """
+        self.n_features = n_features
+
+    def transform(self, text: str, extra_features: Optional[List[str]] = None) -> SparseVector:
+        """
+        Embed a piece of text as a sparse, unit-length vector.
+
+        Args:
+            text: Free text to embed
+            extra_features: Additional literal features (e.g. "field=value")
+
+        Returns:
+            SparseVector: Mapping of bucket index to weight
+        """
+        words = _TOKEN_PATTERN.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])] + (extra_features or [])
+
+        counts: Dict[int, float] = {}
+        for feature in features:
+            digest = zlib.crc32(feature.encode('utf-8'))
+            index = digest % self.n_features
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            counts[index] = counts.get(index, 0.0) + sign
+
+        vector = {
+            index: math.copysign(1.0 + math.log(abs(count)), count)
+            for index, count in counts.items() if count
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if not norm:
+            return {}
+        return {index: weight / norm for index, weight in vector.items()}
+
+def cosine_similarity(left: SparseVector, right: SparseVector) -> float:
+    """
+    Cosine similarity of two unit-length sparse vectors.
+
+    Args:
+        left: First vector
+        right: Second vector
+
+    Returns:
+        float: Similarity between -1 and 1
+    """
+    if len(left) > len(right):
+        left, right = right, left
+    return sum(weight * right.get(index, 0.0) for index, weight in left.items())
+
+class LoanRecommendationStore:
+    """
+    Semantic cache of past answers to first-turn questions.
+
+    Entries are bucketed by several random-hyperplane hash bands; a lookup only
+    compares the query against entries sharing at least one band, which keeps
+    lookups fast as the store grows. The student's name is templated out of
+    stored answers and filled back in for the student being served.
+
+    Attributes:
+        threshold (float): Minimum cosine similarity for a hit
+        max_entries (int): Maximum number of stored answers
+        hits (int): Number of lookups answered from the store
+        misses (int): Number of lookups that found nothing close enough
+        lookup_seconds (float): Total time spent in lookups
+    """
+    def __init__(self,
+                 threshold: float = 0.92,
+                 max_entries: int = 10000,
+                 n_bands: int = 8,
+                 band_bits: int = 8,
+                 seed: int = 13):
+        """
+        Initialize an empty recommendation store.
+
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Maximum number of stored answers
+            n_bands: Number of locality-sensitive hash bands
+            band_bits: Number of hyperplanes per band
+            seed: Seed for the random hyperplanes
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.n_bands = n_bands
+        self.band_bits = band_bits
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+        self.vectorizer = HashingVectorizer()
+        self._seed = seed
+        self._hyperplane_cache: Dict[int, int] = {}
+        self._entries: "OrderedDict[int, Tuple[str, Scope, SparseVector, str]]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, Scope, int, int], List[int]] = {}
+        self._latest_versions: Dict[str, int] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["LoanRecommendationStore"]:
+        """
+        Build a recommendation store configured from environment variables.
+
+        Reads SEMANTIC_CACHE_THRESHOLD (the store is disabled when unset) and
+        SEMANTIC_CACHE_MAX_ENTRIES.
+
+        Returns:
+            Optional[LoanRecommendationStore]: Configured store, or None if disabled
+        """
+        threshold = os.getenv("SEMANTIC_CACHE_THRESHOLD")
+        if not threshold:
+            return None
+        return cls(
+            threshold=float(threshold),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+        )
+
+    @staticmethod
+    def canonical_profile(student_details: Dict[str, Any]) -> List[str]:
+        """
+        Turn a student profile into order-independent "field=value" features.
+
+        Personal identifiers are left out so that students in the same
+        situation share answers.
+
+        Args:
+            student_details: Student's information and requirements
+
+        Returns:
+            List[str]: One feature per profile field
+        """
+        return [
+            f"{key}={' '.join(_TOKEN_PATTERN.findall(str(value).lower()))}"
+            for key, value in sorted(student_details.items())
+            if key not in _PERSONAL_FIELDS
+        ]
+
+    @staticmethod
+    def profile_scope(student_details: Dict[str, Any]) -> Scope:
+        """
+        Extract the profile fields an answer must match exactly to be reused.
+
+        These are the fields that decide which lenders the student is
+        offered, so two students that differ in any of them may get
+        different lenders and must not share an answer however similar the
+        rest of their profile and message is. The course of study and
+        university are included as well: the answer is written for them, so
+        a student of another course must not be served it.
+
+        Args:
+            student_details: Student's information and requirements
+
+        Returns:
+            Scope: Origin country, destination country, loan currency, amount
+                   bucket, cosigner and collateral flags and the normalized
+                   course of study and university
+        """
+        needed, currency = parse_amount(
+            student_details.get('loan_amount_needed'),
+            default_currency=str(student_details.get('loan_currency', 'USD')).upper()
+        )
+        needed_usd = to_usd(needed, currency)
+        amount_bucket = (
+            math.floor(_AMOUNT_BUCKETS_PER_DOUBLING * math.log2(needed_usd))
+            if needed_usd is not None and needed_usd > 0 else None
+        )
+        return (
+            normalize_country(student_details.get('origin_country')),
+            normalize_country(student_details.get('destination_country')),
+            currency.upper(),
+            amount_bucket,
+            parse_flag(student_details.get('has_us_cosigner')),
+            parse_flag(student_details.get('has_collateral')),
+            *(
+                ' '.join(_TOKEN_PATTERN.findall(str(student_details.get(field) or '').lower()))
+                for field in _QUOTED_FIELDS
+            )
+        )
+
+    def _embed(self, student_details: Dict[str, Any], message: str) -> SparseVector:
+        """
+        Embed a message together with the student's canonical profile.
+
+        Args:
+            student_details: Student's information and requirements
+            message: Student's message
+
+        Returns:
+            SparseVector: Unit-length embedding
+        """
+        return self.vectorizer.transform(message, self.canonical_profile(student_details))
+
+    def _hyperplanes(self, index: int) -> int:
+        """
+        Return the random hyperplane signs for one feature as a bit mask.
+
+        Args:
+            index: Feature bucket index
+
+        Returns:
+            int: Bit b is set when hyperplane b has a positive component
+        """
+        mask = self._hyperplane_cache.get(index)
+        if mask is None:
+            mask = random.Random(self._seed * 1000003 + index).getrandbits(self.n_bands * self.band_bits)
+            self._hyperplane_cache[index] = mask
+        return mask
+
+    def _band_keys(self, kind: str, scope: Scope, vector: SparseVector) -> List[Tuple[str, Scope, int, int]]:
+        """
+        Compute the locality-sensitive bucket keys of a vector.
+
+        Args:
+            kind: Kind of answer ("recommendation", "query_recommendation", ...)
+            scope: Profile fields the answer must match exactly
+            vector: Unit-length embedding
+
+        Returns:
+            List[Tuple]: One bucket key per band
+        """
+        n_bits = self.n_bands * self.band_bits
+        projections = [0.0] * n_bits
+        for index, weight in vector.items():
+            mask = self._hyperplanes(index)
+            for bit in range(n_bits):
+                projections[bit] += weight if mask >> bit & 1 else -weight
+
+        keys = []
+        for band in range(self.n_bands):
+            signature = 0
+            for bit in range(band * self.band_bits, (band + 1) * self.band_bits):
+                signature = signature << 1 | (projections[bit] > 0)
+            keys.append((kind, scope, band, signature))
+        return keys
+
+    def find_similar_recommendations(
+        self,
+        student_details: Dict[str, Any],
+        message: str = "",
+        kind: str = "recommendation",
+        version: int = 0
+    ) -> Optional[str]:
+        """
+        Look up a stored answer for a similar student and question.
+
+        Args:
+            student_details: Student's information and requirements
+            message: Student's message
+            kind: Kind of answer to look up
+            version: Version of the lender catalog the answer must quote
+
+        Returns:
+            Optional[str]: Stored answer personalized for this student, or None
+        """
+        started = time.perf_counter()
+        scope = (version,) + self.profile_scope(student_details)
+        vector = self._embed(student_details, message)
+        best_score, best_answer = 0.0, None
+        if vector:
+            keys = self._band_keys(kind, scope, vector)
+            with self._lock:
+                candidates = {entry_id for key in keys for entry_id in self._buckets.get(key, ())}
+                for entry_id in candidates:
+                    _, entry_scope, entry_vector, answer = self._entries[entry_id]
+                    if entry_scope != scope:
+                        continue
+                    score = cosine_similarity(vector, entry_vector)
+                    if score > best_score:
+                        best_score, best_answer = score, answer
+
+        hit = best_answer is not None and best_score >= self.threshold
+        with self._lock:
+            self.lookup_seconds += time.perf_counter() - started
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not hit:
+            return None
+        return best_answer.replace(_NAME_PLACEHOLDER, str(student_details.get('name', '')))
+
+    def store_recommendation(
+        self,
+        student_details: Dict[str, Any],
+        recommendation: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        message: str = "",
+        kind: str = "recommendation",
+        version: int = 0
+    ) -> None:
+        """
+        Store an answer so that similar students can reuse it.
+
+        Storing the first answer of a newer catalog version drops the answers
+        of older versions; an answer of an older version than one already
+        stored is not kept.
+
+        Args:
+            student_details: Student's information and requirements
+            recommendation: Answer given to the student
+            metadata: Extra information about the answer (e.g. the user id)
+            message: Student's message
+            kind: Kind of answer being stored
+            version: Version of the lender catalog the answer was generated with
+        """
+        vector = self._embed(student_details, message)
+        if not vector:
+            return
+        scope = (version,) + self.profile_scope(student_details)
+        name = str(student_details.get('name', '')).strip()
+        # Whole words only, so that "Al" does not template "Also" and "Alternatively"
+        answer = (
+            re.sub(rf"(?<!\w){re.escape(name)}(?!\w)", lambda _: _NAME_PLACEHOLDER, recommendation)
+            if name else recommendation
+        )
+        keys = self._band_keys(kind, scope, vector)
+
+        with self._lock:
+            latest = self._latest_versions.get(kind, version)
+            if version < latest:
+                return
+            if version > latest:
+                for stale_id in [entry_id for entry_id, entry in self._entries.items()
+                                 if entry[0] == kind and entry[1][0] < version]:
+                    self._remove(stale_id)
+            self._latest_versions[kind] = version
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (kind, scope, vector, answer)
+            for key in keys:
+                self._buckets.setdefault(key, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int) -> None:
+        """
+        Remove an entry and its bucket references. Caller holds the lock.
+
+        Args:
+            entry_id: Identifier of the entry to remove
+        """
+        kind, scope, vector, _ = self._entries.pop(entry_id)
+        for key in self._band_keys(kind, scope, vector):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.remove(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def clear(self) -> None:
+        """Drop every stored answer."""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report how effective the semantic cache is.
+
+        Returns:
+            Dict: Hits, misses, hit rate, mean lookup latency and entry count
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'mean_lookup_ms': 1000 * self.lookup_seconds / lookups if lookups else 0.0,
+            'entries': len(self._entries)
+        }